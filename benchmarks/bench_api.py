@@ -0,0 +1,185 @@
+"""End-to-end benchmark of the Notion Agent API with local stand-ins.
+
+Drives /chat, /tool-schemas and /reset through the FastAPI app in process, with a
+scripted model in place of OpenAI, a fake ComposioToolSet and a local
+streamable-HTTP MCP server, and reports latency percentiles, throughput and
+memory per scenario:
+
+    python -m benchmarks.bench_api
+    python -m benchmarks.bench_api --scenarios warm_tenant long_history --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import tracemalloc
+import uuid
+import httpx
+from benchmarks.fakes import ScriptedModel, install_fakes
+from benchmarks.mcp_stub import MCPStub
+
+SEARCH = ("NOTION_SEARCH_NOTION_PAGE", {"query": "roadmap"})
+QUERY = ("NOTION_QUERY_DATABASE", {"database_id": "db-1", "page_size": 50})
+FETCH = ("NOTION_FETCH_DATA", {"page_id": "page-1"})
+
+
+def keys(tenant: str) -> dict:
+    return {"openai_api_key": f"sk-{tenant}", "composio_key": f"composio-{tenant}"}
+
+
+class Scenario:
+    """A named benchmark: the model script it needs and how to build each request."""
+
+    def __init__(self, name, description, requests, concurrency=1, tool_calls=(SEARCH,)):
+        self.name = name
+        self.description = description
+        self.requests = requests
+        self.concurrency = concurrency
+        self.tool_calls = tool_calls
+
+    def request(self, i: int) -> tuple[str, dict]:
+        raise NotImplementedError
+
+
+class ColdTenant(Scenario):
+    def request(self, i):
+        return "/chat", {"query": "find the roadmap", **keys(f"cold-{uuid.uuid4().hex}")}
+
+
+class WarmTenant(Scenario):
+    def request(self, i):
+        return "/chat", {"query": "find the roadmap", "session_id": f"warm-{i}", **keys("warm")}
+
+
+class LongHistory(Scenario):
+    def request(self, i):
+        return "/chat", {"query": f"query the tasks database, turn {i}", "session_id": "long", **keys("long")}
+
+
+class MultiTool(Scenario):
+    def request(self, i):
+        return "/chat", {"query": "summarise my workspace", "session_id": f"multi-{i}", **keys("multi")}
+
+
+class ToolSchemas(Scenario):
+    def request(self, i):
+        return "/tool-schemas", keys("warm")
+
+
+class Reset(Scenario):
+    def request(self, i):
+        return "/reset", {"session_id": f"warm-{i}", **keys("warm")}
+
+
+def scenarios(args) -> list[Scenario]:
+    n = args.requests
+    return [
+        ColdTenant("cold_tenant", "new API keys on every request", n),
+        WarmTenant("warm_tenant", "same keys, new session per request", n, concurrency=args.concurrency),
+        LongHistory("long_history", "one session, growing history of large tool results", n, tool_calls=(QUERY,)),
+        MultiTool("multi_tool", "three parallel tool calls then one more", n, concurrency=args.concurrency,
+                  tool_calls=([SEARCH, QUERY, FETCH], FETCH)),
+        ToolSchemas("tool_schemas", "catalog of a warm tenant", n, concurrency=args.concurrency),
+        Reset("reset", "reset a single session", n, concurrency=args.concurrency),
+    ]
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+async def run_scenario(client: httpx.AsyncClient, model: ScriptedModel, scenario: Scenario) -> dict:
+    model.tool_calls = [step if isinstance(step, list) else [step] for step in scenario.tool_calls]
+    timings: list[float] = []
+    errors = 0
+    counter = iter(range(scenario.requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            path, data = scenario.request(i)
+            start = time.perf_counter()
+            response = await client.post(path, data=data)
+            timings.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(scenario.concurrency)])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": scenario.name,
+        "description": scenario.description,
+        "requests": len(timings),
+        "errors": errors,
+        "concurrency": scenario.concurrency,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "throughput_rps": len(timings) / elapsed,
+        "peak_memory_mb": peak / 1e6,
+    }
+
+
+async def run(args) -> list[dict]:
+    from notion_api import app, key_cache
+
+    selected = [s for s in scenarios(args) if not args.scenarios or s.name in args.scenarios]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        try:
+            for scenario in selected:
+                results.append(await run_scenario(client, args.model, scenario))
+        finally:
+            await key_cache.aclose()
+    return results
+
+
+def print_table(results: list[dict]):
+    header = f"{'scenario':<14}{'reqs':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'peak MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<14}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+            f"{r['p99_ms']:>10.1f}{r['throughput_rps']:>9.1f}{r['peak_memory_mb']:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", help="scenarios to run, all by default")
+    parser.add_argument("--requests", type=int, default=30, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model request")
+    parser.add_argument("--schema-latency", type=float, default=0.2, help="seconds per Composio schema fetch")
+    parser.add_argument("--actions", type=int, default=50, help="size of the fake Composio catalog")
+    parser.add_argument("--mcp-rtt", type=float, default=0.01, help="seconds added to each MCP HTTP request")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="seconds per MCP tool call")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    args.model = ScriptedModel(latency=args.model_latency)
+    install_fakes(args.model, schema_latency=args.schema_latency, action_count=args.actions)
+    with MCPStub(rtt=args.mcp_rtt, tool_latency=args.tool_latency) as stub:
+        os.environ["mcp_server_url"] = stub.url
+        # A single process, sessions left in sessions.db by an earlier run must not carry over
+        os.environ.setdefault("session_store", "memory")
+        results = asyncio.run(run(args))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Bursts of identical concurrent /chat requests, with and without coalescing.
+
+Drives /chat in process, like bench_api. Each burst sends the same query with
+the same keys and session `--burst` times at once, as a client retrying or a
+dashboard refreshing would, for a tenant whose agent is not built yet. Runs the
+bursts without `coalesce` and with it, and reports the model requests made, the
+agents built and the latency of the requests:
+
+    python -m benchmarks.bench_coalescing
+    python -m benchmarks.bench_coalescing --bursts 20 --burst 8 --json coalescing.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import httpx
+from benchmarks.bench_api import SEARCH, keys, percentile
+from benchmarks.fakes import ScriptedModel, install_fakes
+from benchmarks.mcp_stub import MCPStub
+
+
+async def run_config(client: httpx.AsyncClient, model: ScriptedModel, coalesce: bool, args) -> dict:
+    from notion_api import key_cache
+
+    name = "coalesce" if coalesce else "baseline"
+    model_requests = len(model.messages_seen)
+    builds = key_cache.misses
+    timings: list[float] = []
+    statuses: set[int] = set()
+
+    async def send(tenant: str):
+        start = time.perf_counter()
+        data = {"query": "find the roadmap", "session_id": "dashboard", "coalesce": str(coalesce).lower(), **keys(tenant)}
+        response = await client.post("/chat", data=data)
+        timings.append(time.perf_counter() - start)
+        statuses.add(response.status_code)
+
+    for burst in range(args.bursts):
+        await asyncio.gather(*[send(f"{name}-{burst}") for _ in range(args.burst)])
+    return {
+        "config": name,
+        "requests": len(timings),
+        "statuses": sorted(statuses),
+        "model_requests": len(model.messages_seen) - model_requests,
+        "agents_built": key_cache.misses - builds,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "max_ms": max(timings) * 1000,
+    }
+
+
+async def run(model: ScriptedModel, args) -> list[dict]:
+    from notion_api import app, key_cache
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        try:
+            return [await run_config(client, model, coalesce, args) for coalesce in (False, True)]
+        finally:
+            await key_cache.aclose()
+
+
+def print_table(results: list[dict]):
+    header = f"{'config':<10}{'reqs':>6}{'model reqs':>12}{'agents built':>14}{'p50 ms':>10}{'max ms':>10}  statuses"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['config']:<10}{r['requests']:>6}{r['model_requests']:>12}{r['agents_built']:>14}"
+            f"{r['p50_ms']:>10.1f}{r['max_ms']:>10.1f}  {', '.join(map(str, r['statuses']))}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=10)
+    parser.add_argument("--burst", type=int, default=5, help="identical requests sent at once")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model request")
+    parser.add_argument("--schema-latency", type=float, default=0.05, help="seconds to build an agent's tool schemas")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    model = ScriptedModel(tool_calls=[SEARCH], latency=args.model_latency)
+    install_fakes(model, schema_latency=args.schema_latency)
+    # Per tenant limits would queue the duplicates of the baseline rather than run them
+    os.environ.setdefault("max_concurrent_requests_per_tenant", str(args.burst))
+    os.environ.setdefault("schema_cache_ttl", "0")
+    with MCPStub(rtt=0.005) as stub:
+        os.environ["mcp_server_url"] = stub.url
+        # A single process, sessions left in sessions.db by an earlier run must not carry over
+        os.environ.setdefault("session_store", "memory")
+        results = asyncio.run(run(model, args))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
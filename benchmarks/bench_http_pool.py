@@ -0,0 +1,86 @@
+"""Connections opened by rebuilt agents, with per-agent HTTP clients vs the shared pool.
+
+Builds one agent after another against the MCP stub, as KeyCache does when
+tenants come and go, runs a chat with a Notion tool call on each and closes it.
+With `per_agent` every agent has its own connection pool, as before the shared
+HTTPPool; with `shared` all of them send through the pool of the process.
+Reports the HTTP requests made, the connections opened, the share of requests
+that reused a connection and the latency of each agent's first chat:
+
+    python -m benchmarks.bench_http_pool
+    python -m benchmarks.bench_http_pool --agents 50 --rtt 0.01 --json http_pool.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from benchmarks.bench_api import SEARCH
+from benchmarks.fakes import ScriptedModel, install_fakes
+from benchmarks.mcp_stub import MCPStub
+from utils.http_pool import HTTPPool
+
+
+async def run_config(url: str, name: str, args) -> dict:
+    from notion_agent import Notionagent
+
+    shared = HTTPPool() if name == "shared" else None
+    pools, timings = [], []
+    for i in range(args.agents):
+        pool = shared or HTTPPool()
+        pools.append(pool)
+        agent = Notionagent(mcp_server_url=url, api_keys={"openai_api_key": "sk", "composio_key": "c"},
+                            namespace=f"tenant-{i}", http_pool=pool)
+        try:
+            start = time.perf_counter()
+            await agent.chat("find the roadmap", "session")
+            timings.append(time.perf_counter() - start)
+        finally:
+            await agent.aclose()
+            if pool is not shared:
+                await pool.aclose()
+    stats = [host for pool in set(pools) for host in pool.stats().values()]
+    if shared:
+        await shared.aclose()
+    requests = sum(host["requests"] for host in stats)
+    connections = sum(host["connections_opened"] for host in stats)
+    return {
+        "config": name,
+        "agents": args.agents,
+        "requests": requests,
+        "connections_opened": connections,
+        "reuse_rate": 1 - connections / requests,
+        "first_chat_ms": statistics.mean(timings) * 1000,
+    }
+
+
+def print_table(results: list[dict]):
+    header = f"{'config':<11}{'agents':>8}{'requests':>10}{'connections':>13}{'reuse':>8}{'first chat ms':>15}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['config']:<11}{r['agents']:>8}{r['requests']:>10}{r['connections_opened']:>13}"
+            f"{r['reuse_rate']:>8.0%}{r['first_chat_ms']:>15.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=20, help="agents built one after another")
+    parser.add_argument("--rtt", type=float, default=0.005, help="simulated round trip per HTTP request, in seconds")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    install_fakes(ScriptedModel(tool_calls=[SEARCH]))
+    with MCPStub(rtt=args.rtt) as stub:
+        results = [asyncio.run(run_config(stub.url, name, args)) for name in ("per_agent", "shared")]
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
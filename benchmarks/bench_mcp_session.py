@@ -0,0 +1,70 @@
+"""Per-turn latency with a per-request MCP session vs the persistent session.
+
+    python -m benchmarks.bench_mcp_session --turns 20 --rtt 0.02
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import FunctionModel
+from benchmarks.mcp_stub import MCPStub
+from utils.mcp_session import NotionMCPServer, PersistentMCPSession
+
+
+def one_tool_call(messages, info):
+    # Search once, then answer with the tool result
+    if isinstance(messages[-1].parts[-1], ToolReturnPart):
+        return ModelResponse(parts=[TextPart("done")])
+    return ModelResponse(parts=[ToolCallPart("NOTION_SEARCH_NOTION_PAGE", {"query": "roadmap"})])
+
+
+async def per_request(url: str, turns: int) -> list[float]:
+    agent = Agent(FunctionModel(one_tool_call), mcp_servers=[NotionMCPServer(url)])
+    timings = []
+    for _ in range(turns):
+        start = time.perf_counter()
+        async with agent.run_mcp_servers():
+            await agent.run("find the roadmap page")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def persistent(url: str, turns: int) -> list[float]:
+    server = NotionMCPServer(url)
+    agent = Agent(FunctionModel(one_tool_call), mcp_servers=[server])
+    session = PersistentMCPSession([server])
+    await session.connect()
+    timings = []
+    try:
+        for _ in range(turns):
+            start = time.perf_counter()
+            await session.ensure_connected()
+            await agent.run("find the roadmap page")
+            timings.append(time.perf_counter() - start)
+    finally:
+        await session.aclose()
+    return timings
+
+
+def report(name: str, timings: list[float]):
+    print(f"{name:<12} mean {statistics.mean(timings) * 1000:8.1f} ms   median {statistics.median(timings) * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=0.02, help="simulated round trip per HTTP request, in seconds")
+    args = parser.parse_args()
+
+    with MCPStub(rtt=args.rtt) as stub:
+        before = asyncio.run(per_request(stub.url, args.turns))
+        after = asyncio.run(persistent(stub.url, args.turns))
+    report("per-request", before)
+    report("persistent", after)
+    print(f"saved per turn: {(statistics.mean(before) - statistics.mean(after)) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Prompt tokens per turn over a long session.
+
+Runs a 50-turn session through Notionagent with a scripted model, which makes a
+Notion tool call every turn and adds a note every few turns, and renders every
+model request as it would be sent to OpenAI (tool definitions, then messages).
+Compares the current prompt assembly (`current`), where the notes are a system
+part after the prompt of the turn, kept with it until older turns are dropped
+from the history, with the previous one (`pasted`), where the notes were pasted
+into every user message and stored with it for good. Reports the prompt tokens per turn, the share of them that
+repeats the previous request's prefix, which providers can serve from their
+prompt cache, overall and for the first request of each turn, and the tokens per
+turn left out of that prefix:
+
+    python -m benchmarks.bench_prompt_tokens
+    python -m benchmarks.bench_prompt_tokens --turns 100 --note-every 3 --json prompt.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from contextlib import asynccontextmanager
+from benchmarks.bench_tool_selection import tools_payload
+from benchmarks.fakes import ScriptedModel, install_fakes
+from benchmarks.mcp_stub import MCPStub
+from utils.history import count_tokens
+
+TOPICS = ["roadmap", "tasks database", "meeting notes", "onboarding", "design doc", "bug tracker", "reading list"]
+
+
+def pasted_notes_agent():
+    """Notionagent with the previous prompt assembly, for comparison"""
+    from notion_agent import Notionagent, turn_request
+
+    class PastedNotesAgent(Notionagent):
+        @asynccontextmanager
+        async def _run_scope(self, query: str, deps):
+            yield [*deps.messages, turn_request(query, [])]
+
+        async def chat(self, query: str, session_id: str = "default"):
+            notes = await self.notes_store.relevant(self.namespace, query, self.notes_top_k)
+            notes_text = "\n".join(f"[{note.id}] {note.content}" for note in notes) if notes else "no previous notes"
+            return await super().chat(f"user query: {query}\n\n previous notes: {notes_text}", session_id)
+
+    return PastedNotesAgent
+
+
+def common_prefix(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+async def run_session(model: ScriptedModel, mcp_url: str, mode: str, args) -> dict:
+    from notion_agent import Notionagent
+    from pydantic_ai.models.openai import OpenAIModel
+    from pydantic_ai.providers.openai import OpenAIProvider
+
+    renderer = OpenAIModel("gpt-4.1-nano", provider=OpenAIProvider(api_key="sk"))
+    agent_class = pasted_notes_agent() if mode == "pasted" else Notionagent
+    agent = agent_class(mcp_server_url=mcp_url, api_keys={"openai_api_key": "sk", "composio_key": "c"},
+                        notes_top_k=args.notes_top_k, history_token_budget=args.history_budget)
+    per_turn, cached, turn_cached, previous = [], [], [], ""
+    try:
+        for turn in range(args.turns):
+            topic = TOPICS[turn % len(TOPICS)]
+            steps = [[("NOTION_SEARCH_NOTION_PAGE", {"query": topic})]]
+            if turn % args.note_every == 0:
+                steps.append([("agent_notes", {"note": f"the {topic} page is shared with the team, turn {turn}"})])
+            model.tool_calls = steps
+            model.tools_seen.clear()
+            model.messages_seen.clear()
+            await agent.chat(f"what changed in the {topic} this week?", "session")
+
+            tokens = reuse = 0
+            for step, (tools, messages) in enumerate(zip(model.tools_seen, model.messages_seen)):
+                rendered = tools_payload(tools) + json.dumps(await renderer._map_messages(messages), default=str)
+                tokens += count_tokens(rendered)
+                step_reuse = count_tokens(rendered[: common_prefix(previous, rendered)])
+                reuse += step_reuse
+                if step == 0 and turn:
+                    turn_cached.append(step_reuse / count_tokens(rendered))
+                previous = rendered
+            per_turn.append(tokens)
+            cached.append(reuse)
+    finally:
+        await agent.aclose()
+    return {
+        "mode": mode,
+        "turns": args.turns,
+        "prompt_tokens_per_turn": statistics.mean(per_turn),
+        "prompt_tokens_last_turn": per_turn[-1],
+        "prompt_tokens_total": sum(per_turn),
+        "prefix_reuse": sum(cached) / sum(per_turn),
+        "uncached_tokens_per_turn": statistics.mean(t - c for t, c in zip(per_turn, cached)),
+        "turn_start_prefix_reuse": statistics.mean(turn_cached),
+    }
+
+
+def print_table(results: list[dict]):
+    header = (f"{'mode':<14}{'turns':>7}{'tokens/turn':>13}{'last turn':>11}{'total':>10}{'prefix reuse':>14}"
+              f"{'turn start':>12}{'uncached/turn':>15}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['mode']:<14}{r['turns']:>7}{r['prompt_tokens_per_turn']:>13.0f}{r['prompt_tokens_last_turn']:>11}"
+            f"{r['prompt_tokens_total']:>10}{r['prefix_reuse']:>14.1%}{r['turn_start_prefix_reuse']:>12.1%}"
+            f"{r['uncached_tokens_per_turn']:>15.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--note-every", type=int, default=5, help="turns between two new notes")
+    parser.add_argument("--notes-top-k", type=int, default=5)
+    parser.add_argument("--history-budget", type=int, default=16000, help="history token budget of the agent")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    model = ScriptedModel()
+    install_fakes(model)
+    results = []
+    with MCPStub(rtt=0) as stub:
+        for mode in ("pasted", "current"):
+            results.append(asyncio.run(run_session(model, stub.url, mode, args)))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Tail latency of /chat under injected faults.
+
+Drives /chat in process, like bench_api, with a scripted model that fails or hangs
+on a share of its requests and an MCP stub whose tool calls hang at random. The
+same faulty workload runs without timeouts, retries or request budget
+(`baseline`) and with them (`resilient`); reports the latency percentiles, the
+slowest request and the status codes of each:
+
+    python -m benchmarks.bench_resilience
+    python -m benchmarks.bench_resilience --failure-rate 0.2 --stall-rate 0.1 --json resilience.json
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+import httpx
+from benchmarks.bench_api import SEARCH, keys, percentile
+from benchmarks.fakes import ScriptedModel, install_fakes
+from benchmarks.mcp_stub import MCPStub
+
+
+def configs(args) -> dict[str, dict[str, str]]:
+    """Environment of the agents built for each configuration"""
+    return {
+        "baseline": {
+            "model_timeout": "0", "mcp_timeout": "0", "model_retries": "0", "mcp_retries": "0",
+            "mcp_hedge_delay": "0", "breaker_failure_threshold": "1000000", "request_budget": "0",
+        },
+        "resilient": {
+            "model_timeout": str(args.timeout), "mcp_timeout": str(args.timeout), "model_retries": "2",
+            "mcp_retries": "2", "mcp_hedge_delay": str(args.hedge_delay), "retry_base_delay": "0.05",
+            "breaker_failure_threshold": "50", "request_budget": str(args.budget),
+        },
+    }
+
+
+async def run_config(client: httpx.AsyncClient, name: str, env: dict[str, str], args) -> dict:
+    import notion_api
+    from utils import resilience
+
+    os.environ.update(env)
+    notion_api.request_budget = float(env["request_budget"])
+    resilience._breakers.clear()
+    timings: list[float] = []
+    statuses: collections.Counter = collections.Counter()
+    counter = iter(range(args.requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            response = await client.post(
+                "/chat", data={"query": "find the roadmap", "session_id": f"{name}-{i}", **keys(name)}
+            )
+            timings.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "config": name,
+        "requests": len(timings),
+        "statuses": dict(sorted(statuses.items())),
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "max_ms": max(timings) * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+async def run(args) -> list[dict]:
+    from notion_api import app, key_cache
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        try:
+            for name, env in configs(args).items():
+                if not args.configs or name in args.configs:
+                    results.append(await run_config(client, name, env, args))
+        finally:
+            await key_cache.aclose()
+    return results
+
+
+def print_table(results: list[dict]):
+    header = f"{'config':<11}{'reqs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        statuses = ", ".join(f"{status}: {count}" for status, count in r["statuses"].items())
+        print(
+            f"{r['config']:<11}{r['requests']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+            f"{r['max_ms']:>10.1f}  {statuses}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="*", help="configurations to run, all by default")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per model request")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="seconds per MCP tool call")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="share of model requests failing with a 503")
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="share of model requests and tool calls that hang")
+    parser.add_argument("--stall-time", type=float, default=10, help="seconds a hung call lasts")
+    parser.add_argument("--timeout", type=float, default=1, help="per call timeout of the resilient configuration")
+    parser.add_argument("--hedge-delay", type=float, default=0.3, help="hedging delay of read-only tool calls")
+    parser.add_argument("--budget", type=float, default=4, help="request budget of the resilient configuration")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    model = ScriptedModel(
+        tool_calls=[SEARCH], latency=args.model_latency, failure_rate=args.failure_rate,
+        stall_rate=args.stall_rate, stall_time=args.stall_time, seed=args.seed,
+    )
+    install_fakes(model)
+    with MCPStub(rtt=0.005, tool_latency=args.tool_latency, stall_rate=args.stall_rate,
+                 stall_time=args.stall_time, seed=args.seed) as stub:
+        os.environ["mcp_server_url"] = stub.url
+        # A single process, sessions left in sessions.db by an earlier run must not carry over
+        os.environ.setdefault("session_store", "memory")
+        results = asyncio.run(run(args))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
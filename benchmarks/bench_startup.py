@@ -0,0 +1,112 @@
+"""Startup cost of the Notion Agent API.
+
+Measures, in fresh interpreters, the `-X importtime` cost of `import notion_api`
+and which heavy packages it loads, then how long a uvicorn process takes to answer
+/health and /ready. With `--max-import-ms` or when a lazily loaded package is
+imported at startup, exits with status 1 so it can gate CI:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 5 --max-import-ms 1500 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+from benchmarks.fakes import free_port
+
+# Loaded on first use or by /ready, importing notion_api must not pull them in
+LAZY_PACKAGES = ("pydantic_ai", "openai", "mcp", "composio", "composio_langgraph", "langchain_core", "langgraph",
+                 "logfire", "IPython", "uvicorn")
+
+
+def import_profile(module: str) -> tuple[float, list[tuple[str, float, float]]]:
+    """Import `module` in a fresh interpreter, return its cumulative time in ms and every
+    imported module with its self and cumulative times in ms"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    total = next(cumulative for name, _, cumulative in modules if name == module)
+    return total, modules
+
+
+def time_to_ready(timeout: float = 120) -> dict:
+    """Start uvicorn and time the first successful /health and /ready"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "notion_api:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    times = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5) as client:
+            for path in ("/health", "/ready"):
+                while time.perf_counter() - start < timeout:
+                    try:
+                        if client.get(path).status_code == 200:
+                            times[path] = (time.perf_counter() - start) * 1000
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"health_ms": times.get("/health"), "ready_ms": times.get("/ready")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--max-import-ms", type=float, help="fail when the median import time is above this")
+    parser.add_argument("--skip-server", action="store_true", help="only measure the import")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    runs = [import_profile("notion_api") for _ in range(args.runs)]
+    import_ms = statistics.median(total for total, _ in runs)
+    modules = runs[-1][1]
+    loaded = {name.split(".")[0] for name, _, _ in modules}
+    eager = sorted(set(LAZY_PACKAGES) & loaded)
+    # Slowest imports by their own time, the cumulative times of nested modules overlap
+    slowest = sorted(modules, key=lambda m: m[1], reverse=True)[: args.top]
+
+    results = {"import_ms": import_ms, "import_runs_ms": [total for total, _ in runs], "eager_lazy_packages": eager}
+    print(f"import notion_api: {import_ms:.0f} ms (median of {args.runs})")
+    print(f"lazy packages imported at startup: {', '.join(eager) or 'none'}")
+    print(f"\n{'module':<50}{'self ms':>10}{'cumul ms':>10}")
+    for name, self_ms, cumulative_ms in slowest:
+        print(f"{name:<50}{self_ms:>10.1f}{cumulative_ms:>10.1f}")
+
+    if not args.skip_server:
+        results.update(time_to_ready())
+        print(f"\nuvicorn start to /health: {results['health_ms']:.0f} ms, to /ready: {results['ready_ms']:.0f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if eager:
+        failures.append(f"lazily loaded packages imported at startup: {', '.join(eager)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.0f} ms, over the {args.max_import_ms:.0f} ms budget")
+    if failures:
+        print("\nFAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
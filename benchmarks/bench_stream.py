@@ -0,0 +1,68 @@
+"""Time to first byte of /chat/stream compared to the full /chat round trip.
+
+    python -m benchmarks.bench_stream --runs 10 --latency 0.2 --chunk-delay 0.02
+"""
+import argparse
+import os
+import statistics
+import time
+import httpx
+from benchmarks.fakes import ScriptedModel, ServerThread, install_fakes
+from benchmarks.mcp_stub import MCPStub
+
+FORM = {"query": "find the roadmap page", "openai_api_key": "sk-bench", "composio_key": "bench"}
+
+
+def time_chat(client: httpx.Client) -> float:
+    start = time.perf_counter()
+    client.post("/chat", data=FORM).raise_for_status()
+    return time.perf_counter() - start
+
+
+def time_stream(client: httpx.Client) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    first_byte = first_text = None
+    with client.stream("POST", "/chat/stream", data=FORM) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            if first_text is None and line == "event: text_delta":
+                first_text = now
+    return first_byte, first_text, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="model latency per request, in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="delay between streamed text chunks")
+    parser.add_argument("--chunks", type=int, default=20)
+    args = parser.parse_args()
+
+    model = ScriptedModel(
+        tool_calls=[("NOTION_SEARCH_NOTION_PAGE", {"query": "roadmap"})],
+        chunks=args.chunks, latency=args.latency, chunk_delay=args.chunk_delay,
+    )
+    install_fakes(model)
+    with MCPStub(rtt=0.005) as stub:
+        os.environ["mcp_server_url"] = stub.url
+        # A single process, sessions left in sessions.db by an earlier run must not carry over
+        os.environ.setdefault("session_store", "memory")
+        from notion_api import app
+
+        with ServerThread(app) as server, httpx.Client(base_url=server.base_url, timeout=60) as client:
+            time_chat(client)  # build the agent and open the MCP session
+            chat = [time_chat(client) for _ in range(args.runs)]
+            stream = [time_stream(client) for _ in range(args.runs)]
+
+    ms = lambda values: f"{statistics.median(values) * 1000:8.1f} ms"
+    print(f"/chat         total            {ms(chat)}")
+    print(f"/chat/stream  first byte       {ms([s[0] for s in stream])}")
+    print(f"/chat/stream  first text delta {ms([s[1] for s in stream])}")
+    print(f"/chat/stream  total            {ms([s[2] for s in stream])}")
+
+
+if __name__ == "__main__":
+    main()
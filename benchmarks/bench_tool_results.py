@@ -0,0 +1,130 @@
+"""Tokens of large Notion tool results as returned and as sent to the model.
+
+Builds Notion API shaped results (a database query, the block tree of a long
+page and a search) of the given sizes and passes them through the
+ToolResultStore middleware. Reports the tokens of the raw result, of its
+projection and of what the model gets after the cut, and the time taken:
+
+    python -m benchmarks.bench_tool_results
+    python -m benchmarks.bench_tool_results --rows 500 --max-tokens 4000 --json tool_results.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from utils.history import count_tokens
+from utils.notion_json import project
+from utils.tool_results import ToolResultStore
+
+USER = {"object": "user", "id": "9a1c7e52-3f0b-4b8e-9d1e-6f2c0a4b5d77"}
+
+
+def rich_text(text: str) -> list[dict]:
+    return [{
+        "type": "text", "text": {"content": text, "link": None}, "plain_text": text, "href": None,
+        "annotations": {"bold": False, "italic": False, "strikethrough": False, "underline": False, "code": False, "color": "default"},
+    }]
+
+
+def page(i: int, parent: dict) -> dict:
+    return {
+        "object": "page", "id": f"1f0e6a2c-0000-4000-8000-{i:012d}", "created_time": "2025-01-02T10:00:00.000Z",
+        "last_edited_time": "2025-03-04T12:30:00.000Z", "created_by": USER, "last_edited_by": USER, "cover": None,
+        "icon": {"type": "emoji", "emoji": "📌"}, "parent": parent, "archived": False, "in_trash": False,
+        "url": f"https://www.notion.so/Task-{i}-{i:032d}", "public_url": None,
+        "properties": {
+            "Name": {"id": "title", "type": "title", "title": rich_text(f"Task {i}: follow up on the roadmap review")},
+            "Status": {"id": "a1", "type": "status", "status": {"id": "s1", "name": "In progress", "color": "blue"}},
+            "Tags": {"id": "a2", "type": "multi_select", "multi_select": [{"id": "t1", "name": "planning", "color": "red"}]},
+            "Due": {"id": "a3", "type": "date", "date": {"start": "2025-04-01", "end": None, "time_zone": None}},
+            "Owner": {"id": "a4", "type": "people", "people": [{**USER, "name": "Sam", "avatar_url": None, "type": "person"}]},
+            "Done": {"id": "a5", "type": "checkbox", "checkbox": False},
+            "Notes": {"id": "a6", "type": "rich_text", "rich_text": []},
+            "Project": {"id": "a7", "type": "relation", "relation": [{"id": "2b9d4c1e-0000-4000-8000-000000000001"}], "has_more": False},
+        },
+    }
+
+
+def database_query(rows: int) -> dict:
+    parent = {"type": "database_id", "database_id": "7c3b2a10-0000-4000-8000-000000000000"}
+    return {"data": {"object": "list", "results": [page(i, parent) for i in range(rows)], "next_cursor": None,
+                     "has_more": False, "type": "page_or_database", "page_or_database": {}, "request_id": "r"},
+            "successful": True, "error": None}
+
+
+def block_tree(blocks: int) -> dict:
+    kinds = ["paragraph", "heading_2", "bulleted_list_item", "to_do"]
+    results = []
+    for i in range(blocks):
+        kind = kinds[i % len(kinds)]
+        content: dict = {"rich_text": rich_text(f"Line {i} of the meeting notes, decisions and follow ups"), "color": "default"}
+        if kind == "to_do":
+            content["checked"] = i % 3 == 0
+        results.append({
+            "object": "block", "id": f"5d1e0b7a-0000-4000-8000-{i:012d}", "parent": {"type": "page_id", "page_id": "p"},
+            "created_time": "2025-01-02T10:00:00.000Z", "last_edited_time": "2025-03-04T12:30:00.000Z",
+            "created_by": USER, "last_edited_by": USER, "has_children": False, "archived": False, "in_trash": False,
+            "type": kind, kind: content,
+        })
+    return {"data": {"object": "list", "results": results, "next_cursor": None, "has_more": False}, "successful": True}
+
+
+def search(results: int) -> dict:
+    parent = {"type": "workspace", "workspace": True}
+    return {"data": {"object": "list", "results": [page(i, parent) for i in range(results)]}, "successful": True}
+
+
+async def measure(name: str, payload: dict, store: ToolResultStore) -> dict:
+    async def call_next(tool_name, arguments):
+        return payload
+
+    start = time.perf_counter()
+    sent = await store.compact("bench", name, {}, call_next)
+    elapsed = time.perf_counter() - start
+    return {
+        "result": name,
+        "raw_tokens": count_tokens(json.dumps(payload)),
+        "projected_tokens": count_tokens(json.dumps(project(payload))),
+        "sent_tokens": count_tokens(json.dumps(sent)),
+        "projection_ms": elapsed * 1000,
+    }
+
+
+async def run(args) -> list[dict]:
+    store = ToolResultStore(max_tokens=args.max_tokens)
+    payloads = {
+        f"query {args.rows} rows": database_query(args.rows),
+        f"page {args.blocks} blocks": block_tree(args.blocks),
+        "search 10 pages": search(10),
+    }
+    try:
+        return [await measure(name, payload, store) for name, payload in payloads.items()]
+    finally:
+        store.close()
+
+
+def print_table(results: list[dict]):
+    header = f"{'result':<20}{'raw':>10}{'projected':>11}{'sent':>8}{'ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['result']:<20}{r['raw_tokens']:>10}{r['projected_tokens']:>11}{r['sent_tokens']:>8}{r['projection_ms']:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="rows of the database query")
+    parser.add_argument("--blocks", type=int, default=200, help="blocks of the page")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="tool_result_max_tokens")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Prompt size with per-query tool selection.
+
+Runs Notionagent against the local MCP stub serving a Notion-like catalog, with a
+scripted model that records the tool definitions sent with each request, for
+several `tool_top_k` values (0 sends every tool). Reports the tools and schema
+bytes/tokens per request and how often the tool a query needs was selected:
+
+    python -m benchmarks.bench_tool_selection
+    python -m benchmarks.bench_tool_selection --top-k 0 4 8 --json selection.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from benchmarks.fakes import ScriptedModel, install_fakes
+from benchmarks.mcp_stub import MCPStub
+from utils.history import count_tokens
+
+# query -> the tool it needs
+QUERIES = {
+    "find the page about the Q3 roadmap": "NOTION_SEARCH_NOTION_PAGE",
+    "what is written on the onboarding page": "NOTION_FETCH_NOTION_CHILD_BLOCK",
+    "list the open tasks in the tasks database": "NOTION_QUERY_DATABASE",
+    "add a row to the bugs database for the login crash": "NOTION_INSERT_ROW_DATABASE",
+    "mark the row for the login crash as done": "NOTION_UPDATE_ROW_DATABASE",
+    "create a new page called meeting notes": "NOTION_CREATE_NOTION_PAGE",
+    "append a to-do item to my daily page": "NOTION_ADD_PAGE_CONTENT",
+    "archive the old launch page": "NOTION_ARCHIVE_NOTION_PAGE",
+    "leave a comment on the design doc asking for review": "NOTION_CREATE_COMMENT",
+    "show the comments on the design doc": "NOTION_FETCH_COMMENTS",
+    "add a priority column to the tasks database": "NOTION_UPDATE_SCHEMA_DATABASE",
+    "who are the users in this workspace": "NOTION_LIST_USERS",
+    "duplicate the weekly template page": "NOTION_DUPLICATE_PAGE",
+    "delete the second paragraph block": "NOTION_DELETE_BLOCK",
+    "change the icon of the home page": "NOTION_UPDATE_PAGE",
+    "create a database for reading notes": "NOTION_CREATE_DATABASE",
+}
+
+
+def tools_payload(tools) -> str:
+    """The tool definitions as they are sent to the OpenAI API"""
+    return json.dumps([
+        {"type": "function", "function": {"name": t.name, "description": t.description, "parameters": t.parameters_json_schema}}
+        for t in tools
+    ])
+
+
+async def run_top_k(model: ScriptedModel, mcp_url: str, top_k: int) -> dict:
+    from notion_agent import Notionagent
+
+    agent = Notionagent(mcp_server_url=mcp_url, api_keys={"openai_api_key": "sk", "composio_key": "c"}, tool_top_k=top_k)
+    sizes, tokens, counts, hits = [], [], [], 0
+    try:
+        for query, expected in QUERIES.items():
+            model.tools_seen.clear()
+            await agent.run_isolated(query)
+            tools = model.tools_seen[0]
+            payload = tools_payload(tools)
+            sizes.append(len(payload))
+            tokens.append(count_tokens(payload))
+            counts.append(len(tools))
+            hits += expected in {t.name for t in tools}
+    finally:
+        await agent.aclose()
+    return {
+        "top_k": top_k,
+        "tools_per_request": statistics.mean(counts),
+        "schema_bytes": statistics.mean(sizes),
+        "schema_tokens": statistics.mean(tokens),
+        "recall": hits / len(QUERIES),
+    }
+
+
+def print_table(results: list[dict]):
+    header = f"{'top_k':>6}{'tools':>8}{'bytes':>10}{'tokens':>9}{'saved':>8}{'recall':>8}"
+    print(header)
+    print("-" * len(header))
+    base = next((r for r in results if r["top_k"] == 0), results[0])["schema_tokens"]
+    for r in results:
+        print(
+            f"{r['top_k'] or 'all':>6}{r['tools_per_request']:>8.1f}{r['schema_bytes']:>10.0f}{r['schema_tokens']:>9.0f}"
+            f"{1 - r['schema_tokens'] / base:>8.0%}{r['recall']:>8.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, nargs="*", default=[0, 3, 5, 8])
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    model = ScriptedModel()
+    install_fakes(model)
+    with MCPStub(rtt=0, catalog=True) as stub:
+        results = [asyncio.run(run_top_k(model, stub.url, top_k)) for top_k in args.top_k]
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Throughput of the Notion Agent API with 1, 2 and 4 uvicorn worker processes.
+
+Each run starts `uvicorn benchmarks.fake_app:app --workers N` against the local MCP
+stub, with sessions and batch jobs in a shared SQLite file, and sends `/chat`
+requests spread over a few tenants and many sessions. The scripted model spends
+`--model-cpu` seconds of CPU per request, which is what extra workers parallelise:
+
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1 4 --model-cpu 0.02 --json workers.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+from benchmarks.bench_api import SEARCH, keys, percentile
+from benchmarks.fakes import free_port
+from benchmarks.mcp_stub import MCPStub
+
+
+def start_server(args, workers: int, mcp_url: str, db_path: str) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "session_store_path": db_path,
+        "mcp_server_url": mcp_url,
+        "bench_tool_calls": json.dumps([SEARCH]),
+        "bench_model_latency": str(args.model_latency),
+        "bench_model_cpu": str(args.model_cpu),
+        "max_concurrent_requests_per_tenant": str(args.concurrency),
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_app:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited before it was ready")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise TimeoutError("uvicorn did not become ready")
+
+
+async def run_workers(args, workers: int, mcp_url: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        process, base_url = start_server(args, workers, mcp_url, os.path.join(tmp, "sessions.db"))
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+                await wait_ready(client, process)
+                # Warm every worker's agent pool so the run measures steady-state requests
+                warmup = [
+                    client.post("/chat", data={"query": "warm up", "session_id": f"warmup-{i}", **keys(f"t{i % args.tenants}")})
+                    for i in range(workers * args.tenants * 2)
+                ]
+                await asyncio.gather(*warmup)
+
+                timings: list[float] = []
+                errors = 0
+                worker_ids: set[str] = set()
+                counter = iter(range(args.requests))
+
+                async def client_loop():
+                    nonlocal errors
+                    for i in counter:
+                        data = {"query": "find the roadmap", "session_id": f"s-{i % args.sessions}",
+                                **keys(f"t{i % args.tenants}")}
+                        start = time.perf_counter()
+                        response = await client.post("/chat", data=data)
+                        timings.append(time.perf_counter() - start)
+                        errors += response.status_code != 200
+                        worker_ids.add(response.headers.get("X-Worker-Id", ""))
+
+                start = time.perf_counter()
+                await asyncio.gather(*[client_loop() for _ in range(args.concurrency)])
+                elapsed = time.perf_counter() - start
+        finally:
+            process.terminate()
+            process.wait()
+
+    return {
+        "workers": workers,
+        "workers_seen": len(worker_ids),
+        "requests": len(timings),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "throughput_rps": len(timings) / elapsed,
+    }
+
+
+def print_table(results: list[dict]):
+    header = f"{'workers':>8}{'seen':>6}{'reqs':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>9}{'scaling':>9}"
+    print(header)
+    print("-" * len(header))
+    base = results[0]["throughput_rps"]
+    for r in results:
+        print(
+            f"{r['workers']:>8}{r['workers_seen']:>6}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['throughput_rps']:>9.1f}{r['throughput_rps'] / base:>8.2f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--model-latency", type=float, default=0.02, help="seconds per model request")
+    parser.add_argument("--model-cpu", type=float, default=0.01, help="CPU seconds per model request")
+    parser.add_argument("--mcp-rtt", type=float, default=0.01, help="seconds added to each MCP HTTP request")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with MCPStub(rtt=args.mcp_rtt) as stub:
+        results = [asyncio.run(run_workers(args, workers, stub.url)) for workers in args.workers]
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
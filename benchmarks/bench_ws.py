@@ -0,0 +1,112 @@
+"""Turns of one conversation over /chat/stream compared to one /ws/chat socket.
+
+Each /chat/stream turn is a new POST carrying the keys, over a kept alive
+connection. The socket sends the keys once and every turn is a `chat` message on
+it. Reports the median time to the first text delta and to the `final` event per
+turn, and how long a `cancel` takes to stop a run:
+
+    python -m benchmarks.bench_ws
+    python -m benchmarks.bench_ws --turns 20 --latency 0.1 --json ws.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import httpx
+from websockets.sync.client import connect
+from benchmarks.fakes import ScriptedModel, ServerThread, install_fakes
+from benchmarks.mcp_stub import MCPStub
+
+KEYS = {"openai_api_key": "sk-bench", "composio_key": "bench"}
+
+
+def turn_stream(client: httpx.Client, i: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    first_text = None
+    data = {"query": f"find the roadmap page, turn {i}", "session_id": "bench-stream", **KEYS}
+    with client.stream("POST", "/chat/stream", data=data) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if first_text is None and line == "event: text_delta":
+                first_text = time.perf_counter() - start
+    return first_text, time.perf_counter() - start
+
+
+def turn_ws(socket, i: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    first_text = None
+    socket.send(json.dumps({"type": "chat", "id": str(i), "query": f"find the roadmap page, turn {i}"}))
+    while True:
+        event = json.loads(socket.recv())
+        if event["type"] == "error":
+            raise RuntimeError(event["detail"])
+        if first_text is None and event["type"] == "text_delta":
+            first_text = time.perf_counter() - start
+        if event["type"] == "final":
+            return first_text, time.perf_counter() - start
+
+
+def cancel_ws(socket, i: int) -> float:
+    """Seconds from sending `cancel` after the first event of a run to its `cancelled` event"""
+    socket.send(json.dumps({"type": "chat", "id": f"cancel-{i}", "query": "find the roadmap page"}))
+    socket.recv()
+    start = time.perf_counter()
+    socket.send(json.dumps({"type": "cancel", "id": f"cancel-{i}"}))
+    while json.loads(socket.recv())["type"] != "cancelled":
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="model latency per request, in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="delay between streamed text chunks")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    model = ScriptedModel(
+        tool_calls=[("NOTION_SEARCH_NOTION_PAGE", {"query": "roadmap"})],
+        latency=args.latency, chunk_delay=args.chunk_delay,
+    )
+    install_fakes(model)
+    with MCPStub(rtt=0.005) as stub:
+        os.environ["mcp_server_url"] = stub.url
+        # A single process, sessions left in sessions.db by an earlier run must not carry over
+        os.environ.setdefault("session_store", "memory")
+        from notion_api import app
+
+        with ServerThread(app) as server, httpx.Client(base_url=server.base_url, timeout=60) as client:
+            turn_stream(client, -1)  # build the agent and open the MCP session
+            stream = [turn_stream(client, i) for i in range(args.turns)]
+            with connect(server.base_url.replace("http", "ws", 1) + "/ws/chat") as socket:
+                start = time.perf_counter()
+                socket.send(json.dumps({"type": "auth", "session_id": "bench-ws", **KEYS}))
+                assert json.loads(socket.recv())["type"] == "ready"
+                connect_ready = time.perf_counter() - start
+                ws = [turn_ws(socket, i) for i in range(args.turns)]
+                cancels = [cancel_ws(socket, i) for i in range(args.turns)]
+
+    median_ms = lambda values: statistics.median(values) * 1000
+    results = {
+        "stream_first_text_ms": median_ms([s[0] for s in stream]),
+        "stream_total_ms": median_ms([s[1] for s in stream]),
+        "ws_ready_ms": connect_ready * 1000,
+        "ws_first_text_ms": median_ms([w[0] for w in ws]),
+        "ws_total_ms": median_ms([w[1] for w in ws]),
+        "ws_cancel_ms": median_ms(cancels),
+    }
+    print(f"/chat/stream  first text delta {results['stream_first_text_ms']:8.1f} ms")
+    print(f"/chat/stream  total            {results['stream_total_ms']:8.1f} ms")
+    print(f"/ws/chat      auth to ready    {results['ws_ready_ms']:8.1f} ms")
+    print(f"/ws/chat      first text delta {results['ws_first_text_ms']:8.1f} ms")
+    print(f"/ws/chat      total            {results['ws_total_ms']:8.1f} ms")
+    print(f"/ws/chat      cancel           {results['ws_cancel_ms']:8.1f} ms")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
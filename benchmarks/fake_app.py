@@ -0,0 +1,23 @@
+"""The Notion Agent API app with the benchmark fakes installed, for running under
+uvicorn in separate worker processes:
+
+    bench_model_latency=0.05 bench_model_cpu=0.01 mcp_server_url=http://127.0.0.1:8001/mcp \\
+        uvicorn benchmarks.fake_app:app --workers 4
+
+The scripted model is configured from the `bench_*` environment variables.
+"""
+import json
+import os
+from benchmarks.fakes import ScriptedModel, install_fakes
+
+install_fakes(
+    ScriptedModel(
+        tool_calls=[tuple(step) for step in json.loads(os.getenv('bench_tool_calls', '[]'))],
+        latency=float(os.getenv('bench_model_latency', '0')),
+        cpu_time=float(os.getenv('bench_model_cpu', '0')),
+    ),
+    schema_latency=float(os.getenv('bench_schema_latency', '0')),
+    action_count=int(os.getenv('bench_actions', '50')),
+)
+
+from notion_api import app  # noqa: E402
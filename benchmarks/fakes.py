@@ -0,0 +1,171 @@
+"""Local stand-ins for OpenAI and Composio used by the benchmarks.
+
+`install_fakes` swaps the model and toolset used by `notion_agent` so the API can be
+driven end to end without network access or keys.
+"""
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uvicorn
+from composio.client.collections import ActionModel
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart, ToolReturnPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+
+def fake_action_schemas(count: int) -> list[ActionModel]:
+    """A catalog of `count` Notion-like action schemas"""
+    return [
+        ActionModel(
+            name=f"NOTION_ACTION_{i}",
+            description=f"Fake Notion action number {i} that does something with pages and databases",
+            parameters={
+                "title": f"Action{i}Request",
+                "type": "object",
+                "properties": {
+                    "page_id": {"type": "string", "description": "The id of the Notion page"},
+                    "content": {"type": "string", "description": "Content to write"},
+                },
+                "required": ["page_id"],
+            },
+            response={"title": f"Action{i}Response", "type": "object", "properties": {"data": {"type": "object"}}},
+            appName="notion",
+            appId="notion",
+            version="1.0.0",
+            available_versions=["1.0.0"],
+            tags=["pages"],
+        )
+        for i in range(count)
+    ]
+
+
+class FakeComposioToolSet:
+    """ComposioToolSet stand-in returning `action_count` schemas after `latency` seconds"""
+
+    latency = 0.0
+    action_count = 50
+
+    def __init__(self, api_key=None, **kwargs):
+        self.api_key = api_key
+
+    def get_action_schemas(self, apps=None, **kwargs):
+        time.sleep(self.latency)
+        return fake_action_schemas(self.action_count)
+
+
+class ScriptedModel:
+    """Builds a FunctionModel that runs `tool_calls` in order, then answers with a
+    streamed text of `chunks` pieces, waiting `latency` seconds per model request
+    and `chunk_delay` seconds between streamed pieces. `cpu_time` seconds of busy
+    work per model request stand in for the CPU spent around it in the process.
+
+    Each step of `tool_calls` is a `(tool_name, args)` pair, or a list of them to
+    call several tools in one model response.
+
+    Faults are injected at random (from `seed`): a `failure_rate` share of the
+    requests fail with a 503 and a `stall_rate` share hang for `stall_time` seconds.
+    """
+
+    def __init__(self, tool_calls=(), chunks: int = 10, latency: float = 0.0, chunk_delay: float = 0.0,
+                 cpu_time: float = 0.0, failure_rate: float = 0.0, stall_rate: float = 0.0, stall_time: float = 60.0,
+                 seed: int | None = None):
+        self.tool_calls = [step if isinstance(step, list) else [step] for step in tool_calls]
+        self.chunks = chunks
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.cpu_time = cpu_time
+        self.failure_rate = failure_rate
+        self.stall_rate = stall_rate
+        self.stall_time = stall_time
+        self._random = random.Random(seed)
+        # Tool definitions and messages sent with each model request
+        self.tools_seen: list[list] = []
+        self.messages_seen: list[list] = []
+
+    def _burn_cpu(self):
+        end = time.perf_counter() + self.cpu_time
+        while time.perf_counter() < end:
+            pass
+
+    async def _faults(self):
+        roll = self._random.random()
+        if roll < self.failure_rate:
+            raise ModelHTTPError(status_code=503, model_name="scripted", body="injected fault")
+        if roll < self.failure_rate + self.stall_rate:
+            await asyncio.sleep(self.stall_time)
+
+    def _next_step(self, messages):
+        # Tool steps already run in the current run, counted since the last user prompt
+        done = 0
+        for message in reversed(messages):
+            if any(part.part_kind == "user-prompt" for part in message.parts):
+                break
+            done += any(isinstance(part, ToolReturnPart) for part in message.parts)
+        return self.tool_calls[done] if done < len(self.tool_calls) else None
+
+    async def request(self, messages, info):
+        self.tools_seen.append(info.function_tools)
+        self.messages_seen.append(list(messages))
+        await asyncio.sleep(self.latency)
+        await self._faults()
+        self._burn_cpu()
+        step = self._next_step(messages)
+        if step is not None:
+            return ModelResponse(parts=[ToolCallPart(name, args) for name, args in step])
+        return ModelResponse(parts=[TextPart(" ".join(f"word{i}" for i in range(self.chunks)))])
+
+    async def stream(self, messages, info):
+        self.tools_seen.append(info.function_tools)
+        self.messages_seen.append(list(messages))
+        await asyncio.sleep(self.latency)
+        await self._faults()
+        self._burn_cpu()
+        step = self._next_step(messages)
+        if step is not None:
+            yield {i: DeltaToolCall(name=name, json_args=json.dumps(args)) for i, (name, args) in enumerate(step)}
+            return
+        for i in range(self.chunks):
+            if i:
+                await asyncio.sleep(self.chunk_delay)
+            yield f"word{i} "
+
+    def model(self) -> FunctionModel:
+        return FunctionModel(self.request, stream_function=self.stream)
+
+
+def install_fakes(model: ScriptedModel, schema_latency: float = 0.0, action_count: int = 50):
+    import notion_agent
+
+    FakeComposioToolSet.latency = schema_latency
+    FakeComposioToolSet.action_count = action_count
+    notion_agent.ComposioToolSet = FakeComposioToolSet
+    notion_agent.OpenAIModel = lambda name, provider=None: model.model()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServerThread:
+    """Serves an ASGI app with uvicorn in a background thread, use as a context manager."""
+
+    def __init__(self, app, port: int | None = None):
+        self.port = port or free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
@@ -0,0 +1,165 @@
+"""Local stand-in for the Notion MCP server used by the benchmarks.
+
+Serves a few Notion-like tools over streamable HTTP and adds a fixed delay to
+every HTTP request to simulate the network round trip to the real server. With
+`catalog=True` it also lists the rest of a Notion action catalog, whose tools
+just echo their arguments. `stall_rate` makes some tool calls hang, to test
+timeouts.
+"""
+import asyncio
+import inspect
+import random
+from typing import Annotated
+from mcp.server.fastmcp import FastMCP
+from pydantic import Field
+from benchmarks.fakes import ServerThread
+
+# name -> (description, {parameter: description}), modelled on the Composio Notion actions
+CATALOG = {
+    "NOTION_ADD_PAGE_CONTENT": ("Add a content block (paragraph, heading, list item, to-do, code) to the end of a page",
+                                {"parent_block_id": "Id of the page or block to append to", "content_block": "The block to add, with its type and rich text"}),
+    "NOTION_APPEND_BLOCK_CHILDREN": ("Append several child blocks to a block or page",
+                                     {"block_id": "Id of the parent block", "children": "List of block objects to append"}),
+    "NOTION_ARCHIVE_NOTION_PAGE": ("Archive (move to trash) or restore a page",
+                                   {"page_id": "Id of the page", "archive": "True to archive, false to restore"}),
+    "NOTION_CREATE_COMMENT": ("Add a comment to a page or to an existing discussion thread",
+                              {"parent_page_id": "Page to comment on", "discussion_id": "Thread to reply to", "comment": "Rich text of the comment"}),
+    "NOTION_CREATE_DATABASE": ("Create a database as a child of a page, with a title and property schema",
+                               {"parent_id": "Id of the parent page", "title": "Database title", "properties": "Property names and types"}),
+    "NOTION_DELETE_BLOCK": ("Delete (archive) a block, such as a paragraph or list item",
+                            {"block_id": "Id of the block to delete"}),
+    "NOTION_DUPLICATE_PAGE": ("Duplicate a page with its content under a parent page",
+                              {"page_id": "Id of the page to copy", "parent_id": "Where to put the copy", "title": "Title of the copy"}),
+    "NOTION_FETCH_COMMENTS": ("List the comments on a page or block",
+                              {"block_id": "Id of the page or block", "page_size": "Number of comments per page", "start_cursor": "Pagination cursor"}),
+    "NOTION_FETCH_DATABASE": ("Fetch the structure of a database: its title and property schema",
+                              {"database_id": "Id of the database"}),
+    "NOTION_FETCH_NOTION_BLOCK": ("Retrieve a single block by id",
+                                  {"block_id": "Id of the block"}),
+    "NOTION_FETCH_NOTION_CHILD_BLOCK": ("List the child blocks of a block or page, its content",
+                                        {"block_id": "Id of the parent block or page", "page_size": "Number of blocks per page", "start_cursor": "Pagination cursor"}),
+    "NOTION_FETCH_ROW": ("Retrieve one row (page) of a database with its property values",
+                         {"page_id": "Id of the row"}),
+    "NOTION_GET_ABOUT_ME": ("Get the bot user of the integration and its workspace",
+                            {}),
+    "NOTION_GET_ABOUT_USER": ("Get a workspace user by id, with their name, avatar and email",
+                              {"user_id": "Id of the user"}),
+    "NOTION_GET_PAGE_PROPERTY_ACTION": ("Retrieve the value of one property of a page, paginated for long relation or rollup values",
+                                        {"page_id": "Id of the page", "property_id": "Id of the property", "page_size": "Number of items per page"}),
+    "NOTION_INSERT_ROW_DATABASE": ("Insert a new row (page) into a database with property values",
+                                   {"database_id": "Id of the database", "properties": "Property values of the new row", "child_blocks": "Content of the row page"}),
+    "NOTION_LIST_USERS": ("List the users and bots of the workspace",
+                          {"page_size": "Number of users per page", "start_cursor": "Pagination cursor"}),
+    "NOTION_UPDATE_BLOCK": ("Update the text or properties of an existing block",
+                            {"block_id": "Id of the block", "block_type": "Type of the block", "content": "New content of the block"}),
+    "NOTION_UPDATE_PAGE": ("Update the properties, icon or cover of a page",
+                           {"page_id": "Id of the page", "properties": "Property values to set", "icon": "New icon", "cover": "New cover image url"}),
+    "NOTION_UPDATE_ROW_DATABASE": ("Update the property values of a database row",
+                                   {"row_id": "Id of the row", "properties": "Property values to set"}),
+    "NOTION_UPDATE_SCHEMA_DATABASE": ("Change the title, description or property schema of a database: add, rename or remove columns",
+                                      {"database_id": "Id of the database", "title": "New title", "properties": "Properties to add, rename or remove"}),
+}
+
+
+def _catalog_tool(name: str, params: dict[str, str]):
+    async def tool(**arguments) -> dict:
+        return {"tool": name, "arguments": arguments}
+
+    # The first parameter is required, the others optional
+    tool.__signature__ = inspect.Signature([
+        inspect.Parameter(
+            param,
+            inspect.Parameter.KEYWORD_ONLY,
+            annotation=Annotated[str if i == 0 else str | None, Field(description=description)],
+            default=inspect.Parameter.empty if i == 0 else None,
+        )
+        for i, (param, description) in enumerate(params.items())
+    ])
+    return tool
+
+
+def build_server(tool_latency: float = 0.0, catalog: bool = False, stall_rate: float = 0.0, stall_time: float = 60.0,
+                 seed: int | None = None) -> FastMCP:
+    """The stub server, a `stall_rate` share of the tool calls (drawn from `seed`) hang for `stall_time` seconds"""
+    mcp = FastMCP("notion-stub", log_level="WARNING")
+    rng = random.Random(seed)
+
+    async def pause():
+        await asyncio.sleep(stall_time if rng.random() < stall_rate else tool_latency)
+
+    @mcp.tool()
+    async def NOTION_SEARCH_NOTION_PAGE(query: str) -> dict:
+        """Search Notion pages by title"""
+        await pause()
+        return {"results": [{"object": "page", "id": "page-1", "title": query, "url": "https://notion.so/page-1",
+                             "last_edited_time": "2025-01-01T00:00:00.000Z"}]}
+
+    @mcp.tool()
+    async def NOTION_FETCH_DATA(page_id: str) -> dict:
+        """Fetch the content of a Notion page"""
+        await pause()
+        return {"object": "page", "id": page_id, "content": "hello"}
+
+    @mcp.tool()
+    async def NOTION_QUERY_DATABASE(database_id: str, page_size: int = 10) -> dict:
+        """Query the rows of a Notion database"""
+        await pause()
+        rows = [
+            {
+                "object": "page",
+                "id": f"row-{i}",
+                "properties": {"Name": {"title": [{"plain_text": f"Task {i}"}]}, "Status": {"select": {"name": "Todo"}}},
+            }
+            for i in range(page_size)
+        ]
+        return {"object": "list", "database_id": database_id, "results": rows}
+
+    @mcp.tool()
+    async def NOTION_FETCH_DATABASE(database_id: str) -> dict:
+        """Fetch the structure of a database: its title and property schema"""
+        await pause()
+        return {
+            "object": "database",
+            "id": database_id,
+            "title": [{"plain_text": "Tasks"}],
+            "last_edited_time": "2025-01-01T00:00:00.000Z",
+            "properties": {
+                "Name": {"id": "title", "type": "title", "title": {}},
+                "Status": {"id": "s", "type": "select", "select": {"options": [{"name": "Todo"}, {"name": "Done"}]}},
+            },
+        }
+
+    @mcp.tool()
+    async def NOTION_CREATE_NOTION_PAGE(parent_id: str, title: str) -> dict:
+        """Create a new Notion page"""
+        await pause()
+        return {"object": "page", "id": "page-new", "parent_id": parent_id, "title": title}
+
+    if catalog:
+        registered = {tool.name for tool in mcp._tool_manager.list_tools()}
+        for name, (description, params) in CATALOG.items():
+            if name in registered:
+                continue
+            mcp.add_tool(_catalog_tool(name, params), name=name, description=description)
+    return mcp
+
+
+class _LatencyMiddleware:
+    def __init__(self, app, latency: float):
+        self.app = app
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.latency:
+            await asyncio.sleep(self.latency)
+        await self.app(scope, receive, send)
+
+
+class MCPStub(ServerThread):
+    """Runs the stub server in a background thread, use as a context manager."""
+
+    def __init__(self, rtt: float = 0.02, tool_latency: float = 0.0, catalog: bool = False, stall_rate: float = 0.0,
+                 stall_time: float = 60.0, seed: int | None = None):
+        server = build_server(tool_latency, catalog, stall_rate, stall_time, seed)
+        super().__init__(_LatencyMiddleware(server.streamable_http_app(), rtt))
+        self.url = f"{self.base_url}/mcp"
@@ -1,10 +1,33 @@
-from pydantic_ai.mcp import MCPServerStreamableHTTP
 from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.models import ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai import Agent,RunContext
-from pydantic_ai.messages import ModelMessage
-from dataclasses import dataclass
+from pydantic_ai.messages import ModelMessage, ModelRequest, SystemPromptPart, UserPromptPart, PartStartEvent, PartDeltaEvent, TextPart, TextPartDelta, FunctionToolCallEvent, FunctionToolResultEvent, ToolReturnPart
+from dataclasses import dataclass, field, replace
+from pydantic import Field
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, AsyncIterator
+import asyncio
+import functools
+import re
+import anyio
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, DefaultAsyncHttpxClient
 from composio_langgraph import Action, ComposioToolSet, App
+from utils.mcp_session import NotionMCPServer, PersistentMCPSession
+from utils.schema_cache import SchemaCache
+from utils.history import HistoryManager
+from utils.session_store import SessionStore, InMemorySessionStore
+from utils.tool_cache import ToolResultCache
+from utils.tool_selection import ToolSelector
+from utils.notes_store import Note, NotesStore, NoteOperation
+from utils.notion_mirror import NotionMirror, lookups
+from utils.tool_results import ToolResultStore
+from utils.resilience import RetryPolicy, Upstream
+from utils.http_pool import HTTPPool
+from utils import metrics
 
 
 
@@ -12,38 +35,360 @@ from composio_langgraph import Action, ComposioToolSet, App
 @dataclass
 class Deps:
     messages:list[ModelMessage]
-    agent_notes:str
+    # note changes made during a run when notes are deferred, applied after it returns
+    pending_notes:list[NoteOperation]=field(default_factory=list)
+    # token count of each message in `messages`, maintained by the HistoryManager
+    message_tokens:list[int]=field(default_factory=list)
+    # tools selected for the query of the current run (a ToolSelection), not stored with the session
+    tool_selection:Annotated[Any,Field(exclude=True)]=None
+
+def load_notion_schemas(tools:ComposioToolSet,schema_cache:SchemaCache|None=None):
+    """The Notion action schemas, from `schema_cache` when given"""
+    fetch_schemas=lambda: tools.get_action_schemas(apps=[App.NOTION])
+    return schema_cache.get(App.NOTION.slug, fetch_schemas) if schema_cache else fetch_schemas()
+
+class TimedModel(WrapperModel):
+    """Records the duration of every request to the wrapped model, streamed
+    requests are timed until the stream is closed."""
+
+    async def request(self, *args: Any, **kwargs: Any):
+        with metrics.timed("model_request"):
+            return await super().request(*args, **kwargs)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list,
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        with metrics.timed("model_request"):
+            async with super().request_stream(messages, model_settings, model_request_parameters) as stream:
+                yield stream
+
+
+class ResilientModel(WrapperModel):
+    """Sends requests to the wrapped model through an Upstream, bounding, retrying and
+    circuit breaking them; streamed requests are covered until their first chunk."""
+
+    def __init__(self, wrapped, upstream:Upstream):
+        super().__init__(wrapped)
+        self.upstream=upstream
+
+    async def request(self, *args: Any, **kwargs: Any):
+        return await self.upstream.call(lambda: self.wrapped.request(*args, **kwargs))
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list,
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> AsyncIterator[StreamedResponse]:
+        async with self.upstream.open(lambda: self.wrapped.request_stream(messages, model_settings, model_request_parameters)) as stream:
+            yield stream
+
+
+NOTES_PREFIX="notes from previous conversations, update or delete them with the agent_notes tool and their id, a note listed again replaces what was listed before:\n"
+NOTE_LINE=re.compile(r"\[(\d+)\] ")
+
+def _is_notes(part)->bool:
+    return isinstance(part,SystemPromptPart) and part.content.startswith(NOTES_PREFIX)
+
+def notes_line(note:Note)->str:
+    # One line per note, so what the history shows of each note can be read back
+    return f"[{note.id}] {' '.join(note.content.splitlines())}"
+
+def deleted_line(note_id:int)->str:
+    return f"[{note_id}] (deleted)"
+
+def shown_notes(messages:list[ModelMessage])->dict[int,str]:
+    """The line of each note as the history last shows it, deletions included"""
+    shown={}
+    for message in messages:
+        if isinstance(message,ModelRequest):
+            for part in message.parts:
+                if _is_notes(part):
+                    for line in part.content[len(NOTES_PREFIX):].split("\n"):
+                        if match:=NOTE_LINE.match(line):
+                            shown[int(match[1])]=line
+    return shown
+
+def notes_update(shown:dict[int,str],relevant:list[Note],notes:list[Note])->list[str]:
+    """The lines to send with the next turn: the `relevant` notes that the history does not show as
+    they are, and the notes it shows that were updated or deleted since, `notes` being all of them"""
+    current={note.id:notes_line(note) for note in notes}
+    lines={note_id:current.get(note_id,deleted_line(note_id)) for note_id,line in shown.items()
+           if line!=current.get(note_id,deleted_line(note_id))}
+    lines.update({note.id:notes_line(note) for note in relevant if shown.get(note.id)!=notes_line(note)})
+    return [lines[note_id] for note_id in sorted(lines)]
+
+def turn_request(query:str,notes:list[str])->ModelRequest:
+    """The request starting a turn: the user prompt as typed, then the `notes` lines as a system part.
+    Given as the last message of the history, the run sends it instead of building its own,
+    and it stays in the history with the turn"""
+    parts=[UserPromptPart(content=query)]
+    if notes:
+        parts.append(SystemPromptPart(content=NOTES_PREFIX+"\n".join(notes)))
+    return ModelRequest(parts=parts)
+
 
 class Notionagent:
-    def __init__(self, mcp_server_url:str, api_keys:dict):
+    def __init__(self, mcp_server_url:str, api_keys:dict, mcp_ping_interval:float=30, schema_cache:SchemaCache|None=None, deferred_notes:bool=False,
+                 history_token_budget:int=16000, history_max_tool_result_tokens:int=2000, summarize_history:bool=False,
+                 session_store:SessionStore|None=None, namespace:str='default', tool_cache_ttl:float=0, tool_cache_size:int=256,
+                 tool_top_k:int=0, notes_store:NotesStore|None=None, notes_top_k:int=5, mirror:NotionMirror|None=None,
+                 model_policy:RetryPolicy|None=None, mcp_policy:RetryPolicy|None=None, http_pool:HTTPPool|None=None,
+                 result_store:ToolResultStore|None=None):
         self.mcp_server_url=mcp_server_url
         self.api_keys=api_keys
         self.tools=ComposioToolSet(api_key=api_keys['composio_key'])
+        schemas=load_notion_schemas(self.tools,schema_cache)
         self.tool_shemas={
-            'Notion Manager':{tool.name:tool for tool in self.tools.get_action_schemas(apps=[App.NOTION])}}
-        self.deps=Deps(messages=[],agent_notes="")
-        self.llm=OpenAIModel('gpt-4.1-nano',provider=OpenAIProvider(api_key=api_keys['openai_api_key']))
-        self.mcp_server=MCPServerStreamableHTTP(self.mcp_server_url)
+            'Notion Manager':{tool.name:tool for tool in schemas}}
+        # Conversation state is kept per session id, under this agent's namespace in the store
+        self.session_store=session_store or InMemorySessionStore()
+        self.namespace=namespace
+        # Connections come from the shared pool when given, the API key stays with this agent's client
+        self.http_pool=http_pool
+        http_client=DefaultAsyncHttpxClient(transport=http_pool.transport) if http_pool else None
+        # Timeouts and retries are left to the resilience layer rather than the OpenAI client
+        openai_client=AsyncOpenAI(api_key=api_keys['openai_api_key'],max_retries=0,http_client=http_client)
+        self.llm=TimedModel(ResilientModel(
+            OpenAIModel('gpt-4.1-nano',provider=OpenAIProvider(openai_client=openai_client)),
+            Upstream("openai",model_policy or RetryPolicy(timeout=60),transient=(APIConnectionError,))))
+        self.mcp_server=NotionMCPServer(self.mcp_server_url,tool_middlewares=[metrics.tool_middleware],http_pool=http_pool)
+        # Tool results reach the model projected and cut to size, the full results stay in the side store
+        self.result_store=result_store
+        if self.result_store:
+            self.mcp_server.tool_middlewares.append(functools.partial(self.result_store.compact,self.namespace))
+        # Opt-in memoization of read-only Notion tool results, cleared by any write
+        self.tool_cache=ToolResultCache(ttl=tool_cache_ttl,max_entries=tool_cache_size) if tool_cache_ttl>0 else None
+        if self.tool_cache:
+            self.mcp_server.tool_middlewares.append(self.tool_cache)
+        # Opt-in local mirror of page titles and database schemas, fed by every tool result
+        self.mirror=mirror
+        if self.mirror:
+            self.mcp_server.tool_middlewares.append(functools.partial(self.mirror.record,self.namespace))
+        # Innermost, so only calls that reach the server are bounded and retried
+        self.mcp_upstream=Upstream("mcp",mcp_policy or RetryPolicy(timeout=30),
+                                   transient=(httpx.TransportError,anyio.ClosedResourceError,anyio.BrokenResourceError))
+        self.mcp_server.tool_middlewares.append(self.mcp_upstream.tool_middleware)
+        self.mcp_session=PersistentMCPSession([self.mcp_server],ping_interval=mcp_ping_interval)
+        # Notes are shared by the sessions of the namespace, only the notes_top_k most relevant go in a prompt
+        self.notes_store=notes_store or NotesStore()
+        self.notes_top_k=notes_top_k
+        # When deferred, note changes are collected during the run and applied after it returns
+        self.deferred_notes=deferred_notes
+        self._notes_tasks:dict[str,list[asyncio.Task]]={}
+        self.history=HistoryManager(
+            token_budget=history_token_budget,
+            max_tool_result_tokens=history_max_tool_result_tokens,
+            summarizer=Agent(self.llm,instructions="summarize the conversation for an assistant that works on a Notion workspace, keep ids, titles and decisions") if summarize_history else None)
+
+        async def agent_notes(ctx:RunContext[Deps],note:str="",note_id:int|None=None):
+            """Use this tool to write notes to improve the agent's performance based on feedback, one short note per fact
+            args:
+            - note:str the note, leave empty with a note_id to delete that note
+            - note_id:int id of a previous note to replace or delete, omit to add a new note
+            """
+            operation=NoteOperation(content=note or None,note_id=note_id)
+            if self.deferred_notes:
+                ctx.deps.pending_notes.append(operation)
+                return "Agent notes update scheduled"
+            return await self._apply_note(operation)
+
+        async def find_tools(ctx:RunContext[Deps],query:str):
+            """Use this tool when none of the available Notion tools fits the task, the matching tools can be called from the next step
+            args:
+            - query:str what the tool should do
+            """
+            found=self.tool_selector.expand(ctx.deps.tool_selection,query)
+            if found:
+                return [f"{tool.name}: {tool.description}" for tool in found]
+            remaining=[tool.name for tool in self.tool_selector.remaining(ctx.deps.tool_selection)]
+            return f"No matching tools, the other tools are: {', '.join(remaining)}" if remaining else "No other tools"
+
+        async def search_pages(ctx:RunContext[Deps],query:str=""):
+            """Use this tool first to find pages and databases by title, it answers from a local copy of the workspace and searches Notion when nothing matches
+            args:
+            - query:str words of the title, leave empty for the recently edited pages
+            """
+            results=await self._mirror_lookup("search_pages",lambda: self.mirror.search(self.namespace,query),
+                                              "NOTION_SEARCH_NOTION_PAGE",{"query":query})
+            return results if results else "No matching pages"
 
-        async def agent_notes(ctx:RunContext[Deps],query:str):
-            """Use this tool to write notes to improve the agent's performance based on feedback
+        async def get_database_schema(ctx:RunContext[Deps],database_id:str):
+            """Use this tool to get the title and properties (columns with their types and options) of a database, it answers from a local copy of the workspace
             args:
-            - query:str
+            - database_id:str id of the database
             """
-            note_agent=Agent(self.llm,instructions="write notes or modify the previous notes to improve the agent's performance based on feedback")
-            note_result=note_agent.run_sync(f"previous notes: {ctx.deps.agent_notes if ctx.deps.agent_notes else 'no previous notes'}\n\n feedback: {query}")
-            ctx.deps.agent_notes=note_result.output
-            return "Agent notes updated"
-        
-        self.agent=Agent(self.llm, mcp_servers=[self.mcp_server],tools=[agent_notes], instructions="you are a helpful assistant that can help with tasks related to Notion\
+            return await self._mirror_lookup("get_database_schema",lambda: self.mirror.database(self.namespace,database_id),
+                                             "NOTION_FETCH_DATABASE",{"database_id":database_id})
+
+        async def fetch_full_result(ctx:RunContext[Deps],result_handle:str,next_offset:int=0,raw:bool=False):
+            """Use this tool to read more of a Notion tool result that has a result_handle: the rest of a result that was cut, from its next_offset, or the fields left out of it with raw
+            args:
+            - result_handle:str the result_handle of the result
+            - next_offset:int the next_offset of the part read last, 0 for the start
+            - raw:bool true for the result exactly as Notion returned it, false for the compact form
+            """
+            found=await self.result_store.fetch(self.namespace,result_handle,next_offset,raw)
+            return found if found is not None else f"There is no result {result_handle}, it may have expired, call the Notion tool again"
+
+        local_tools=[agent_notes]+([search_pages,get_database_schema] if self.mirror else [])+([fetch_full_result] if self.result_store else [])
+        # Opt-in per-query tool selection, only the top_k tools matching the query are sent to the model
+        self.tool_selector=ToolSelector(top_k=tool_top_k,always=[tool.__name__ for tool in local_tools]+['find_tools']) if tool_top_k>0 else None
+        tools=local_tools+[find_tools] if self.tool_selector else local_tools
+
+        self.agent=Agent(self.llm, mcp_servers=[self.mcp_server],tools=tools,
+                         prepare_tools=self.tool_selector.prepare_tools if self.tool_selector else None, instructions="you are a helpful assistant that can help with tasks related to Notion\
                          you have access to a set of tools to help you with your tasks and a notes tool to improve your performance,\
                          you can use the notes to improve your performance and to help you with your tasks")
-    async def chat(self,query:str):
-        async with self.agent.run_mcp_servers():  
-            result = await self.agent.run(f"user query: {query}\n\n previous notes: {self.deps.agent_notes if self.deps.agent_notes else 'no previous notes'}",deps=self.deps, message_history=self.deps.messages)
-            self.deps.messages=result.all_messages()
+    @classmethod
+    async def create(cls, **kwargs):
+        """Build the agent in a worker thread, the schema fetch and client setup are blocking"""
+        return await asyncio.to_thread(cls, **kwargs)
+
+    async def _mirror_lookup(self,tool_name:str,lookup,remote_tool:str,arguments:dict):
+        """Answer from the mirror, or call `remote_tool` on a miss and answer from the mirror it fed,
+        with the remote result itself when it held nothing the mirror keeps"""
+        with metrics.timed("mirror_lookup"):
+            result=await lookup()
+        if result:
+            lookups.inc(tool=tool_name,outcome="hit")
+            return result
+        lookups.inc(tool=tool_name,outcome="miss")
+        if remote_tool not in {tool.name for tool in await self.mcp_server.list_tools()}:
+            return "Not found in the local copy of the workspace, use the Notion tools"
+        remote=await self.mcp_server.call_tool(remote_tool,arguments)
+        return await lookup() or remote
+
+    async def _apply_note(self,operation:NoteOperation)->str:
+        with metrics.timed("notes_update"):
+            if operation.note_id is None:
+                if not operation.content:
+                    return "Nothing to write"
+                note=await self.notes_store.add(self.namespace,operation.content)
+                return f"Note {note.id} added"
+            if operation.content is None:
+                found=await self.notes_store.delete(self.namespace,operation.note_id)
+                return f"Note {operation.note_id} deleted" if found else f"There is no note {operation.note_id}"
+            found=await self.notes_store.update(self.namespace,operation.note_id,operation.content) is not None
+            return f"Note {operation.note_id} updated" if found else f"There is no note {operation.note_id}"
+
+    async def _apply_pending_notes(self,session_id:str):
+        # Under the session lock, a later run of the session sees each operation either pending
+        # or applied, never both, and the tasks of two runs do not apply the same one twice
+        async with self.session_store.lock(self.namespace,session_id):
+            deps=await self.session_store.load(self.namespace,session_id)
+            if deps is None or not deps.pending_notes:
+                return
+            try:
+                while deps.pending_notes:
+                    await self._apply_note(deps.pending_notes[0])
+                    deps.pending_notes.pop(0)
+            except Exception:
+                # The rest stays pending in the session and is retried after the next turn
+                pass
+            await self.session_store.save(self.namespace,session_id,deps)
+
+    async def _wait_for_notes(self,session_id:str):
+        for task in self._notes_tasks.pop(session_id,[]):
+            await task
+
+    @asynccontextmanager
+    async def _run_scope(self,query:str,deps:Deps):
+        """Select the tools for `query` in the run with `deps` made inside this block. Yields the message
+        history to run it with, the session's and the request of the turn, with the notes it does not show"""
+        shown=shown_notes(deps.messages)
+        with metrics.timed("notes_retrieval"):
+            relevant=await self.notes_store.relevant(self.namespace,query,self.notes_top_k)
+            # Any note the history shows may have been updated or deleted since
+            notes=await self.notes_store.notes(self.namespace) if shown else relevant
+        deps.tool_selection=self.tool_selector.select(query) if self.tool_selector else None
+        try:
+            yield [*deps.messages,turn_request(query,notes_update(shown,relevant,notes))]
+        finally:
+            deps.tool_selection=None
+
+    async def _start_run(self,session_id:str)->Deps:
+        await self.mcp_session.ensure_connected()
+        with metrics.timed("session_load"):
+            deps=await self.session_store.load(self.namespace,session_id)
+        return deps if deps is not None else Deps(messages=[])
+
+    async def _finish_run(self,session_id:str,deps:Deps,result):
+        # Instructions are rebuilt for every request, the notes stay with the turn they were sent in
+        # so the next turn's requests start with what this one sent
+        messages=[replace(message,instructions=None) if isinstance(message,ModelRequest) else message for message in result.all_messages()]
+        with metrics.timed("history_compact"):
+            deps.messages,deps.message_tokens=await self.history.compact(messages,deps.message_tokens)
+        with metrics.timed("session_save"):
+            await self.session_store.save(self.namespace,session_id,deps)
+        if deps.pending_notes:
+            self._notes_tasks.setdefault(session_id,[]).append(asyncio.create_task(self._apply_pending_notes(session_id)))
+
+    async def chat(self,query:str,session_id:str="default"):
+        # A deferred notes update from the previous turn must land before its notes are used
+        await self._wait_for_notes(session_id)
+        # Runs of the same session are serialized, different sessions run concurrently
+        async with self.session_store.lock(self.namespace,session_id):
+            deps=await self._start_run(session_id)
+            async with self._run_scope(query,deps) as messages:
+                result = await self.agent.run(deps=deps, message_history=messages)
+            await self._finish_run(session_id,deps,result)
         return result.output
 
-    def reset(self):
-        self.deps.messages=[]
-        self.deps.agent_notes=""
\ No newline at end of file
+    async def chat_stream(self,query:str,session_id:str="default"):
+        """Run the agent and yield events as they happen: text deltas, tool calls and
+        their results, then a final event with the complete response"""
+        await self._wait_for_notes(session_id)
+        async with self.session_store.lock(self.namespace,session_id):
+            deps=await self._start_run(session_id)
+            async with self._run_scope(query,deps) as messages:
+                async with self.agent.iter(deps=deps, message_history=messages) as run:
+                    async for node in run:
+                        if Agent.is_model_request_node(node):
+                            async with node.stream(run.ctx) as request_stream:
+                                async for event in request_stream:
+                                    if isinstance(event,PartStartEvent) and isinstance(event.part,TextPart) and event.part.content:
+                                        yield {"type":"text_delta","content":event.part.content}
+                                    elif isinstance(event,PartDeltaEvent) and isinstance(event.delta,TextPartDelta) and event.delta.content_delta:
+                                        yield {"type":"text_delta","content":event.delta.content_delta}
+                        elif Agent.is_call_tools_node(node):
+                            async with node.stream(run.ctx) as tools_stream:
+                                async for event in tools_stream:
+                                    if isinstance(event,FunctionToolCallEvent):
+                                        yield {"type":"tool_call","tool_name":event.part.tool_name,"tool_call_id":event.part.tool_call_id,"args":event.part.args_as_dict()}
+                                    elif isinstance(event,FunctionToolResultEvent):
+                                        content=event.result.model_response_str() if isinstance(event.result,ToolReturnPart) else event.result.model_response()
+                                        yield {"type":"tool_result","tool_name":event.result.tool_name,"tool_call_id":event.tool_call_id,"content":content}
+            await self._finish_run(session_id,deps,run.result)
+        yield {"type":"final","response":run.result.output}
+
+    async def run_isolated(self,query:str):
+        """Run a query without any conversation state, for independent batch items.
+        Shares the agent's MCP session and model client with regular chats"""
+        await self.mcp_session.ensure_connected()
+        deps=Deps(messages=[])
+        async with self._run_scope(query,deps) as messages:
+            result=await self.agent.run(deps=deps,message_history=messages)
+        # There is no session to keep deferred note changes in, apply them now
+        for operation in deps.pending_notes:
+            await self._apply_note(operation)
+        return result.output
+
+    async def aclose(self):
+        """Finish pending notes updates and close the persistent MCP session"""
+        for session_id in list(self._notes_tasks):
+            await self._wait_for_notes(session_id)
+        await self.mcp_session.aclose()
+
+    async def reset(self,session_id:str|None=None):
+        """Forget one session, or every session of this agent when no id is given"""
+        for task_session_id in list(self._notes_tasks):
+            if session_id in (None,task_session_id):
+                for task in self._notes_tasks.pop(task_session_id):
+                    task.cancel()
+        await self.session_store.clear(namespace=self.namespace,session_id=session_id)
@@ -1,15 +1,37 @@
-from notion_agent import Notionagent
-from fastapi import FastAPI, HTTPException, Form
-from fastapi.responses import HTMLResponse
+import os
+
+# pydantic imports every installed plugin when the first model is built, logfire's alone
+# adds half a second to startup and is only used for validation tracing, which is off here
+os.environ.setdefault('PYDANTIC_DISABLE_PLUGINS', 'logfire-plugin')
+
+from utils.schema_cache import SchemaCache, RENDER_FIELDS
+from utils.session_store import SessionStore, InMemorySessionStore, SQLiteSessionStore
+from utils.notes_store import NotesStore
+from utils.notion_mirror import NotionMirror
+from utils.tool_results import ToolResultStore
+from utils.resilience import RetryPolicy, UpstreamError, deadline, breaker_states
+from utils.http_pool import HTTPPool
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.batch import run_batch, summarize, BatchJobs
+from utils.singleflight import SingleFlight
+from utils import metrics
+from fastapi import FastAPI, HTTPException, Form, Cookie, Header, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Dict, Optional, List, Union
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, List, Union
 from dotenv import load_dotenv
-import os
+import asyncio
 import hashlib
-import uvicorn
+import json
+from collections import OrderedDict
+from contextlib import aclosing, asynccontextmanager, contextmanager, suppress, AsyncExitStack
 import time
+import uuid
 
-import logfire
+# The agent stack (pydantic-ai, OpenAI, MCP, Composio) takes seconds to import, it is
+# loaded on first use or by the /ready probe so the server starts accepting requests early
+if TYPE_CHECKING:
+    from notion_agent import Notionagent
 
 # Load environment variables
 load_dotenv()
@@ -17,12 +39,45 @@ load_dotenv()
 # Configure logfire if token is available
 logfire_token = os.getenv('logfire_token')
 if logfire_token:
+    import logfire
+
     logfire.configure(token=logfire_token)
     logfire.instrument_pydantic_ai()
 
 startup_time = time.time()
 
 
+def load_agent_module():
+    import notion_agent
+    return notion_agent
+
+_warmup: Optional[asyncio.Task] = None
+
+def warm_up() -> asyncio.Task:
+    """Import the agent stack in a worker thread, once"""
+    global _warmup
+    if _warmup is None:
+        _warmup = asyncio.create_task(asyncio.to_thread(load_agent_module))
+    return _warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background, /health answers right away and /ready once it is done
+    if os.getenv('prewarm', 'true').lower() == 'true':
+        warm_up()
+    yield
+    # Stop background batch jobs and close the persistent MCP sessions held by pooled agents
+    await batch_jobs.aclose()
+    await key_cache.aclose()
+    await http_pool.aclose()
+    notes_store.close()
+    if mirror:
+        mirror.close()
+    if result_store:
+        result_store.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Notion Agent API", 
@@ -35,12 +90,19 @@ app = FastAPI(
     
     **GET Requests:**
     - `/health` - Check API health status and uptime
+    - `/ready` - Readiness probe, ready once the agent stack is loaded
     - `/api-docs` - Get comprehensive API documentation
     
     **POST Requests:**
     - `/chat` - Main chat endpoint for text-based interactions with Notion
+    - `/chat/stream` - Streaming chat endpoint (Server-Sent Events)
+    - `/chat/batch` - Run many independent queries with bounded parallelism
+    - `/chat/batch/jobs` - Submit a batch job, poll it with `GET /chat/batch/jobs/{job_id}`
     - `/reset` - Reset Notion Agent's memory and conversation history
     
+    **WebSocket:**
+    - `/ws/chat` - Chat over one connection, keys sent once, streamed events and cancellation
+    
     ### Features:
     - Text-based chat interactions
     - Notion workspace integration
@@ -51,7 +113,8 @@ app = FastAPI(
     """,
     version="0.1.0",
     docs_url=None,  # Disable built-in docs
-    redoc_url=None  # Disable redoc as well
+    redoc_url=None,  # Disable redoc as well
+    lifespan=lifespan
 )
 
 # KeyCache will handle agent initialization
@@ -70,10 +133,52 @@ class APIDocumentation(BaseModel):
     description: str
     endpoints: List[EndpointInfo]
 
+def _retry_policy(upstream: str, timeout: float) -> RetryPolicy:
+    """Resilience settings of an upstream from the `<upstream>_timeout`, `<upstream>_retries`
+    and `<upstream>_hedge_delay` variables (0 turns a timeout or hedging off), backoff and
+    circuit breaker settings are shared"""
+    timeout = float(os.getenv(f'{upstream}_timeout', str(timeout)))
+    hedge_delay = float(os.getenv(f'{upstream}_hedge_delay', '0'))
+    return RetryPolicy(
+        timeout=timeout or None,
+        retries=int(os.getenv(f'{upstream}_retries', '2')),
+        base_delay=float(os.getenv('retry_base_delay', '0.25')),
+        max_delay=float(os.getenv('retry_max_delay', '4')),
+        hedge_delay=hedge_delay or None,
+        failure_threshold=int(os.getenv('breaker_failure_threshold', '5')),
+        reset_timeout=float(os.getenv('breaker_reset_timeout', '30')),
+    )
+
 class KeyCache:
-    def __init__(self):
-        self._last_keys_hash = None
-        self._notion_agent = None
+    """Bounded pool of Notion agents keyed by the hash of the tenant's API keys.
+
+    Agents are evicted least-recently-used once `max_size` is reached, or when
+    they have been idle for longer than `idle_ttl` seconds. Agents held with
+    `lease` are never evicted.
+    """
+    def __init__(self, max_size: int = 32, idle_ttl: float = 1800, schema_cache: Optional[SchemaCache] = None,
+                 session_store: Optional[SessionStore] = None, notes_store: Optional[NotesStore] = None,
+                 mirror: Optional[NotionMirror] = None, http_pool: Optional[HTTPPool] = None,
+                 result_store: Optional[ToolResultStore] = None):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.schema_cache = schema_cache
+        # Sessions and notes outlive pooled agents, each tenant's are namespaced by its keys hash
+        self.session_store = session_store or InMemorySessionStore()
+        self.notes_store = notes_store or NotesStore()
+        self.mirror = mirror
+        # Connections to OpenAI and the MCP server outlive pooled agents too
+        self.http_pool = http_pool
+        self.result_store = result_store
+        # keys hash -> (agent, last used timestamp), ordered from least to most recently used
+        self._agents: "OrderedDict[str, tuple[Notionagent, float]]" = OrderedDict()
+        # Only one request per tenant builds its agent, concurrent ones wait for that build
+        self._builds = SingleFlight("agent_build")
+        # keys hash -> number of runs and long-lived clients (WebSockets) holding the agent, never evicted meanwhile
+        self._leases: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
     
     def _compute_keys_hash(self, api_keys: Dict[str, str]) -> str:
         # Sort keys to ensure consistent hashing regardless of order
@@ -82,30 +187,242 @@ class KeyCache:
         keys_str = "|".join(f"{k}:{v}" for k, v in sorted_keys.items() if v is not None)
         # Compute hash
         return hashlib.sha256(keys_str.encode()).hexdigest()
+
+    async def _evict(self, keys_hashes: List[str]):
+        # Entries leave the pool before the first await, so a concurrent eviction
+        # working from the same snapshot skips them instead of closing them twice
+        evicted = [self._agents.pop(h)[0] for h in keys_hashes if h in self._agents]
+        self.evictions += len(evicted)
+        for notion_agent in evicted:
+            await notion_agent.aclose()
+
+    async def _evict_expired(self, now: float):
+        await self._evict([h for h, (_, last_used) in self._agents.items() if now - last_used > self.idle_ttl and h not in self._leases])
     
-    def get_notion_agent(self, api_keys: Dict[str, str]) -> Notionagent:
+    async def get_notion_agent(self, api_keys: Dict[str, str]) -> "Notionagent":
+        with metrics.timed("agent_lookup"):
+            return await self._get_or_create(api_keys)
+
+    async def _get_or_create(self, api_keys: Dict[str, str]) -> "Notionagent":
         current_hash = self._compute_keys_hash(api_keys)
-        
-        # Initialize or reinitialize if keys have changed
-        if self._last_keys_hash != current_hash:
-            # Filter out None values for initialization
-            init_keys = {k: v for k, v in api_keys.items() if v is not None}
-            # Initialize with MCP server URL and API keys
-            self._notion_agent = Notionagent(
+        now = time.time()
+        await self._evict_expired(now)
+
+        entry = self._agents.get(current_hash)
+        if entry is not None:
+            self.hits += 1
+            self._agents[current_hash] = (entry[0], now)
+            self._agents.move_to_end(current_hash)
+            return entry[0]
+
+        return await self._builds.do(current_hash, lambda: self._build(current_hash, api_keys))
+
+    async def _build(self, current_hash: str, api_keys: Dict[str, str]) -> "Notionagent":
+        self.misses += 1
+        # Filter out None values for initialization
+        init_keys = {k: v for k, v in api_keys.items() if v is not None}
+        # Initialize with MCP server URL and API keys, off the event loop
+        with metrics.timed("agent_construction"):
+            agent_module = await warm_up()
+            notion_agent = await agent_module.Notionagent.create(
                 mcp_server_url=os.getenv('mcp_server_url'),
-                api_keys=init_keys
+                api_keys=init_keys,
+                mcp_ping_interval=float(os.getenv('mcp_ping_interval', '30')),
+                schema_cache=self.schema_cache,
+                deferred_notes=os.getenv('deferred_notes', 'false').lower() == 'true',
+                history_token_budget=int(os.getenv('history_token_budget', '16000')),
+                history_max_tool_result_tokens=int(os.getenv('history_max_tool_result_tokens', '2000')),
+                summarize_history=os.getenv('summarize_history', 'false').lower() == 'true',
+                session_store=self.session_store,
+                namespace=current_hash,
+                tool_cache_ttl=float(os.getenv('tool_cache_ttl', '0')),
+                tool_cache_size=int(os.getenv('tool_cache_size', '256')),
+                tool_top_k=int(os.getenv('tool_top_k', '0')),
+                notes_store=self.notes_store,
+                notes_top_k=int(os.getenv('notes_top_k', '5')),
+                mirror=self.mirror,
+                model_policy=_retry_policy('model', 60),
+                mcp_policy=_retry_policy('mcp', 30),
+                http_pool=self.http_pool,
+                result_store=self.result_store
             )
-            self._last_keys_hash = current_hash
-        
-        return self._notion_agent
+        # Leased agents stay, the pool goes over max_size when every agent is leased
+        evictable = [h for h in self._agents if h not in self._leases]
+        overflow = len(self._agents) + 1 - self.max_size
+        self._agents[current_hash] = (notion_agent, time.time())
+        await self._evict(evictable[:max(overflow, 0)])
+        return notion_agent
+
+    @asynccontextmanager
+    async def lease(self, api_keys: Dict[str, str]) -> AsyncIterator["Notionagent"]:
+        """Hold the tenant's agent for a run or a long-lived client, it is not evicted until released"""
+        keys_hash = self._compute_keys_hash(api_keys)
+        while True:
+            notion_agent = await self.get_notion_agent(api_keys)
+            # A build that finished while this one waited for the agent may have evicted it
+            entry = self._agents.get(keys_hash)
+            if entry is not None and entry[0] is notion_agent:
+                break
+        with self._held(keys_hash, notion_agent):
+            yield notion_agent
+
+    @contextmanager
+    def _held(self, keys_hash: str, notion_agent: "Notionagent") -> Iterator[None]:
+        self._leases[keys_hash] = self._leases.get(keys_hash, 0) + 1
+        try:
+            yield
+        finally:
+            self._leases[keys_hash] -= 1
+            if not self._leases[keys_hash]:
+                del self._leases[keys_hash]
+            if keys_hash in self._agents:
+                # Idle from now on
+                self._agents[keys_hash] = (notion_agent, time.time())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._agents),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced_builds": self._builds.shared,
+            "leased": len(self._leases),
+        }
     
-    def reset(self):
-        if self._notion_agent:
-            self._notion_agent.reset()
-        self._last_keys_hash = None
+    async def reset(self, api_keys: Dict[str, str], session_id: Optional[str] = None, clear_notes: bool = False):
+        """Forget one session, or every session, of the tenant with these keys"""
+        keys_hash = self._compute_keys_hash(api_keys)
+        entry = self._agents.get(keys_hash)
+        if entry is not None:
+            # Also cancels the agent's pending notes updates of those sessions
+            with self._held(keys_hash, entry[0]):
+                await entry[0].reset(session_id)
+        else:
+            await self.session_store.clear(namespace=keys_hash, session_id=session_id)
+        if clear_notes:
+            await self.notes_store.clear(keys_hash)
+
+    async def aclose(self):
+        """Close the MCP sessions of every pooled agent"""
+        while self._agents:
+            keys_hash, (notion_agent, _) = self._agents.popitem(last=False)
+            await notion_agent.aclose()
+
+# Composio action schemas are shared by every tenant
+schema_cache = SchemaCache(
+    ttl=float(os.getenv('schema_cache_ttl', str(24 * 3600))),
+    snapshot_path=os.getenv('schema_snapshot_path'),
+)
+
+worker_id = str(os.getpid())
+
+# Conversation state, in SQLite by default so every worker process sees the same sessions (a worker
+# cannot tell how many others uvicorn started), session_store=memory keeps it in a single worker
+session_store_path = os.getenv('session_store_path', 'sessions.db')
+if os.getenv('session_store', 'sqlite') == 'memory':
+    session_store = InMemorySessionStore(max_sessions=int(os.getenv('session_store_max_sessions', '1000')))
+else:
+    session_store = SQLiteSessionStore(
+        session_store_path,
+        deps_type='notion_agent:Deps',
+        lease_ttl=float(os.getenv('session_lease_ttl', '600'))
+    )
+
+# Agent notes of every tenant, kept across restarts and shared by workers
+notes_store = NotesStore(os.getenv('notes_store_path', 'notes.db'))
+
+# Opt-in local mirror of page titles and database schemas, answering lookups without a Notion round trip
+mirror = NotionMirror(
+    os.getenv('notion_mirror_path', 'mirror.db'),
+    max_age=float(os.getenv('notion_mirror_max_age', '3600')),
+) if os.getenv('notion_mirror', 'false').lower() == 'true' else None
+
+# Full Notion tool results behind the compact ones sent to the model, fetched back by handle
+result_store = ToolResultStore(
+    os.getenv('tool_results_path', 'tool_results.db'),
+    max_tokens=int(os.getenv('tool_result_max_tokens', '2000')),
+    max_age=float(os.getenv('tool_results_max_age', '86400')),
+) if os.getenv('tool_result_projection', 'true').lower() == 'true' else None
+
+# Keep-alive connections to OpenAI and the MCP server, shared by every tenant's agent
+http_pool = HTTPPool(
+    max_connections=int(os.getenv('http_max_connections', '100')),
+    max_keepalive_connections=int(os.getenv('http_max_keepalive_connections', '20')),
+    keepalive_expiry=float(os.getenv('http_keepalive_expiry', '30')),
+    http2=os.getenv('http2', 'false').lower() == 'true',
+)
 
 # Initialize key cache
-key_cache = KeyCache()
+key_cache = KeyCache(
+    max_size=int(os.getenv('agent_pool_size', '32')),
+    idle_ttl=float(os.getenv('agent_idle_ttl', '1800')),
+    schema_cache=schema_cache,
+    session_store=session_store,
+    notes_store=notes_store,
+    mirror=mirror,
+    http_pool=http_pool,
+    result_store=result_store,
+)
+
+# Concurrent identical /chat requests marked `coalesce` and /tool-schemas loads run once
+chat_flights = SingleFlight("chat")
+schema_loads = SingleFlight("tool_schemas")
+
+# Concurrency caps and wait queue for agent runs
+admission = AdmissionController(
+    max_concurrent=int(os.getenv('max_concurrent_requests', '32')),
+    max_concurrent_per_tenant=int(os.getenv('max_concurrent_requests_per_tenant', '4')),
+    max_queue=int(os.getenv('max_queued_requests', '64')),
+    max_queue_per_tenant=int(os.getenv('max_queued_requests_per_tenant', '16')),
+    queue_timeout=float(os.getenv('queue_timeout', '10')),
+)
+
+# Time budget of the upstream calls of one /chat or /chat/stream request, 0 for none
+request_budget = float(os.getenv('request_budget', '120'))
+
+def _upstream_error(e: UpstreamError) -> HTTPException:
+    headers = {"Retry-After": str(e.retry_after)} if e.retry_after else None
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+
+async def _admit(stack: AsyncExitStack, api_keys: Dict[str, str]):
+    """Wait for a run slot for this tenant, held until `stack` is closed"""
+    await _admit_tenant(stack, key_cache._compute_keys_hash(api_keys))
+
+async def _admit_tenant(stack: AsyncExitStack, keys_hash: str):
+    try:
+        with metrics.timed("admission_wait"):
+            await stack.enter_async_context(admission.admit(keys_hash))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+SESSION_COOKIE = "notion_session"
+
+def _session_affinity(response: Response, session_id: str):
+    """Echo the session id as a header and a cookie, load balancers can route on the cookie
+    so a session keeps hitting the worker with its agent and MCP session warm"""
+    response.headers["X-Session-Id"] = session_id
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+
+# Per-stage timings of /chat in a Server-Timing header, off by default as it exposes internals
+server_timing = os.getenv('server_timing', 'false').lower() == 'true'
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    start = time.perf_counter()
+    with metrics.request_breakdown() as breakdown:
+        response = await call_next(request)
+    # Label by route template so ids in the path don't create a series each
+    route = request.scope.get("route")
+    metrics.http_requests.observe(
+        time.perf_counter() - start,
+        route=route.path if route else "unmatched",
+        status=str(response.status_code)
+    )
+    if server_timing and request.url.path == "/chat" and breakdown:
+        response.headers["Server-Timing"] = metrics.server_timing(breakdown)
+    response.headers["X-Worker-Id"] = worker_id
+    return response
 
 @app.get("/health")
 async def health_check():
@@ -113,61 +430,403 @@ async def health_check():
         "status": "healthy",
         "uptime": time.time() - startup_time,
         "version": "0.1.0",
-        "service": "Notion Agent API"
+        "service": "Notion Agent API",
+        "worker_id": worker_id,
+        "agent_pool": key_cache.stats(),
+        "admission": admission.stats(),
+        "upstreams": breaker_states(),
+        "http_pool": http_pool.stats(),
+        "coalescing": {group.name: group.stats() for group in (chat_flights, schema_loads)}
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the agent stack is imported, starting the import if needed"""
+    warmup = warm_up()
+    if not warmup.done():
+        return JSONResponse({"status": "starting"}, status_code=503)
+    if warmup.exception() is not None:
+        return JSONResponse({"status": "failed", "detail": str(warmup.exception())}, status_code=503)
+    return {"status": "ready", "startup_seconds": time.time() - startup_time}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics of this worker"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/chat")
 async def chat(
     query: str = Form(...),
     openai_api_key: str = Form(...),
     composio_key: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    coalesce: bool = Form(False),
+    notion_session: Optional[str] = Cookie(None),
 ):
+    session_id = session_id or notion_session or "default"
     try:
         api_keys = {
             "openai_api_key": openai_api_key,
             "composio_key": composio_key
         }
-        
-        # Get or initialize Notion Agent instance based on keys
-        try:
-            notion_agent = key_cache.get_notion_agent(api_keys)
+
+        async def run_chat() -> str:
+            async with AsyncExitStack() as admission_scope:
+                await _admit(admission_scope, api_keys)
+
+                # Get or initialize Notion Agent instance based on keys, leased so it is not evicted mid-run
+                try:
+                    notion_agent = await admission_scope.enter_async_context(key_cache.lease(api_keys))
+                
+                except Exception as e:
+                    raise HTTPException(status_code=500, detail=f"Error getting Notion Agent instance: {str(e)}")
             
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error getting Notion Agent instance: {str(e)}")
-        
-        # Use the chat method from Notionagent
-        response = await notion_agent.chat(query)
+                # Use the chat method from Notionagent
+                return await notion_agent.chat(query, session_id=session_id)
+
+        with deadline(request_budget):
+            if coalesce:
+                # Identical requests already in flight (a retry, a dashboard refresh) share one run
+                chat_key = (key_cache._compute_keys_hash(api_keys), session_id, query)
+                agent_response = await chat_flights.do(chat_key, run_chat)
+            else:
+                agent_response = await run_chat()
         
-        return {
-            "response": response
-        }
+        with metrics.timed("response_serialization"):
+            response = JSONResponse({
+                "response": agent_response
+            })
+        _session_affinity(response, session_id)
+        return response
     
+    except HTTPException:
+        raise
+    except UpstreamError as e:
+        raise _upstream_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in chat: {str(e)}")
 
-@app.post("/reset")
-async def reset_notion_agent():
+def _sse_event(event: Dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+def _http_error_event(e: HTTPException) -> Dict:
+    retry_after = (e.headers or {}).get("Retry-After")
+    return {"type": "error", "status": e.status_code, "detail": e.detail,
+            **({"retry_after": float(retry_after)} if retry_after else {})}
+
+@app.post("/chat/stream")
+async def chat_stream(
+    query: str = Form(...),
+    openai_api_key: str = Form(...),
+    composio_key: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    notion_session: Optional[str] = Cookie(None),
+):
+    session_id = session_id or notion_session or "default"
+    api_keys = {
+        "openai_api_key": openai_api_key,
+        "composio_key": composio_key
+    }
+    async def events():
+        # Headers are already sent, so errors are reported as a stream event. The run slot and the
+        # agent lease are taken once the body is iterated, a response that is never sent holds neither
+        try:
+            async with AsyncExitStack() as run_scope:
+                await _admit(run_scope, api_keys)
+                try:
+                    notion_agent = await run_scope.enter_async_context(key_cache.lease(api_keys))
+                except Exception as e:
+                    raise HTTPException(status_code=500, detail=f"Error getting Notion Agent instance: {str(e)}")
+                with deadline(request_budget):
+                    # Closed here even when the client goes away mid-stream, releasing the session lock
+                    async with aclosing(notion_agent.chat_stream(query, session_id=session_id)) as run:
+                        async for event in run:
+                            yield _sse_event(event)
+        except HTTPException as e:
+            yield _sse_event(_http_error_event(e))
+        except UpstreamError as e:
+            yield _sse_event({"type": "error", "status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            yield _sse_event({"type": "error", "detail": f"Error in chat: {str(e)}"})
+
+    stream = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    _session_affinity(stream, session_id)
+    return stream
+
+# Seconds a /ws/chat client has to send its keys after connecting
+ws_auth_timeout = float(os.getenv('ws_auth_timeout', '10'))
+
+ws_connections = metrics.registry.gauge("notion_agent_ws_connections", "Open /ws/chat connections")
+ws_runs = metrics.registry.counter("notion_agent_ws_runs", "Runs over /ws/chat by outcome")
+
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket, notion_session: Optional[str] = Cookie(None)):
+    """Chat over one WebSocket: the keys are sent once, the tenant's agent and MCP
+    session stay leased for the life of the socket and runs are multiplexed by id"""
+    await websocket.accept()
     try:
-        key_cache.reset()
-        return {"status": "success", "message": "Notion Agent memory reset successfully"}
+        auth = json.loads(await asyncio.wait_for(websocket.receive_text(), ws_auth_timeout))
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, KeyError):
+        auth = None
+    if not isinstance(auth, dict) or auth.get("type") != "auth" or not auth.get("openai_api_key") or not auth.get("composio_key"):
+        await websocket.send_json({"type": "error", "status": 401, "detail": "First message must be an auth message with the keys"})
+        await websocket.close(code=1008)
+        return
+    api_keys = {
+        "openai_api_key": auth["openai_api_key"],
+        "composio_key": auth["composio_key"]
+    }
+    keys_hash = key_cache._compute_keys_hash(api_keys)
+    session_id = auth.get("session_id") or notion_session or "default"
+
+    async with AsyncExitStack() as stack:
+        try:
+            notion_agent = await stack.enter_async_context(key_cache.lease(api_keys))
+        except Exception as e:
+            await websocket.send_json({"type": "error", "status": 500, "detail": f"Error getting Notion Agent instance: {str(e)}"})
+            await websocket.close(code=1011)
+            return
+        ws_connections.inc()
+        stack.callback(ws_connections.inc, -1)
+
+        send_lock = asyncio.Lock()
+        runs: Dict[str, asyncio.Task] = {}
+
+        async def send(event: Dict):
+            # Events of concurrent runs must not interleave within a frame
+            async with send_lock:
+                await websocket.send_text(json.dumps(event, default=str))
+
+        async def run(run_id: str, query: str, run_session_id: str):
+            error = None
+            try:
+                async with AsyncExitStack() as admission_scope:
+                    await _admit_tenant(admission_scope, keys_hash)
+                    with deadline(request_budget):
+                        # Closed here when `send` fails or the run is cancelled, releasing the session lock
+                        async with aclosing(notion_agent.chat_stream(query, session_id=run_session_id)) as stream:
+                            async for event in stream:
+                                await send({**event, "id": run_id})
+                ws_runs.inc(outcome="completed")
+            except asyncio.CancelledError:
+                ws_runs.inc(outcome="cancelled")
+                # Fails when the socket is already gone, which is why the run was cancelled
+                with suppress(Exception):
+                    await send({"type": "cancelled", "id": run_id})
+                raise
+            except HTTPException as e:
+                ws_runs.inc(outcome="rejected")
+                error = {**_http_error_event(e), "id": run_id}
+            except UpstreamError as e:
+                ws_runs.inc(outcome="error")
+                error = {"type": "error", "id": run_id, "status": e.status_code, "detail": e.detail}
+            except Exception as e:
+                ws_runs.inc(outcome="error")
+                error = {"type": "error", "id": run_id, "detail": f"Error in chat: {str(e)}"}
+            finally:
+                runs.pop(run_id, None)
+            if error is not None:
+                with suppress(Exception):
+                    await send(error)
+
+        try:
+            await send({"type": "ready", "session_id": session_id})
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                    kind = message["type"]
+                except (ValueError, KeyError, TypeError):
+                    await send({"type": "error", "status": 400, "detail": "Messages must be JSON objects with a type"})
+                    continue
+                if kind == "chat":
+                    run_id = str(message.get("id") or uuid.uuid4().hex)
+                    if not message.get("query"):
+                        await send({"type": "error", "id": run_id, "status": 400, "detail": "query must not be empty"})
+                    elif run_id in runs:
+                        await send({"type": "error", "id": run_id, "status": 409, "detail": "A run with this id is in progress"})
+                    else:
+                        runs[run_id] = asyncio.create_task(
+                            run(run_id, message["query"], message.get("session_id") or session_id)
+                        )
+                elif kind == "cancel":
+                    task = runs.get(str(message.get("id")))
+                    if task is None:
+                        await send({"type": "error", "id": message.get("id"), "status": 404, "detail": "No run with this id is in progress"})
+                    else:
+                        task.cancel()
+                elif kind == "ping":
+                    await send({"type": "pong"})
+                else:
+                    await send({"type": "error", "status": 400, "detail": f"Unknown message type: {kind}"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Runs of a closed socket have no one to answer
+            pending = list(runs.values())
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+# Batch jobs share the session database so any worker can answer a poll
+batch_jobs = BatchJobs(
+    ttl=float(os.getenv('batch_job_ttl', '3600')),
+    path=session_store_path if isinstance(session_store, SQLiteSessionStore) else None
+)
+batch_max_parallel = int(os.getenv('batch_max_parallel', '16'))
+
+async def _batch_run(lease_scope: AsyncExitStack, openai_api_key: str, composio_key: str, queries: List[str],
+                     max_parallel: int) -> tuple[Callable[[str], Awaitable[str]], int]:
+    """Lease the tenant's agent until `lease_scope` is closed, so it is not evicted while the batch runs.
+    Returns the run of one item, admitted like a /chat request, and the items to run at once"""
+    if not queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if not 1 <= max_parallel <= batch_max_parallel:
+        raise HTTPException(status_code=400, detail=f"max_parallel must be between 1 and {batch_max_parallel}")
+    api_keys = {
+        "openai_api_key": openai_api_key,
+        "composio_key": composio_key
+    }
+    try:
+        notion_agent = await lease_scope.enter_async_context(key_cache.lease(api_keys))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Error getting Notion Agent instance: {str(e)}")
+    keys_hash = key_cache._compute_keys_hash(api_keys)
 
-@app.post("/tool-schemas")
-async def get_tool_schemas(
+    async def run_item(query: str) -> str:
+        async with AsyncExitStack() as admission_scope:
+            await _admit_tenant(admission_scope, keys_hash)
+            return await notion_agent.run_isolated(query)
+
+    # Items over the tenant's run slots would only wait in the admission queue
+    return run_item, min(max_parallel, admission.max_concurrent_per_tenant)
+
+@app.post("/chat/batch")
+async def chat_batch(
+    queries: List[str] = Form(...),
+    openai_api_key: str = Form(...),
+    composio_key: str = Form(...),
+    max_parallel: int = Form(4),
+):
+    # The agent is leased until the stream is finished
+    lease_scope = AsyncExitStack()
+    run_item, parallel = await _batch_run(lease_scope, openai_api_key, composio_key, queries, max_parallel)
+
+    async def results():
+        async with lease_scope:
+            start = time.perf_counter()
+            completed = []
+            async for result in run_batch(run_item, queries, parallel):
+                completed.append(result)
+                yield json.dumps({"type": "item", **result}, default=str) + "\n"
+            yield json.dumps({"type": "summary", **summarize(completed, time.perf_counter() - start)}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/chat/batch/jobs", status_code=202)
+async def submit_batch_job(
+    queries: List[str] = Form(...),
+    openai_api_key: str = Form(...),
+    composio_key: str = Form(...),
+    max_parallel: int = Form(4),
+):
+    # The agent is leased until the job is finished
+    lease_scope = AsyncExitStack()
+    run_item, parallel = await _batch_run(lease_scope, openai_api_key, composio_key, queries, max_parallel)
+    job = batch_jobs.submit(run_item, queries, parallel, scope=lease_scope)
+    return {"job_id": job.id, "status": job.status, "total": job.total}
+
+@app.get("/chat/batch/jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    job = await batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired batch job")
+    return job
+
+@app.post("/reset")
+async def reset_notion_agent(
     openai_api_key: str = Form(...),
     composio_key: str = Form(...),
+    session_id: Optional[str] = Form(None),
+    clear_notes: bool = Form(False),
 ):
+    api_keys = {
+        "openai_api_key": openai_api_key,
+        "composio_key": composio_key
+    }
     try:
-        api_keys = {
-            "openai_api_key": openai_api_key,
-            "composio_key": composio_key
-        }
-        
-        notion_agent = key_cache.get_notion_agent(api_keys)
-        return {"tool_schemas": notion_agent.tool_shemas}
+        await key_cache.reset(api_keys, session_id, clear_notes=clear_notes)
+        if session_id:
+            return {"status": "success", "message": f"Notion Agent memory reset successfully for session {session_id}"}
+        return {"status": "success", "message": "Notion Agent memory reset successfully"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving tool schemas: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as the ETag covers the JSON whatever its encoding
+    return "*" in candidates or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]
+
+async def _tool_schemas(request: Request, composio_key: Optional[str], fields: str, offset: int, limit: Optional[int]):
+    """Serve a page of the Notion catalog from the schema cache, without building an agent.
+    A Composio key is only needed while nothing is cached, or to refresh expired schemas"""
+    if fields not in RENDER_FIELDS:
+        raise HTTPException(status_code=400, detail=f"fields must be one of {', '.join(RENDER_FIELDS)}")
+    if offset < 0 or (limit is not None and limit < 1):
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit >= 1")
+
+    agent_module = await warm_up()
+    app_name = agent_module.App.NOTION.slug
+    if composio_key:
+        load = lambda: asyncio.to_thread(agent_module.load_notion_schemas, agent_module.ComposioToolSet(api_key=composio_key), schema_cache)
+        try:
+            # Read-only, concurrent requests with the same key share one load
+            await schema_loads.do(hashlib.sha256(composio_key.encode()).hexdigest(), load)
+        except Exception as e:
+            # Expired schemas are still better than nothing
+            if not schema_cache.cached(app_name):
+                raise HTTPException(status_code=500, detail=f"Error retrieving tool schemas: {str(e)}")
+
+    rendering = schema_cache.render(app_name, fields, offset, limit)
+    if rendering is None:
+        raise HTTPException(status_code=400, detail="composio_key is required to load the tool schemas")
+
+    headers = {"ETag": rendering.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match"), rendering.etag):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(rendering.gzipped, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(rendering.body, media_type="application/json", headers=headers)
+
+@app.get("/tool-schemas")
+async def get_tool_schemas(
+    request: Request,
+    fields: str = "full",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    x_composio_key: Optional[str] = Header(None),
+):
+    return await _tool_schemas(request, x_composio_key, fields, offset, limit)
+
+@app.post("/tool-schemas")
+async def post_tool_schemas(
+    request: Request,
+    openai_api_key: Optional[str] = Form(None),
+    composio_key: Optional[str] = Form(None),
+    fields: str = Form("full"),
+    offset: int = Form(0),
+    limit: Optional[int] = Form(None),
+):
+    # Same response as GET, which replaced the {"tool_schemas": {"Notion Manager": {...}}} of the first
+    # version. openai_api_key is still accepted so those requests validate, the catalog does not need it
+    return await _tool_schemas(request, composio_key, fields, offset, limit)
 
 @app.get("/api-docs")
 async def get_markdown_documentation():
@@ -195,6 +854,8 @@ API for interacting with Notion AI Agent, including Notion workspace integration
 | query | string | Yes | The text query to process |
 | openai_api_key | string | Yes | OpenAI API key for language model |
 | composio_key | string | Yes | Composio API key for Notion workspace integration |
+| session_id | string | No | Conversation to continue, each session has its own history, notes are shared by the sessions of the same keys (default: the `notion_session` cookie, then `default`) |
+| coalesce | boolean | No | Safe to merge with identical requests (same keys, session and query) already in flight, which then share one run and its response, e.g. client retries (default: false) |
 
 **Example Request:**
 ```json
@@ -212,16 +873,114 @@ API for interacting with Notion AI Agent, including Notion workspace integration
 }
 ```
 
+The session id is returned in the `X-Session-Id` header and the `notion_session` cookie, so a load balancer can route a session to the same worker. Every response carries the `X-Worker-Id` of the worker that served it.
+
+---
+
+### POST `/chat/stream`
+**Description:** Streaming variant of `/chat`. Returns Server-Sent Events as the agent runs: `text_delta` events with pieces of the response, `tool_call` and `tool_result` events for each Notion tool call, then a `final` event with the complete response (or an `error` event).
+
+**Parameters:** Same as `/chat`, without `coalesce`
+
+**Example Response:**
+```
+event: tool_call
+data: {"type": "tool_call", "tool_name": "NOTION_SEARCH_NOTION_PAGE", "tool_call_id": "call_1", "args": {"query": "roadmap"}}
+
+event: text_delta
+data: {"type": "text_delta", "content": "I found "}
+
+event: final
+data: {"type": "final", "response": "I found the roadmap page..."}
+```
+
+---
+
+### WebSocket `/ws/chat`
+**Description:** Chat over one long-lived connection. The keys are sent once, in the first message, and the agent and its Notion MCP session stay warm for the life of the socket. Each `chat` message starts a run; its events are those of `/chat/stream` with the run's `id` added, and several runs can be in flight at once. Each run is admitted and time-bounded like a `/chat/stream` request.
+
+**Client messages:**
+| Type | Fields | Description |
+|------|--------|-------------|
+| auth | openai_api_key, composio_key, session_id (optional) | Must be the first message, within `ws_auth_timeout` seconds (default 10). Answered with `ready` |
+| chat | id (optional), query, session_id (optional) | Start a run, events carry its `id` (generated when missing) |
+| cancel | id | Stop a run in progress, answered with `cancelled` |
+| ping | | Answered with `pong` |
+
+**Server messages:** `ready`, `text_delta`, `tool_call`, `tool_result`, `final`, `cancelled`, `pong` and `error` (with a `status`, and `retry_after` when admission is refused). A missing or invalid `auth` message closes the socket with code 1008, a failure to build the agent with 1011.
+
+**Example:**
+```
+> {"type": "auth", "openai_api_key": "sk-...", "composio_key": "...", "session_id": "user-1"}
+< {"type": "ready", "session_id": "user-1"}
+> {"type": "chat", "id": "1", "query": "Find the roadmap page"}
+< {"type": "tool_call", "tool_name": "NOTION_SEARCH_NOTION_PAGE", "tool_call_id": "call_1", "args": {"query": "roadmap"}, "id": "1"}
+< {"type": "text_delta", "content": "I found ", "id": "1"}
+< {"type": "final", "response": "I found the roadmap page...", "id": "1"}
+```
+
+---
+
+### POST `/chat/batch`
+**Description:** Run many independent queries as isolated runs (no shared history) with bounded parallelism. Results are streamed as newline-delimited JSON as each item completes, followed by a summary line.
+
+**Parameters:**
+| Name | Type | Required | Description |
+|------|------|----------|-------------|
+| queries | string (repeated) | Yes | One form field per query |
+| openai_api_key | string | Yes | OpenAI API key for language model |
+| composio_key | string | Yes | Composio API key for Notion workspace integration |
+| max_parallel | integer | No | Queries run at the same time (default: 4), at most `max_concurrent_requests_per_tenant`; each query is admitted like a `/chat` request |
+
+**Example Response:**
+```
+{"type": "item", "index": 1, "query": "Add row B", "status": "ok", "response": "...", "elapsed": 2.1}
+{"type": "item", "index": 0, "query": "Add row A", "status": "error", "error": "...", "elapsed": 3.4}
+{"type": "summary", "total": 2, "succeeded": 1, "failed": 1, "elapsed": 3.4}
+```
+
+---
+
+### POST `/chat/batch/jobs`
+**Description:** Same as `/chat/batch` but runs in the background and returns immediately with a job id, for batches longer than the HTTP timeout.
+
+**Parameters:** Same as `/chat/batch`
+
+**Example Response:**
+```json
+{"job_id": "3f2c...", "status": "running", "total": 200}
+```
+
+---
+
+### GET `/chat/batch/jobs/{job_id}`
+**Description:** Poll a batch job: status (`running`, `completed`, `cancelled`), per-item results so far ordered by index, and a summary.
+
+**Example Response:**
+```json
+{"job_id": "3f2c...", "status": "running", "completed": 120, "total": 200, "results": [...], "summary": {"total": 120, "succeeded": 119, "failed": 1, "elapsed": 95.2}}
+```
+
 ---
 
 ### POST `/reset`
 **Description:** Reset Notion Agent's memory and conversation history
 
-**Parameters:** None
+**Parameters:**
+| Name | Type | Required | Description |
+|------|------|----------|-------------|
+| openai_api_key | string | Yes | OpenAI API key, with `composio_key` it selects the tenant to reset |
+| composio_key | string | Yes | Composio API key |
+| session_id | string | No | Only reset this session, all sessions of these keys are reset when omitted |
+| clear_notes | boolean | No | Also delete the agent notes of these keys and their history (default: false) |
 
 **Example Request:**
 ```json
-
+{
+    "openai_api_key": "sk-...",
+    "composio_key": "...",
+    "session_id": "user-42"
+}
 ```
 
 **Example Response:**
@@ -247,27 +1006,67 @@ API for interacting with Notion AI Agent, including Notion workspace integration
     "status": "healthy",
     "uptime": 3600.5,
     "version": "0.1.0",
-    "service": "Notion Agent API"
+    "service": "Notion Agent API",
+    "agent_pool": {"size": 2, "max_size": 32, "hits": 40, "misses": 2, "evictions": 0, "coalesced_builds": 3},
+    "http_pool": {"api.openai.com": {"requests": 120, "connections_opened": 4, "open_connections": 3, "reuse_rate": 0.97}},
+    "coalescing": {"chat": {"in_flight": 0, "leaders": 12, "shared": 5}, "tool_schemas": {"in_flight": 0, "leaders": 3, "shared": 9}}
+}
+```
+
+---
+
+### GET `/ready`
+**Description:** Readiness probe. The agent stack (pydantic-ai, OpenAI, MCP, Composio) is imported in the background after startup, this returns 503 until it is loaded and 200 afterwards, while `/health` answers as soon as the server is up. Set `prewarm=false` to only start loading on the first probe or request.
+
+**Example Response:**
+```json
+{
+    "status": "ready",
+    "startup_seconds": 3.1
 }
 ```
 
 ---
 
+### GET `/metrics`
+**Description:** Prometheus metrics of the worker that serves the request: latency histograms per stage (agent lookup and construction, admission wait, MCP connect, model requests, tool calls, notes retrieval and updates, session load and save, history compaction, response serialization), HTTP latency per route, tool call counts and local mirror hits and misses.
+
+Set `server_timing=true` to also get the stage timings of each `/chat` request in a `Server-Timing` header.
+
+**Example Response:**
+```
+# TYPE notion_agent_stage_seconds histogram
+notion_agent_stage_seconds_bucket{stage="model_request",le="0.5"} 12
+notion_agent_stage_seconds_sum{stage="model_request"} 3.21
+notion_agent_stage_seconds_count{stage="model_request"} 14
+notion_agent_tool_calls_total{outcome="ok",tool="NOTION_SEARCH_NOTION_PAGE"} 7
+```
+
+---
+
 ### GET `/tool-schemas`
-**Description:** Get available tool schemas for the Notion agent
+**Description:** The Notion tool catalog, served from the schema cache without building an agent. Responses carry an `ETag`, send it back in `If-None-Match` to get a `304 Not Modified` while the catalog is unchanged, and are gzip-compressed when the client accepts it. `POST /tool-schemas` takes the same parameters as form fields and returns the same response.
+
+**Breaking change:** `POST /tool-schemas` used to return `{"tool_schemas": {"Notion Manager": {"<tool name>": {...}}}}`. Clients of that shape must read the `tools` list instead; `openai_api_key` is still accepted and ignored.
 
 **Parameters:**
 | Name | Type | Required | Description |
 |------|------|----------|-------------|
-| openai_api_key | string | Yes | OpenAI API key for language model |
-| composio_key | string | Yes | Composio API key for Notion workspace integration |
+| fields | string | No | `names` for tool names only, `full` for names, descriptions and parameters (default: `full`) |
+| offset | integer | No | Index of the first tool (default: 0) |
+| limit | integer | No | Number of tools, all by default |
+| X-Composio-Key | header | No | Composio API key, only required while the catalog is not cached yet (`composio_key` form field for POST) |
 
 **Example Response:**
 ```json
 {
-    "tool_schemas": {
-        "notion_tools": ["create_page", "update_page", "search_pages", "..."]
-    }
+    "app": "NOTION",
+    "fields": "names",
+    "total": 25,
+    "offset": 0,
+    "limit": 3,
+    "next_offset": 3,
+    "tools": ["NOTION_ADD_PAGE_CONTENT", "NOTION_APPEND_BLOCK_CHILDREN", "NOTION_ARCHIVE_NOTION_PAGE"]
 }
 ```
 
@@ -314,6 +1113,8 @@ API for interacting with Notion AI Agent, including Notion workspace integration
 - OpenAI API key and Composio key are required for full functionality
 - The chat endpoint processes text queries and executes Notion operations
 - Tool schemas provide information about available Notion operations
+- `/chat` answers 429 (too many requests for these keys) or 503 (server at capacity) with a `Retry-After` header when the wait queue is full, `/chat/stream` sends an `error` event with that `status` and a `retry_after`
+- Model and Notion calls have per-call timeouts, retries and circuit breakers, and a request has `request_budget` seconds in total: `/chat` answers 504 when a call or the budget times out, 502 when an upstream keeps failing and 503 with `Retry-After` while its circuit breaker is open (`/chat/stream` reports these as an `error` event with a `status`)
 """
 
 @app.get("/docs")
@@ -349,17 +1150,103 @@ async def get_docs():
                         "type": "string",
                         "required": True,
                         "description": "Composio API key for Notion workspace integration"
+                    },
+                    {
+                        "name": "session_id",
+                        "type": "string",
+                        "required": False,
+                        "description": "Conversation to continue, defaults to the notion_session cookie, then 'default'"
+                    },
+                    {
+                        "name": "coalesce",
+                        "type": "boolean",
+                        "required": False,
+                        "description": "Share one run with identical requests already in flight (same keys, session and query)"
                     }
                 ],
                 "response": {
                     "response": "string - The AI assistant's response"
                 }
             },
+            {
+                "path": "/chat/stream",
+                "method": "POST",
+                "description": "Streaming chat endpoint returning Server-Sent Events (text_delta, tool_call, tool_result, final, error)",
+                "content_type": "multipart/form-data",
+                "parameters": "same as /chat",
+                "response": "text/event-stream - one JSON event per SSE message"
+            },
+            {
+                "path": "/ws/chat",
+                "method": "WEBSOCKET",
+                "description": "Chat over one connection: keys sent once in an auth message, then chat, cancel and ping messages; runs are multiplexed by id",
+                "parameters": [
+                    {"name": "auth", "type": "message", "required": True, "description": "First message: openai_api_key, composio_key and an optional session_id"},
+                    {"name": "chat", "type": "message", "required": False, "description": "Start a run: query, optional id and session_id"},
+                    {"name": "cancel", "type": "message", "required": False, "description": "Stop the run with this id"},
+                    {"name": "ping", "type": "message", "required": False, "description": "Answered with pong"}
+                ],
+                "response": "JSON messages - ready, then the /chat/stream events of each run with its id, cancelled, pong and error"
+            },
+            {
+                "path": "/chat/batch",
+                "method": "POST",
+                "description": "Run independent queries with bounded parallelism, streaming newline-delimited JSON results as they complete",
+                "content_type": "multipart/form-data",
+                "parameters": [
+                    {"name": "queries", "type": "string (repeated)", "required": True, "description": "One form field per query"},
+                    {"name": "openai_api_key", "type": "string", "required": True, "description": "OpenAI API key for language model"},
+                    {"name": "composio_key", "type": "string", "required": True, "description": "Composio API key for Notion workspace integration"},
+                    {"name": "max_parallel", "type": "integer", "required": False, "description": "Queries run at the same time, default 4, at most max_concurrent_requests_per_tenant; each query is admitted like a /chat request"}
+                ],
+                "response": "application/x-ndjson - one item object per query, then a summary object"
+            },
+            {
+                "path": "/chat/batch/jobs",
+                "method": "POST",
+                "description": "Submit a batch to run in the background, same parameters as /chat/batch",
+                "content_type": "multipart/form-data",
+                "parameters": "same as /chat/batch",
+                "response": {"job_id": "string", "status": "string", "total": "number"}
+            },
+            {
+                "path": "/chat/batch/jobs/{job_id}",
+                "method": "GET",
+                "description": "Poll a background batch job",
+                "parameters": [],
+                "response": {"job_id": "string", "status": "string - running/completed/cancelled", "completed": "number", "total": "number", "results": "array - per-item results", "summary": "object"}
+            },
             {
                 "path": "/reset",
                 "method": "POST", 
                 "description": "Reset Notion Agent's memory and conversation history",
-                "parameters": [],
+                "content_type": "multipart/form-data",
+                "parameters": [
+                    {
+                        "name": "openai_api_key",
+                        "type": "string",
+                        "required": True,
+                        "description": "OpenAI API key, with composio_key it selects the tenant to reset"
+                    },
+                    {
+                        "name": "composio_key",
+                        "type": "string",
+                        "required": True,
+                        "description": "Composio API key"
+                    },
+                    {
+                        "name": "session_id",
+                        "type": "string",
+                        "required": False,
+                        "description": "Only reset this session, all sessions of these keys are reset when omitted"
+                    },
+                    {
+                        "name": "clear_notes",
+                        "type": "boolean",
+                        "required": False,
+                        "description": "Also delete the agent notes of these keys and their history (default: false)"
+                    }
+                ],
                 "response": {
                     "status": "string - success/error status",
                     "message": "string - confirmation message"
@@ -368,24 +1255,41 @@ async def get_docs():
             {
                 "path": "/tool-schemas",
                 "method": "GET",
-                "description": "Get available tool schemas for the Notion agent",
-                "content_type": "multipart/form-data",
+                "description": "Notion tool catalog from the schema cache, with ETag/If-None-Match (304), gzip and pagination. POST takes the same parameters as form fields and returns the same response, no longer the former {tool_schemas: {Notion Manager: ...}}",
                 "parameters": [
                     {
-                        "name": "openai_api_key",
-                        "type": "string", 
-                        "required": True,
-                        "description": "OpenAI API key for language model"
+                        "name": "fields",
+                        "type": "string",
+                        "required": False,
+                        "description": "names or full, defaults to full"
                     },
                     {
-                        "name": "composio_key",
-                        "type": "string",
-                        "required": True,
-                        "description": "Composio API key for Notion workspace integration"
+                        "name": "offset",
+                        "type": "integer",
+                        "required": False,
+                        "description": "Index of the first tool, defaults to 0"
+                    },
+                    {
+                        "name": "limit",
+                        "type": "integer",
+                        "required": False,
+                        "description": "Number of tools, all by default"
+                    },
+                    {
+                        "name": "X-Composio-Key",
+                        "type": "header",
+                        "required": False,
+                        "description": "Composio API key, only needed while the catalog is not cached"
                     }
                 ],
                 "response": {
-                    "tool_schemas": "object - Available Notion tool schemas"
+                    "app": "string - app name",
+                    "fields": "string - fields of each tool",
+                    "total": "integer - number of tools in the catalog",
+                    "offset": "integer - index of the first tool",
+                    "limit": "integer - page size, null for all",
+                    "next_offset": "integer - offset of the next page, null on the last page",
+                    "tools": "array - tool names, or objects with name, description and parameters"
                 }
             },
             {
@@ -397,9 +1301,29 @@ async def get_docs():
                     "status": "string - health status",
                     "uptime": "number - seconds since startup",
                     "version": "string - API version",
-                    "service": "string - service name"
+                    "service": "string - service name",
+                    "agent_pool": "object - agent pool size, hits, misses, evictions and builds shared by concurrent requests",
+                    "http_pool": "object - per upstream host: requests, connections opened and open, reuse rate",
+                    "coalescing": "object - per coalescing group (chat, tool_schemas): calls in flight, run and shared"
+                }
+            },
+            {
+                "path": "/ready",
+                "method": "GET",
+                "description": "Readiness probe, 503 until the agent stack is loaded",
+                "parameters": [],
+                "response": {
+                    "status": "string - ready, starting or failed",
+                    "startup_seconds": "number - seconds from startup to the probe"
                 }
             },
+            {
+                "path": "/metrics",
+                "method": "GET",
+                "description": "Prometheus metrics of this worker: per-stage latency histograms, HTTP latency and tool call counts",
+                "parameters": [],
+                "response": "text - Prometheus text exposition format"
+            },
             {
                 "path": "/docs",
                 "method": "GET",
@@ -427,7 +1351,9 @@ async def get_docs():
             "All requests must use multipart/form-data encoding",
             "OpenAI API key and Composio key are required for full functionality", 
             "The chat endpoint processes text queries and executes Notion operations",
-            "Tool schemas provide information about available Notion operations"
+            "Tool schemas provide information about available Notion operations",
+            "/chat answers 429 or 503 with a Retry-After header when the wait queue is full, /chat/stream sends an error event with that status and a retry_after",
+            "/chat answers 504 when a model or Notion call or the request budget times out, 502 when an upstream keeps failing and 503 with a Retry-After header while its circuit breaker is open"
         ]
     }
 
@@ -457,17 +1383,28 @@ async def root():
         <p><strong>GET Requests:</strong></p>
         <ul>
             <li><code>/health</code> - Check API health status and uptime</li>
+            <li><code>/ready</code> - Readiness probe, ready once the agent stack is loaded</li>
+            <li><code>/metrics</code> - Prometheus latency and tool call metrics</li>
             <li><code>/api-docs</code> - Get comprehensive API documentation</li>
             <li><code>/docs</code> - Get comprehensive API documentation in JSON format</li>
-            <li><code>/tool-schemas</code> - Get available tool schemas for the Notion agent</li>
+            <li><code>/tool-schemas</code> - Notion tool catalog, paginated and cacheable with ETags</li>
+            <li><code>/chat/batch/jobs/{job_id}</code> - Poll a background batch job</li>
         </ul>
         
         <p><strong>POST Requests:</strong></p>
         <ul>
             <li><code>/chat</code> - Main chat endpoint with Notion workspace integration</li>
+            <li><code>/chat/stream</code> - Streaming chat endpoint (Server-Sent Events)</li>
+            <li><code>/chat/batch</code> - Run many independent queries, streaming results as they complete</li>
+            <li><code>/chat/batch/jobs</code> - Submit a batch to run in the background</li>
             <li><code>/reset</code> - Reset Notion Agent's memory and conversation history</li>
         </ul>
         
+        <p><strong>WebSocket:</strong></p>
+        <ul>
+            <li><code>/ws/chat</code> - Chat over one connection, keys sent once, streamed events and cancellation</li>
+        </ul>
+        
         <div class="feature-list">
             <h3>Notion Integration:</h3>
             <ul>
@@ -498,6 +1435,8 @@ async def root():
     """
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8003)
 
 
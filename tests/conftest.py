@@ -0,0 +1,9 @@
+import os
+import sys
+
+# notion_api opens its stores at import, keep them in memory rather than in the working directory
+os.environ.setdefault("notes_store_path", ":memory:")
+os.environ.setdefault("tool_results_path", ":memory:")
+os.environ.setdefault("session_store", "memory")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from utils.admission import AdmissionController, AdmissionRejected
+
+
+def test_cancelled_waiter_releases_its_tenant_permit():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_concurrent_per_tenant=2)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit("a"):
+                await release.wait()
+
+        async def wait():
+            async with admission.admit("a"):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        # Gets the tenant permit, then waits for the only global one
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        assert admission._tenants["a"].semaphore._value == 1
+        assert admission.queued == 0
+        release.set()
+        await holder
+        assert admission.stats()["in_flight"] == 0
+        assert not admission._tenants
+
+    asyncio.run(scenario())
+
+
+def test_waiter_times_out_and_releases_its_tenant_permit():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_concurrent_per_tenant=2, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit("a"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("a"):
+                pass
+        assert rejected.value.status_code == 503
+        assert admission._tenants["a"].semaphore._value == 1
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
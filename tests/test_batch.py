@@ -0,0 +1,48 @@
+import asyncio
+
+from utils.batch import BatchJobs
+
+
+def test_a_job_is_polled_from_another_process_item_by_item(tmp_path):
+    path = str(tmp_path / "batch.db")
+
+    async def main():
+        jobs, other = BatchJobs(path=path), BatchJobs(path=path)
+        release = [asyncio.Event() for _ in range(3)]
+        written = []
+
+        async def run(query: str) -> str:
+            await release[int(query)].wait()
+            return f"answer {query}"
+
+        persist_result = jobs._persist_result
+
+        def record(job, result):
+            persist_result(job, result)
+            written.append(result["index"])
+
+        jobs._persist_result = record
+        job = jobs.submit(run, ["0", "1", "2"], max_parallel=3)
+
+        for index in (2, 0):
+            release[index].set()
+            while index not in written:
+                await asyncio.sleep(0.01)
+        snapshot = await other.get(job.id)
+        assert snapshot["status"] == "running"
+        assert [r["index"] for r in snapshot["results"]] == [0, 2]
+
+        release[1].set()
+        await job.task
+        snapshot = await other.get(job.id)
+        assert snapshot["status"] == "completed"
+        assert snapshot["completed"] == snapshot["total"] == 3
+        assert [r["response"] for r in snapshot["results"]] == ["answer 0", "answer 1", "answer 2"]
+        assert snapshot["summary"]["succeeded"] == 3
+        # One row per finished item, the finished items are never written again
+        assert written == [2, 0, 1]
+
+        await jobs.aclose()
+        await other.aclose()
+
+    asyncio.run(main())
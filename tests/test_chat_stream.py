@@ -0,0 +1,67 @@
+import asyncio
+import gc
+import notion_api
+from notion_api import KeyCache
+
+
+class FakeModule:
+    class Notionagent:
+        closed_runs: list[str] = []
+
+        @staticmethod
+        async def create(**kwargs):
+            return FakeModule.Notionagent()
+
+        async def chat_stream(self, query, session_id="default"):
+            try:
+                yield {"type": "text_delta", "content": "I found "}
+                yield {"type": "final", "response": "I found the roadmap"}
+            finally:
+                self.closed_runs.append(session_id)
+
+        async def aclose(self):
+            pass
+
+
+def stream_request(session_id: str):
+    return notion_api.chat_stream(query="find the roadmap", openai_api_key="sk-a", composio_key="a",
+                                  session_id=session_id, notion_session=None)
+
+
+def setup(monkeypatch):
+    monkeypatch.setattr(notion_api, "warm_up", lambda: asyncio.sleep(0, FakeModule))
+    monkeypatch.setattr(notion_api, "key_cache", KeyCache())
+    FakeModule.Notionagent.closed_runs = []
+
+
+def test_a_stream_that_is_never_sent_holds_no_run_slot(monkeypatch):
+    setup(monkeypatch)
+
+    async def scenario():
+        response = await stream_request("unsent")
+        assert notion_api.admission.stats()["in_flight"] == 0
+        del response
+
+    asyncio.run(scenario())
+
+
+def test_a_stream_left_by_its_client_releases_the_run(monkeypatch):
+    setup(monkeypatch)
+
+    async def scenario():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        response = await stream_request("left")
+        body = response.body_iterator
+        assert "text_delta" in await anext(body)
+        assert notion_api.admission.stats()["in_flight"] == 1
+        # The client went away, nothing iterates or closes the body again
+        del response, body
+        gc.collect()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert FakeModule.Notionagent.closed_runs == ["left"]
+        assert notion_api.admission.stats()["in_flight"] == 0
+        assert errors == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,111 @@
+import asyncio
+import time
+import httpx
+import notion_api
+from notion_api import KeyCache
+from utils.notes_store import NotesStore
+from utils.session_store import InMemorySessionStore
+
+
+class FakeAgent:
+    def __init__(self):
+        self.closed = 0
+
+    async def aclose(self):
+        self.closed += 1
+        # Closing an MCP session yields to the event loop
+        await asyncio.sleep(0)
+
+
+def test_concurrent_evictions_close_each_agent_once():
+    async def scenario():
+        cache = KeyCache(idle_ttl=10)
+        agents = {h: FakeAgent() for h in ("h1", "h2")}
+        for keys_hash, agent in agents.items():
+            cache._agents[keys_hash] = (agent, time.time() - 60)
+        results = await asyncio.gather(
+            cache._evict_expired(time.time()), cache._evict_expired(time.time()), return_exceptions=True
+        )
+        assert results == [None, None]
+        assert not cache._agents
+        assert [agent.closed for agent in agents.values()] == [1, 1]
+        assert cache.evictions == 2
+
+    asyncio.run(scenario())
+
+
+def test_leased_agents_are_not_evicted():
+    async def scenario():
+        cache = KeyCache(idle_ttl=10)
+        leased, idle = FakeAgent(), FakeAgent()
+        cache._agents["leased"] = (leased, time.time() - 60)
+        cache._agents["idle"] = (idle, time.time() - 60)
+        cache._leases["leased"] = 1
+        await cache._evict_expired(time.time())
+        assert list(cache._agents) == ["leased"]
+        assert (leased.closed, idle.closed) == (0, 1)
+
+    asyncio.run(scenario())
+
+
+def test_a_running_chat_keeps_its_agent_when_the_pool_is_full(monkeypatch):
+    class RunningAgent(FakeAgent):
+        async def chat(self, query, session_id="default"):
+            started.set()
+            await finish.wait()
+            return "closed mid-run" if self.closed else "ok"
+
+    class FakeModule:
+        class Notionagent:
+            @staticmethod
+            async def create(**kwargs):
+                return RunningAgent()
+
+    monkeypatch.setattr(notion_api, "warm_up", lambda: asyncio.sleep(0, FakeModule))
+    monkeypatch.setattr(notion_api, "key_cache", KeyCache(max_size=1))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=notion_api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.create_task(
+                client.post("/chat", data={"query": "q", "openai_api_key": "sk-a", "composio_key": "a"})
+            )
+            await started.wait()
+            # A cold tenant arrives while the run holds the only slot
+            await notion_api.key_cache.get_notion_agent({"openai_api_key": "sk-b", "composio_key": "b"})
+            finish.set()
+            response = await running
+        assert response.json() == {"response": "ok"}
+
+    started, finish = asyncio.Event(), asyncio.Event()
+    asyncio.run(scenario())
+
+
+def test_reset_only_clears_the_sessions_of_the_given_keys():
+    async def scenario():
+        store = InMemorySessionStore()
+        cache = KeyCache(session_store=store)
+        tenant_a = {"openai_api_key": "sk-a", "composio_key": "a"}
+        tenant_b = {"openai_api_key": "sk-b", "composio_key": "b"}
+        for api_keys in (tenant_a, tenant_b):
+            await store.save(cache._compute_keys_hash(api_keys), "default", {"messages": []})
+        await cache.reset(tenant_a, "default")
+        assert await store.load(cache._compute_keys_hash(tenant_a), "default") is None
+        assert await store.load(cache._compute_keys_hash(tenant_b), "default") is not None
+
+    asyncio.run(scenario())
+
+
+def test_clear_notes_only_deletes_the_notes_of_the_given_keys():
+    async def scenario():
+        notes = NotesStore()
+        cache = KeyCache(notes_store=notes)
+        tenant_a = {"openai_api_key": "sk-a", "composio_key": "a"}
+        tenant_b = {"openai_api_key": "sk-b", "composio_key": "b"}
+        for api_keys in (tenant_a, tenant_b):
+            await notes.add(cache._compute_keys_hash(api_keys), "prefers tables")
+        await cache.reset(tenant_a, clear_notes=True)
+        assert await notes.relevant(cache._compute_keys_hash(tenant_a), "tables", 5) == []
+        assert len(await notes.relevant(cache._compute_keys_hash(tenant_b), "tables", 5)) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+from pydantic_ai.messages import ModelRequest, SystemPromptPart, UserPromptPart
+from notion_agent import NOTES_PREFIX, notes_update, shown_notes, turn_request
+from utils.notes_store import Note
+
+
+def note(note_id: int, content: str) -> Note:
+    return Note(id=note_id, content=content, version=1, updated_at=0)
+
+
+def notes_request(*lines: str) -> ModelRequest:
+    return ModelRequest(parts=[UserPromptPart(content="earlier"), SystemPromptPart(content=NOTES_PREFIX + "\n".join(lines))])
+
+
+def test_notes_follow_the_prompt_of_the_turn():
+    request = turn_request("find the roadmap", ["[1] use tables", "[2] short answers"])
+    assert [type(part) for part in request.parts] == [UserPromptPart, SystemPromptPart]
+    assert request.parts[0].content == "find the roadmap"
+    assert request.parts[1].content == NOTES_PREFIX + "[1] use tables\n[2] short answers"
+    assert [type(part) for part in turn_request("find the roadmap", []).parts] == [UserPromptPart]
+
+
+def test_the_history_shows_the_last_line_of_each_note():
+    history = [notes_request("[1] use tables", "[2] short answers"), notes_request("[2] (deleted)", "[3] the roadmap is shared")]
+    assert shown_notes(history) == {1: "[1] use tables", 2: "[2] (deleted)", 3: "[3] the roadmap is shared"}
+    assert shown_notes([]) == {}
+
+
+def test_only_unseen_or_changed_notes_are_sent():
+    shown = shown_notes([notes_request("[1] use tables", "[2] short answers")])
+    relevant = [note(1, "use tables"), note(2, "short answers please"), note(3, "the roadmap is shared")]
+    assert notes_update(shown, relevant, relevant) == ["[2] short answers please", "[3] the roadmap is shared"]
+    assert notes_update({}, relevant, relevant) == ["[1] use tables", "[2] short answers please", "[3] the roadmap is shared"]
+
+
+def test_notes_changed_since_the_history_showed_them_are_sent_again():
+    shown = shown_notes([notes_request("[1] use tables", "[2] short answers", "[4] the roadmap is private")])
+    # Note 2 was deleted and note 4 updated, neither is relevant to this turn
+    notes = [note(1, "use tables"), note(3, "the tasks database has a status column"), note(4, "the roadmap is shared")]
+    assert notes_update(shown, notes[:1], notes) == ["[2] (deleted)", "[4] the roadmap is shared"]
+    # Once sent, they are not repeated
+    shown = shown_notes([notes_request("[1] use tables", "[2] short answers", "[4] the roadmap is private"),
+                         notes_request("[2] (deleted)", "[4] the roadmap is shared")])
+    assert notes_update(shown, notes[:1], notes) == []
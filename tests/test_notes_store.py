@@ -0,0 +1,20 @@
+import asyncio
+from utils.notes_store import NotesStore
+
+
+def test_workers_sharing_the_database_add_notes_concurrently(tmp_path):
+    path = str(tmp_path / "notes.db")
+    workers = [NotesStore(path), NotesStore(path)]
+
+    async def scenario():
+        await asyncio.gather(*[
+            store.add("tenant", f"note {i} from worker {w}") for i in range(40) for w, store in enumerate(workers)
+        ])
+        notes = await workers[0].notes("tenant")
+        assert sorted(note.id for note in notes) == list(range(1, 81))
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        for store in workers:
+            store.close()
@@ -0,0 +1,103 @@
+import asyncio
+import gc
+import pytest
+import notion_agent
+from pydantic_ai.messages import UserPromptPart
+from benchmarks.fakes import FakeComposioToolSet, ScriptedModel
+from benchmarks.mcp_stub import MCPStub
+
+
+@pytest.fixture(scope="module")
+def mcp_url():
+    with MCPStub(rtt=0) as stub:
+        yield stub.url
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = ScriptedModel()
+    monkeypatch.setattr(notion_agent, "ComposioToolSet", FakeComposioToolSet)
+    monkeypatch.setattr(notion_agent, "OpenAIModel", lambda name, provider=None: model.model())
+    return model
+
+
+def make_agent(mcp_url: str, **kwargs) -> notion_agent.Notionagent:
+    return notion_agent.Notionagent(mcp_server_url=mcp_url, api_keys={"openai_api_key": "sk", "composio_key": "c"}, **kwargs)
+
+
+@pytest.mark.parametrize("tool_top_k", [0, 3])
+def test_a_stream_left_by_its_consumer_is_closed_cleanly(mcp_url, model, tool_top_k):
+    async def scenario():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        agent = make_agent(mcp_url, tool_top_k=tool_top_k)
+        await agent.notes_store.add(agent.namespace, "the roadmap page is shared with the team")
+        try:
+            stream = agent.chat_stream("find the roadmap", "session")
+            assert (await anext(stream))["type"] == "text_delta"
+            # The consumer failed, only the garbage collector closes the stream
+            del stream
+            gc.collect()
+            for _ in range(5):
+                await asyncio.sleep(0)
+            # The session lock was released with it
+            assert await asyncio.wait_for(agent.chat("and the tasks database?", "session"), 5)
+        finally:
+            await agent.aclose()
+        assert errors == []
+
+    asyncio.run(scenario())
+
+
+def test_tool_selection_stays_with_its_run(mcp_url, model):
+    async def scenario():
+        agent = make_agent(mcp_url, tool_top_k=2)
+        try:
+            await agent.chat("search the roadmap page", "session")
+            tools = {tool.name for tool in model.tools_seen[-1]}
+            # The agent's own tools and the 2 best matches
+            assert "agent_notes" in tools and len(tools) <= 2 + 2
+            # Stored without the selection, the next run makes its own
+            deps = await agent.session_store.load(agent.namespace, "session")
+            assert deps.tool_selection is None
+        finally:
+            await agent.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_a_deleted_note_is_marked_as_deleted_in_the_next_turn(mcp_url, model):
+    async def scenario():
+        agent = make_agent(mcp_url)
+        try:
+            note = await agent.notes_store.add(agent.namespace, "the roadmap page is shared with the team")
+            await agent.chat("find the roadmap", "session")
+            await agent.notes_store.delete(agent.namespace, note.id)
+            model.messages_seen.clear()
+            await agent.chat("find the roadmap again", "session")
+            sent = model.messages_seen[0][-1].parts[-1].content
+            assert sent.endswith(f"[{note.id}] (deleted)")
+            model.messages_seen.clear()
+            await agent.chat("and the tasks database?", "session")
+            # Nothing changed since, no notes are sent
+            assert [type(part) for part in model.messages_seen[0][-1].parts] == [UserPromptPart]
+        finally:
+            await agent.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_deferred_notes_of_concurrent_runs_are_applied_once(mcp_url, model):
+    async def scenario():
+        model.tool_calls = [[("agent_notes", {"note": "the roadmap page is shared with the team"})]]
+        agent = make_agent(mcp_url, deferred_notes=True)
+        try:
+            await asyncio.gather(*[agent.chat(f"find the roadmap, run {i}", "session") for i in range(3)])
+            await agent._wait_for_notes("session")
+            assert len(await agent.notes_store.notes(agent.namespace)) == 3
+            deps = await agent.session_store.load(agent.namespace, "session")
+            assert deps.pending_notes == []
+        finally:
+            await agent.aclose()
+
+    asyncio.run(scenario())
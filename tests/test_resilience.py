@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from utils.resilience import BudgetExceeded, RetryPolicy, Upstream, UpstreamError, deadline
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def failing(status_code: int):
+    async def call():
+        raise HTTPStatusError(status_code)
+    return call
+
+
+def test_rate_limits_do_not_open_the_shared_breaker():
+    upstream = Upstream("test-rate-limited", RetryPolicy(retries=1, base_delay=0, failure_threshold=2))
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(UpstreamError):
+                await upstream.call(failing(429))
+        assert upstream.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_server_errors_open_the_breaker():
+    upstream = Upstream("test-server-errors", RetryPolicy(retries=1, base_delay=0, failure_threshold=2))
+
+    async def scenario():
+        with pytest.raises(UpstreamError):
+            await upstream.call(failing(503))
+        assert upstream.breaker.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_spent_request_budgets_do_not_open_the_shared_breaker():
+    upstream = Upstream("test-budget", RetryPolicy(timeout=5, retries=1, base_delay=0, failure_threshold=3))
+
+    async def scenario():
+        for _ in range(3):
+            with deadline(0.05), pytest.raises(BudgetExceeded):
+                await upstream.call(lambda: asyncio.sleep(1))
+        assert upstream.breaker.state == "closed"
+        assert upstream.breaker.failures == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import json
+import threading
+import time
+from utils.schema_cache import SchemaCache
+
+
+class Schema:
+    def __init__(self, name: str):
+        self.name = name
+
+
+def test_render_is_not_blocked_by_a_refresh():
+    cache = SchemaCache(ttl=60)
+    # Expired, so `get` refreshes it while `render` still serves it
+    cache._entries["NOTION"] = (0, [Schema("NOTION_SEARCH")])
+    fetching, release = threading.Event(), threading.Event()
+
+    def fetch():
+        fetching.set()
+        release.wait(5)
+        return [Schema("NOTION_SEARCH"), Schema("NOTION_FETCH")]
+
+    refresh = threading.Thread(target=cache.get, args=("NOTION", fetch))
+    refresh.start()
+    try:
+        assert fetching.wait(5)
+        start = time.perf_counter()
+        rendering = cache.render("NOTION", "names")
+        assert time.perf_counter() - start < 1
+        assert json.loads(rendering.body)["tools"] == ["NOTION_SEARCH"]
+    finally:
+        release.set()
+        refresh.join()
+    assert json.loads(cache.render("NOTION", "names").body)["tools"] == ["NOTION_SEARCH", "NOTION_FETCH"]
+
+
+def test_concurrent_gets_fetch_once():
+    cache = SchemaCache(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return [Schema("NOTION_SEARCH")]
+
+    threads = [threading.Thread(target=cache.get, args=("NOTION", fetch)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,132 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted, carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Tenant:
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.active = 0
+
+
+class AdmissionController:
+    """Caps concurrent agent runs globally and per tenant.
+
+    Requests over a cap wait in a bounded queue for at most `queue_timeout` seconds.
+    A tenant with `max_queue_per_tenant` requests already waiting is rejected with
+    429, a full global queue or a wait timeout is rejected with 503. Both carry a
+    Retry-After estimated from the recent service time.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_concurrent_per_tenant: int = 4,
+        max_queue: int = 64,
+        max_queue_per_tenant: int = 16,
+        queue_timeout: float = 10,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_tenant = max_concurrent_per_tenant
+        self.max_queue = max_queue
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.queue_timeout = queue_timeout
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._tenants: dict[str, _Tenant] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        # Exponentially weighted moving average of how long an admitted request runs
+        self._service_time = 1.0
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._service_time * (self.queued + 1) / self.max_concurrent))
+
+    def _reject(self, status_code: int, detail: str):
+        self.rejected += 1
+        raise AdmissionRejected(status_code, detail, self._retry_after())
+
+    @asynccontextmanager
+    async def admit(self, tenant: str):
+        tenant_state = self._tenants.get(tenant)
+        if tenant_state is None:
+            tenant_state = self._tenants[tenant] = _Tenant(self.max_concurrent_per_tenant)
+
+        must_wait = tenant_state.semaphore.locked() or self._global.locked()
+        if must_wait:
+            if tenant_state.waiting >= self.max_queue_per_tenant:
+                self._reject(429, "Too many concurrent requests for these API keys")
+            if self.queued >= self.max_queue:
+                self._reject(503, "Server is at capacity")
+
+        start = time.perf_counter()
+        tenant_state.waiting += 1
+        self.queued += 1
+        acquired_tenant = acquired_global = False
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await tenant_state.semaphore.acquire()
+                acquired_tenant = True
+                await self._global.acquire()
+                acquired_global = True
+        except TimeoutError:
+            self.timed_out += 1
+            self._reject(503, "Timed out waiting for capacity")
+        finally:
+            tenant_state.waiting -= 1
+            self.queued -= 1
+            if not acquired_global:
+                # Timed out or cancelled (client gone) between the two permits
+                if acquired_tenant:
+                    tenant_state.semaphore.release()
+                self._forget(tenant, tenant_state)
+
+        waited = time.perf_counter() - start
+        self.wait_time_total += waited
+        self.wait_time_max = max(self.wait_time_max, waited)
+        self.admitted += 1
+        self.in_flight += 1
+        tenant_state.active += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - started)
+            self.in_flight -= 1
+            tenant_state.active -= 1
+            self._global.release()
+            tenant_state.semaphore.release()
+            self._forget(tenant, tenant_state)
+
+    def _forget(self, tenant: str, tenant_state: _Tenant):
+        if not tenant_state.waiting and not tenant_state.active:
+            self._tenants.pop(tenant, None)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_seconds": self.wait_time_total / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.wait_time_max,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+
+async def run_batch(run: Callable[[str], Awaitable[str]], queries: list[str], max_parallel: int = 4) -> AsyncIterator[dict]:
+    """Run every query through `run`, at most `max_parallel` at a time, and yield
+    one result per query in completion order."""
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run_item(index: int, query: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await run(query)
+                return {"index": index, "query": query, "status": "ok", "response": response,
+                        "elapsed": time.perf_counter() - start}
+            except Exception as e:
+                return {"index": index, "query": query, "status": "error", "error": str(e),
+                        "elapsed": time.perf_counter() - start}
+
+    tasks = [asyncio.create_task(run_item(i, query)) for i, query in enumerate(queries)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer went away, stop the items still running
+        for task in tasks:
+            task.cancel()
+
+
+def summarize(results: list[dict], elapsed: float) -> dict:
+    return {
+        "total": len(results),
+        "succeeded": sum(r["status"] == "ok" for r in results),
+        "failed": sum(r["status"] == "error" for r in results),
+        "elapsed": elapsed,
+    }
+
+
+class BatchJob:
+    def __init__(self, total: int):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.status = "running"
+        self.results: list[dict] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> dict:
+        return snapshot(self.id, self.status, self.total, self.results, self.created_at, self.finished_at)
+
+
+def snapshot(job_id: str, status: str, total: int, results: list[dict], created_at: float,
+             finished_at: Optional[float]) -> dict:
+    end = finished_at or time.time()
+    return {
+        "job_id": job_id,
+        "status": status,
+        "completed": len(results),
+        "total": total,
+        "results": sorted(results, key=lambda r: r["index"]),
+        "summary": summarize(results, end - created_at),
+    }
+
+
+class BatchJobs:
+    """Registry of batches running in the background, polled by id.
+
+    Finished jobs are kept for `ttl` seconds. With `path`, jobs are also written to
+    a SQLite database, so a job can be polled from any worker process sharing that
+    file: the job's status when it starts and ends, and each result as a row of
+    its own when its item finishes.
+    """
+
+    def __init__(self, ttl: float = 3600, path: Optional[str] = None):
+        self.ttl = ttl
+        self._jobs: dict[str, BatchJob] = {}
+        self._conn = None
+        if path:
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            with self._lock, self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS batch_job_status (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                    "total INTEGER NOT NULL, created_at REAL NOT NULL, finished_at REAL, updated_at REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS batch_job_items (job_id TEXT NOT NULL, item_index INTEGER NOT NULL, "
+                    "result TEXT NOT NULL, PRIMARY KEY (job_id, item_index))"
+                )
+
+    def _persist_status(self, job: BatchJob):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batch_job_status (job_id, status, total, created_at, finished_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, job.total, job.created_at, job.finished_at, now),
+            )
+            self._conn.execute("DELETE FROM batch_job_status WHERE updated_at < ?", (now - self.ttl,))
+            self._conn.execute("DELETE FROM batch_job_items WHERE job_id NOT IN (SELECT job_id FROM batch_job_status)")
+
+    def _persist_result(self, job: BatchJob, result: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batch_job_items (job_id, item_index, result) VALUES (?, ?, ?)",
+                (job.id, result["index"], json.dumps(result, default=str)),
+            )
+            # A running job is not expired
+            self._conn.execute("UPDATE batch_job_status SET updated_at = ? WHERE job_id = ?", (time.time(), job.id))
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, total, created_at, finished_at FROM batch_job_status WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            items = self._conn.execute("SELECT result FROM batch_job_items WHERE job_id = ?", (job_id,)).fetchall()
+        status, total, created_at, finished_at = row
+        return snapshot(job_id, status, total, [json.loads(item) for (item,) in items], created_at, finished_at)
+
+    async def _save_status(self, job: BatchJob):
+        if self._conn is not None:
+            await asyncio.to_thread(self._persist_status, job)
+
+    async def _save_result(self, job: BatchJob, result: dict):
+        if self._conn is not None:
+            await asyncio.to_thread(self._persist_result, job, result)
+
+    def _expire(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and now - job.finished_at > self.ttl:
+                del self._jobs[job_id]
+
+    def submit(self, run: Callable[[str], Awaitable[str]], queries: list[str], max_parallel: int,
+               scope: Optional[AsyncExitStack] = None) -> BatchJob:
+        """Start a job in the background, `scope` (what `run` holds on to) is closed when it ends"""
+        self._expire()
+        job = BatchJob(total=len(queries))
+
+        async def run_job():
+            try:
+                await self._save_status(job)
+                async for result in run_batch(run, queries, max_parallel):
+                    job.results.append(result)
+                    await self._save_result(job, result)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+            finally:
+                job.finished_at = time.time()
+                if scope is not None:
+                    await scope.aclose()
+                await asyncio.shield(self._save_status(job))
+
+        job.task = asyncio.create_task(run_job())
+        self._jobs[job.id] = job
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """Return the job snapshot, from this process or from the shared database"""
+        self._expire()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self._conn is not None:
+            return await asyncio.to_thread(self._load, job_id)
+        return None
+
+    async def aclose(self):
+        for job in self._jobs.values():
+            if job.task and not job.task.done():
+                job.task.cancel()
+        await asyncio.gather(*[job.task for job in self._jobs.values() if job.task], return_exceptions=True)
+        if self._conn is not None:
+            self._conn.close()
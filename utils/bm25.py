@@ -0,0 +1,50 @@
+import math
+import re
+from collections import Counter
+
+# Words that appear in most tool descriptions or queries and carry no signal
+STOPWORDS = frozenset(
+    "a an and are as at be by can do for from get i in into is it its me my of on or the this to use with "
+    "you your notion please want need".split()
+)
+
+
+def _stem(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words of `text`, also split on underscores, without stopwords and plurals"""
+    words = re.findall(r"[a-z0-9]+", text.replace("_", " ").lower())
+    return [_stem(word) for word in words if word not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 ranking over a fixed list of tokenized documents."""
+
+    def __init__(self, documents: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(document) for document in documents]
+        self.lengths = [len(document) for document in documents]
+        self.avg_length = sum(self.lengths) / len(documents) if documents else 0
+        frequencies = Counter(term for counts in self.term_counts for term in counts)
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    def scores(self, query: list[str]) -> list[float]:
+        scores = [0.0] * len(self.term_counts)
+        for term in set(query):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, counts in enumerate(self.term_counts):
+                tf = counts.get(term)
+                if tf:
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                    scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
@@ -2,17 +2,17 @@
 
 
 from dotenv import load_dotenv
-from typing import Literal
-from langchain_openai import ChatOpenAI
+from typing import Literal, TYPE_CHECKING
 # from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.graph import MessagesState, StateGraph,END
-from langgraph.prebuilt import ToolNode
-from IPython.display import Image, display
-from langchain_core.runnables.graph import CurveStyle, MermaidDrawMethod, NodeStyles
 import json
+import asyncio
+
+# LangChain, LangGraph and IPython are slow to import, they are loaded when an agent is built
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
 class Composio_agent:
-    def __init__(self,tools:list,llm:ChatOpenAI):
+    def __init__(self,tools:list,llm:"ChatOpenAI",max_parallel_tools:int=8,loop:bool=False):
        """
        This function is used to initialize the agent
 
@@ -22,11 +22,18 @@ class Composio_agent:
 
            llm: the llm to use, it should be a ChatOpenAI model from langchain
 
+           max_parallel_tools: maximum number of tool calls from one model response run at the same time by achat
+
+           loop: if True the agent and the tools alternate until the model stops calling tools,
+                 otherwise the graph ends after one round of tool calls
+
        """
+       self.max_parallel_tools=max_parallel_tools
+       self.loop=loop
        self.agent=self.setup_agent(tools,llm)
        
 
-    def setup_agent(self,tools:list,llm:ChatOpenAI):
+    def setup_agent(self,tools:list,llm:"ChatOpenAI"):
         """
         This function is used to setup the agent
         Args:
@@ -34,7 +41,11 @@ class Composio_agent:
         Returns:
             app: the agent
         """
-        
+        from langgraph.graph import MessagesState, StateGraph,END
+        from langgraph.prebuilt import ToolNode
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableLambda
+
         tool_node = ToolNode(tools)
 
         model_with_tools = llm.bind_tools(tools)
@@ -47,12 +58,41 @@ class Composio_agent:
             response = model_with_tools.invoke(messages)
             return {"messages": [response]}
 
+        async def acall_model(state: MessagesState):
+            response = await model_with_tools.ainvoke(state["messages"])
+            return {"messages": [response]}
+
+        def call_tools(state: MessagesState):
+            return tool_node.invoke(state)
+
+        async def acall_tools(state: MessagesState):
+            """
+            Run the tool calls of the last model response concurrently, at most max_parallel_tools at a time
+            """
+            tool_calls = state["messages"][-1].tool_calls
+            semaphore = asyncio.Semaphore(self.max_parallel_tools)
+
+            async def run_tool(tool_call):
+                async with semaphore:
+                    result = await tool_node.ainvoke({"messages": [AIMessage(content="", tool_calls=[tool_call])]})
+                return result["messages"]
+
+            results = await asyncio.gather(*[run_tool(tool_call) for tool_call in tool_calls])
+            return {"messages": [message for messages in results for message in messages]}
+
+        def route_after_agent(state: MessagesState) -> Literal["tools", "__end__"]:
+            return "tools" if state["messages"][-1].tool_calls else END
+
         workflow = StateGraph(MessagesState)
-        workflow.add_node("agent", call_model)
-        workflow.add_node("tools", tool_node)
+        workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model))
+        workflow.add_node("tools", RunnableLambda(call_tools, afunc=acall_tools))
         workflow.add_edge("__start__", "agent")
-        workflow.add_edge("agent", "tools")
-        workflow.add_edge("tools", END)
+        if self.loop:
+            workflow.add_conditional_edges("agent", route_after_agent)
+            workflow.add_edge("tools", "agent")
+        else:
+            workflow.add_edge("agent", "tools")
+            workflow.add_edge("tools", END)
         app = workflow.compile()
         return app
 
@@ -76,6 +116,20 @@ class Composio_agent:
             ]
         }
     )
+        return self._parse_result(res)
+
+    async def achat(self,query:str):
+        """
+        Async version of chat, independent tool calls of a model response run concurrently
+        Args:
+            query: str simply pass the query to the tool
+        Returns:
+            res: str
+        """
+        res=await self.agent.ainvoke({"messages": [("human", query)]})
+        return self._parse_result(res)
+
+    def _parse_result(self,res):
         try:
             return json.loads(res['messages'][-1].content)
         except:
@@ -86,6 +140,9 @@ class Composio_agent:
 
 
     def display_graph(self):
+        from IPython.display import Image, display
+        from langchain_core.runnables.graph import MermaidDrawMethod
+
         return display(
                         Image(
                                 self.agent.get_graph().draw_mermaid_png(
@@ -0,0 +1,141 @@
+import json
+from dataclasses import replace
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English text and JSON
+    return len(text) // 4 + 1
+
+
+def _part_text(part) -> str:
+    if isinstance(part, ToolCallPart):
+        return f"{part.tool_name} {part.args_as_json_str()}"
+    content = getattr(part, "content", "")
+    if isinstance(content, str):
+        return content
+    return json.dumps(content, default=str)
+
+
+def message_tokens(message: ModelMessage) -> int:
+    return sum(count_tokens(_part_text(part)) for part in message.parts)
+
+
+def _is_turn_start(message: ModelMessage) -> bool:
+    return isinstance(message, ModelRequest) and any(isinstance(part, UserPromptPart) for part in message.parts)
+
+
+def _is_summary(message: ModelMessage) -> bool:
+    return (
+        isinstance(message, ModelRequest)
+        and len(message.parts) == 1
+        and isinstance(message.parts[0], SystemPromptPart)
+        and message.parts[0].content.startswith(SUMMARY_PREFIX)
+    )
+
+
+class HistoryManager:
+    """Keeps a conversation history within a token budget.
+
+    Token counts are stored next to the messages and only computed for messages
+    added since the last compaction. Once the history goes over `token_budget`,
+    large tool results are truncated to `max_tool_result_tokens` and the oldest
+    turns are dropped until it fits in `target_ratio` of the budget. With a
+    `summarizer` agent the dropped turns are folded into a summary message kept
+    at the start of the history instead of being lost.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 16000,
+        max_tool_result_tokens: int = 2000,
+        target_ratio: float = 0.75,
+        summarizer: Agent | None = None,
+    ):
+        self.token_budget = token_budget
+        self.max_tool_result_tokens = max_tool_result_tokens
+        self.target_ratio = target_ratio
+        self.summarizer = summarizer
+
+    def count(self, messages: list[ModelMessage], tokens: list[int]) -> list[int]:
+        """Return token counts for `messages`, reusing `tokens` for the unchanged prefix."""
+        return tokens[: len(messages)] + [message_tokens(message) for message in messages[len(tokens):]]
+
+    def _truncate_tool_results(self, message: ModelMessage) -> ModelMessage:
+        if not isinstance(message, ModelRequest):
+            return message
+        parts = list(message.parts)
+        for i, part in enumerate(parts):
+            if isinstance(part, ToolReturnPart):
+                text = part.model_response_str()
+                if count_tokens(text) > self.max_tool_result_tokens:
+                    keep = self.max_tool_result_tokens * 4
+                    parts[i] = replace(part, content=f"{text[:keep]}\n[truncated {len(text) - keep} characters]")
+        return message if parts == message.parts else replace(message, parts=parts)
+
+    async def _summarize(self, previous: str, messages: list[ModelMessage]) -> str:
+        transcript = "\n".join(
+            f"{part.part_kind}: {_part_text(part)}" for message in messages for part in message.parts
+        )
+        result = await self.summarizer.run(
+            f"previous summary: {previous or 'none'}\n\nconversation to add to the summary:\n{transcript}"
+        )
+        return result.output
+
+    async def compact(self, messages: list[ModelMessage], tokens: list[int]) -> tuple[list[ModelMessage], list[int]]:
+        """Return the compacted history and its token counts."""
+        tokens = self.count(messages, tokens)
+        if sum(tokens) <= self.token_budget:
+            return messages, tokens
+
+        # Truncate large tool results everywhere but in the latest turn
+        turn_starts = [i for i, message in enumerate(messages) if _is_turn_start(message)]
+        last_turn = turn_starts[-1] if turn_starts else len(messages)
+        messages, tokens = list(messages), list(tokens)
+        for i in range(last_turn):
+            truncated = self._truncate_tool_results(messages[i])
+            if truncated is not messages[i]:
+                messages[i], tokens[i] = truncated, message_tokens(truncated)
+
+        summary = ""
+        if messages and _is_summary(messages[0]):
+            summary = messages[0].parts[0].content.removeprefix(SUMMARY_PREFIX)
+            messages, tokens = messages[1:], tokens[1:]
+            turn_starts = [i - 1 for i in turn_starts if i > 0]
+
+        # Drop the oldest whole turns so tool calls and their results stay together
+        target = self.token_budget * self.target_ratio
+        cut = 0
+        for start in turn_starts[1:]:
+            if sum(tokens[cut:]) <= target:
+                break
+            cut = start
+        dropped = messages[:cut]
+        messages, tokens = messages[cut:], tokens[cut:]
+
+        if self.summarizer is not None and (dropped or summary):
+            if dropped:
+                summary = await self._summarize(summary, dropped)
+            summary_message = ModelRequest(parts=[SystemPromptPart(content=SUMMARY_PREFIX + summary)])
+            messages = [summary_message] + messages
+            tokens = [message_tokens(summary_message)] + tokens
+        return messages, tokens
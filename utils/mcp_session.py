@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+import httpx
+from pydantic_ai.mcp import MCPServerStreamableHTTP
+from pydantic_ai.tools import ToolDefinition
+from utils import metrics
+from utils.http_pool import HTTPPool
+
+CallNext = Callable[[str, dict[str, Any]], Awaitable[Any]]
+# A tool middleware receives the tool name, its arguments and the next step of the chain
+ToolMiddleware = Callable[[str, dict[str, Any], CallNext], Awaitable[Any]]
+
+
+@dataclass
+class NotionMCPServer(MCPServerStreamableHTTP):
+    """Streamable HTTP MCP server that lists its tools once per connection.
+
+    pydantic-ai calls `list_tools` before every model request, the tool list is
+    cached for the life of the session and dropped when it reconnects. Tool calls
+    go through `tool_middlewares` in order before reaching the server. With an
+    `http_pool`, every connection sends through the shared pool.
+    """
+
+    tool_middlewares: list[ToolMiddleware] = field(default_factory=list)
+    http_pool: HTTPPool | None = None
+    _tools: list[ToolDefinition] | None = field(default=None, init=False, repr=False)
+
+    async def __aenter__(self):
+        self._tools = None
+        if self.http_pool:
+            # The MCP transport closes its client with the connection, a new one is taken for each
+            self.http_client = self.http_pool.client(
+                timeout=httpx.Timeout(self.timeout, read=self.sse_read_timeout), follow_redirects=True
+            )
+        return await super().__aenter__()
+
+    async def list_tools(self) -> list[ToolDefinition]:
+        if self._tools is None:
+            self._tools = await super().list_tools()
+        return self._tools
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any]):
+        call_next: CallNext = super().call_tool
+        for middleware in reversed(self.tool_middlewares):
+            call_next = functools.partial(middleware, call_next=call_next)
+        return await call_next(tool_name, arguments)
+
+    async def ping(self):
+        await self._client.send_ping()
+
+
+class PersistentMCPSession:
+    """Keeps the MCP server connections of an agent open across runs.
+
+    The connections are owned by a background task so they can be opened from one
+    request and closed from another (anyio cancel scopes must be exited by the task
+    that entered them). The session is pinged when it has been idle for longer than
+    `ping_interval` seconds and reopened if the ping fails or the connection dropped.
+    """
+
+    def __init__(self, servers: list, ping_interval: float = 30, ping_timeout: float = 5):
+        self.servers = servers
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.connects = 0
+        self._task: asyncio.Task | None = None
+        self._closing: asyncio.Event | None = None
+        self._connected = False
+        self._last_used = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._connected and self._task is not None and not self._task.done()
+
+    async def _run(self, ready: asyncio.Future):
+        try:
+            async with AsyncExitStack() as stack:
+                for server in self.servers:
+                    await stack.enter_async_context(server)
+                self._connected = True
+                ready.set_result(None)
+                await self._closing.wait()
+        except BaseException as e:
+            if not ready.done():
+                # anyio reports a failed connection as a cancellation of this task,
+                # which must not reach the caller as its own cancellation
+                if not isinstance(e, Exception):
+                    e = ConnectionError(f"Could not connect to the MCP server: {e!r}")
+                ready.set_exception(e)
+        finally:
+            self._connected = False
+
+    async def connect(self):
+        async with self._lock:
+            if self.connected:
+                return
+            await self._stop()
+            self._closing = asyncio.Event()
+            ready = asyncio.get_running_loop().create_future()
+            self._task = asyncio.create_task(self._run(ready))
+            with metrics.timed("mcp_connect"):
+                await ready
+            self.connects += 1
+            self._last_used = time.monotonic()
+
+    async def _healthy(self) -> bool:
+        try:
+            for server in self.servers:
+                await asyncio.wait_for(server.ping(), timeout=self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def ensure_connected(self):
+        """Open the session if needed and check it is still alive after an idle period."""
+        if self.connected and time.monotonic() - self._last_used > self.ping_interval:
+            if not await self._healthy():
+                await self.aclose()
+        if not self.connected:
+            await self.connect()
+        self._last_used = time.monotonic()
+
+    async def _stop(self):
+        if self._task is not None:
+            self._closing.set()
+            await self._task
+        self._task = None
+        self._connected = False
+
+    async def aclose(self):
+        async with self._lock:
+            await self._stop()
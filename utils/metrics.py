@@ -0,0 +1,200 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+# Seconds, from a cache hit to a slow model request
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_str(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}_total{_label_str(labels)} {_number(value)}"
+
+
+class Gauge:
+    """A value per label set that goes up and down, the last one set."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_label_str(labels)} {_number(value)}"
+
+
+class Histogram:
+    """Observed values per label set, counted in cumulative `buckets`."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label set -> [per bucket counts, sum, count]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._values.items()]
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_label_str(labels + (('le', _number(bound)),))} {cumulative}"
+            yield f"{self.name}_sum{_label_str(labels)} {_number(total)}"
+            yield f"{self.name}_count{_label_str(labels)} {count}"
+
+
+class Registry:
+    """The metrics of this process, rendered in the Prometheus text format.
+
+    Metrics are per process, with several workers each one reports its own.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_seconds = registry.histogram(
+    "notion_agent_stage_seconds", "Time spent in each stage of handling a request"
+)
+tool_calls = registry.counter("notion_agent_tool_calls", "Notion tool calls by tool and outcome")
+http_requests = registry.histogram("notion_agent_http_request_seconds", "HTTP request latency by route and status")
+
+# Stage -> [total seconds, count] of the request being handled, shared by the tasks it spawns
+_breakdown: contextvars.ContextVar[Optional[dict[str, list]]] = contextvars.ContextVar("breakdown", default=None)
+
+
+@contextmanager
+def request_breakdown() -> Iterator[dict[str, list]]:
+    """Collect the stage timings of the current request."""
+    breakdown: dict[str, list] = {}
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+
+def record(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        entry = breakdown.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def server_timing(breakdown: dict[str, list]) -> str:
+    """Format a breakdown as a Server-Timing header value, durations in milliseconds."""
+    return ", ".join(
+        f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (total, count) in breakdown.items()
+    )
+
+
+async def tool_middleware(tool_name: str, arguments: dict[str, Any], call_next):
+    """Tool middleware timing every call and counting it by outcome."""
+    outcome = "error"
+    try:
+        with timed("tool_call"):
+            result = await call_next(tool_name, arguments)
+        outcome = "ok"
+        return result
+    finally:
+        tool_calls.inc(tool=tool_name, outcome=outcome)
@@ -0,0 +1,162 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from utils.bm25 import BM25Index, tokenize
+
+
+@dataclass
+class Note:
+    id: int
+    content: str
+    version: int
+    updated_at: float
+
+
+@dataclass
+class NoteOperation:
+    """A change to the notes: add `content` as a new note when `note_id` is None,
+    otherwise replace that note with `content`, or delete it when `content` is None"""
+
+    content: Optional[str]
+    note_id: Optional[int] = None
+
+
+class NotesStore:
+    """Agent notes as versioned entries in SQLite, keyed by namespace.
+
+    Notes are added, patched and deleted one at a time; every change is kept in
+    a version history. `relevant` returns the few notes that matter for a query
+    (BM25 matches first, then the most recently updated), so the prompt stays
+    the same size however many notes accumulate. The default path keeps the
+    notes in memory, a file path makes them survive restarts and lets several
+    worker processes share them.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                "namespace TEXT NOT NULL, note_id INTEGER NOT NULL, version INTEGER NOT NULL, content TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (namespace, note_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS note_versions ("
+                "namespace TEXT NOT NULL, note_id INTEGER NOT NULL, version INTEGER NOT NULL, content TEXT, "
+                "created_at REAL NOT NULL, PRIMARY KEY (namespace, note_id, version))"
+            )
+
+    @contextmanager
+    def _write(self) -> Iterator[None]:
+        # Takes the database write lock up front, so what is read here still holds at commit
+        # when other worker processes write to the same file
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            yield
+
+    def _record(self, namespace: str, note_id: int, version: int, content: Optional[str], now: float):
+        self._conn.execute(
+            "INSERT INTO note_versions (namespace, note_id, version, content, created_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, note_id, version, content, now),
+        )
+
+    def _add(self, namespace: str, content: str) -> Note:
+        now = time.time()
+        with self._write():
+            # Ids are never reused, deleted notes keep theirs in the history
+            (last_id,) = self._conn.execute(
+                "SELECT MAX(note_id) FROM note_versions WHERE namespace = ?", (namespace,)
+            ).fetchone()
+            note = Note(id=(last_id or 0) + 1, content=content, version=1, updated_at=now)
+            self._conn.execute(
+                "INSERT INTO notes (namespace, note_id, version, content, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, note.id, note.version, content, now),
+            )
+            self._record(namespace, note.id, note.version, content, now)
+        return note
+
+    def _patch(self, namespace: str, note_id: int, content: Optional[str]) -> Optional[Note]:
+        now = time.time()
+        with self._write():
+            row = self._conn.execute(
+                "SELECT version FROM notes WHERE namespace = ? AND note_id = ?", (namespace, note_id)
+            ).fetchone()
+            if row is None:
+                return None
+            version = row[0] + 1
+            if content is None:
+                self._conn.execute("DELETE FROM notes WHERE namespace = ? AND note_id = ?", (namespace, note_id))
+            else:
+                self._conn.execute(
+                    "UPDATE notes SET version = ?, content = ?, updated_at = ? WHERE namespace = ? AND note_id = ?",
+                    (version, content, now, namespace, note_id),
+                )
+            self._record(namespace, note_id, version, content, now)
+        return Note(id=note_id, content=content or "", version=version, updated_at=now)
+
+    def _list(self, namespace: str) -> list[Note]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT note_id, content, version, updated_at FROM notes WHERE namespace = ? ORDER BY note_id",
+                (namespace,),
+            ).fetchall()
+        return [Note(*row) for row in rows]
+
+    def _history(self, namespace: str, note_id: int) -> list[tuple[int, Optional[str], float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT version, content, created_at FROM note_versions WHERE namespace = ? AND note_id = ? ORDER BY version",
+                (namespace, note_id),
+            ).fetchall()
+
+    def _clear(self, namespace: Optional[str]):
+        with self._lock, self._conn:
+            for table in ("notes", "note_versions"):
+                self._conn.execute(f"DELETE FROM {table} WHERE ? IS NULL OR namespace = ?", (namespace, namespace))
+
+    def _relevant(self, namespace: str, query: str, k: int) -> list[Note]:
+        notes = self._list(namespace)
+        if len(notes) <= k:
+            return notes
+        scores = BM25Index([tokenize(note.content) for note in notes]).scores(tokenize(query))
+        # Matching notes by score, then the most recent ones, which hold general guidance as often as not
+        ranked = sorted(range(len(notes)), key=lambda i: (scores[i], notes[i].updated_at), reverse=True)
+        return sorted((notes[i] for i in ranked[:k]), key=lambda note: note.id)
+
+    async def add(self, namespace: str, content: str) -> Note:
+        """Append a note"""
+        return await asyncio.to_thread(self._add, namespace, content)
+
+    async def update(self, namespace: str, note_id: int, content: str) -> Optional[Note]:
+        """Replace the content of a note as a new version, None if there is no such note"""
+        return await asyncio.to_thread(self._patch, namespace, note_id, content)
+
+    async def delete(self, namespace: str, note_id: int) -> bool:
+        """Delete a note, its history is kept"""
+        return await asyncio.to_thread(self._patch, namespace, note_id, None) is not None
+
+    async def notes(self, namespace: str) -> list[Note]:
+        return await asyncio.to_thread(self._list, namespace)
+
+    async def history(self, namespace: str, note_id: int) -> list[tuple[int, Optional[str], float]]:
+        """(version, content, created at) of every version of a note, content is None for a deletion"""
+        return await asyncio.to_thread(self._history, namespace, note_id)
+
+    async def relevant(self, namespace: str, query: str, k: int = 5) -> list[Note]:
+        """At most `k` notes for `query`, in id order"""
+        return await asyncio.to_thread(self._relevant, namespace, query, k)
+
+    async def clear(self, namespace: Optional[str] = None):
+        """Delete the notes and history of `namespace`, or of every namespace"""
+        await asyncio.to_thread(self._clear, namespace)
+
+    def close(self):
+        self._conn.close()
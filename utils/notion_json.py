@@ -0,0 +1,126 @@
+from typing import Any, Optional
+
+# Who changed an object and how it looks, never worth the model's tokens
+NOISE_KEYS = {"created_by", "last_edited_by", "created_time", "icon", "cover", "request_id", "annotations", "href",
+              "public_url", "color", "avatar_url"}
+# Flags that are false for almost every object
+DEFAULT_FALSE_KEYS = {"archived", "in_trash", "is_inline", "is_locked"}
+
+
+def plain_text(value: Any) -> str:
+    """Text of a Notion rich text array, or of a plain string"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "".join(
+            part.get("plain_text") or (part.get("text") or {}).get("content") or ""
+            for part in value if isinstance(part, dict)
+        )
+    return ""
+
+
+def title(obj: dict) -> str:
+    if obj.get("title"):
+        return plain_text(obj["title"])
+    # A page's title is the value of its title property, whatever its name
+    for prop in (obj.get("properties") or {}).values():
+        if isinstance(prop, dict) and "title" in prop and prop.get("type", "title") == "title":
+            return plain_text(prop["title"])
+    return ""
+
+
+def parent_id(obj: dict) -> Optional[str]:
+    parent = obj.get("parent")
+    if isinstance(parent, dict):
+        value = parent.get(parent.get("type", ""))
+        return value if isinstance(value, str) else None
+    return obj.get("parent_id")
+
+
+def schema(obj: dict) -> Optional[dict]:
+    """Compact property schema of a database: name -> type, with the options of select properties"""
+    properties = obj.get("properties")
+    if obj.get("object") != "database" or not isinstance(properties, dict):
+        return None
+    result = {}
+    for name, prop in properties.items():
+        if not isinstance(prop, dict):
+            continue
+        kind = prop.get("type", "")
+        entry: dict[str, Any] = {"type": kind}
+        options = (prop.get(kind) or {}).get("options") if isinstance(prop.get(kind), dict) else None
+        if options:
+            entry["options"] = [option.get("name") for option in options if isinstance(option, dict)]
+        result[name] = entry
+    return result
+
+
+def property_value(prop: Any) -> Any:
+    """Plain value of a page property: text, option names, date range, ids of relations..."""
+    if not isinstance(prop, dict):
+        return prop
+    kind = prop.get("type") or next((key for key in prop if key not in ("id", "type")), "")
+    value = prop.get(kind)
+    if kind in ("title", "rich_text"):
+        return plain_text(value)
+    if kind in ("select", "status", "verification"):
+        return (value or {}).get("name") or (value or {}).get("state")
+    if kind in ("multi_select", "files", "people"):
+        return [item.get("name") or item.get("id") for item in value or [] if isinstance(item, dict)]
+    if kind == "relation":
+        return [item.get("id") for item in value or [] if isinstance(item, dict)]
+    if kind == "date" and isinstance(value, dict):
+        return f"{value.get('start')} → {value['end']}" if value.get("end") else value.get("start")
+    if kind in ("created_by", "last_edited_by") and isinstance(value, dict):
+        return value.get("name") or value.get("id")
+    if kind == "unique_id" and isinstance(value, dict):
+        return f"{value['prefix']}-{value.get('number')}" if value.get("prefix") else value.get("number")
+    if kind == "array":
+        return [property_value(item) for item in value or []]
+    if kind in ("formula", "rollup"):
+        # Typed like a property, e.g. {"type": "number", "number": 3}
+        return property_value(value)
+    return value
+
+
+def _is_rich_text(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(part, dict) and "plain_text" in part for part in value)
+
+
+def _empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def project(value: Any) -> Any:
+    """Notion JSON reduced to what a model works with: ids, titles, plain text and
+    plain property values. Rich text becomes its text, page properties their
+    values, database properties their schema and parents their id; authors,
+    icons, styling and empty values are dropped. Anything else is kept as is."""
+    if _is_rich_text(value):
+        return plain_text(value)
+    if isinstance(value, list):
+        return [project(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    kind = value.get("object")
+    projected: dict[str, Any] = {}
+    for key, item in value.items():
+        if key in NOISE_KEYS or (key in DEFAULT_FALSE_KEYS and item is False):
+            continue
+        if key == "parent" and isinstance(item, dict):
+            key, item = "parent_id", parent_id(value)
+        elif key == "properties" and isinstance(item, dict) and kind == "database":
+            item = schema(value)
+        elif key == "properties" and isinstance(item, dict) and kind == "page":
+            if "title" not in value:
+                projected["title"] = title(value)
+            item = {
+                name: property_value(prop) for name, prop in item.items()
+                if not (isinstance(prop, dict) and prop.get("type") == "title")
+            }
+            item = {name: prop for name, prop in item.items() if not _empty(prop)}
+        else:
+            item = project(item)
+        if not _empty(item):
+            projected[key] = item
+    return projected
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+from utils import metrics
+from utils.notion_json import parent_id, schema, title
+from utils.tool_cache import is_read_only
+
+if TYPE_CHECKING:
+    from utils.mcp_session import CallNext
+
+lookups = metrics.registry.counter("notion_agent_mirror_lookups", "Local Notion mirror lookups by tool and outcome")
+
+
+def notion_objects(value: Any) -> Iterator[dict]:
+    """The page and database objects found anywhere in a tool result"""
+    if isinstance(value, dict):
+        if value.get("object") in ("page", "database") and isinstance(value.get("id"), str):
+            yield value
+        for child in value.values():
+            yield from notion_objects(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from notion_objects(child)
+
+
+def _match_expression(query: str) -> str:
+    # Every word as a quoted prefix, so FTS5 operators in the query are taken literally
+    return " OR ".join(f'"{word}"*' for word in re.findall(r"\w+", query.lower()))
+
+
+class NotionMirror:
+    """Local read-through mirror of Notion page titles and database schemas.
+
+    Used as a tool middleware, it records the pages and databases found in the
+    results of every Notion tool call in SQLite with an FTS5 index on their
+    titles, keyed by namespace. An object only replaces its mirrored copy when
+    its `last_edited_time` is not older, archived objects are dropped and the
+    objects a write targeted are forgotten unless its result carried them.
+    Lookups ignore entries fetched more than `max_age` seconds ago.
+    """
+
+    def __init__(self, path: str = ":memory:", max_age: float = 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS objects (
+                    namespace TEXT NOT NULL, id TEXT NOT NULL, object TEXT NOT NULL, title TEXT NOT NULL,
+                    url TEXT, parent_id TEXT, schema TEXT, last_edited_time TEXT NOT NULL, fetched_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, id)
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5(
+                    title, content='objects', content_rowid='rowid', tokenize='porter unicode61'
+                );
+                CREATE TRIGGER IF NOT EXISTS objects_ai AFTER INSERT ON objects BEGIN
+                    INSERT INTO objects_fts(rowid, title) VALUES (new.rowid, new.title);
+                END;
+                CREATE TRIGGER IF NOT EXISTS objects_ad AFTER DELETE ON objects BEGIN
+                    INSERT INTO objects_fts(objects_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+                END;
+                CREATE TRIGGER IF NOT EXISTS objects_au AFTER UPDATE ON objects BEGIN
+                    INSERT INTO objects_fts(objects_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+                    INSERT INTO objects_fts(rowid, title) VALUES (new.rowid, new.title);
+                END;
+                """
+            )
+
+    def _ingest(self, namespace: str, objects: list[dict], forget: set[str]):
+        now = time.time()
+        with self._lock, self._conn:
+            for obj in objects:
+                if obj.get("archived") or obj.get("in_trash"):
+                    self._conn.execute("DELETE FROM objects WHERE namespace = ? AND id = ?", (namespace, obj["id"]))
+                    continue
+                object_schema = schema(obj)
+                # Partial objects keep the title and schema already mirrored
+                self._conn.execute(
+                    "INSERT INTO objects (namespace, id, object, title, url, parent_id, schema, last_edited_time, fetched_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, id) DO UPDATE SET "
+                    "title = COALESCE(NULLIF(excluded.title, ''), title), url = COALESCE(excluded.url, url), "
+                    "parent_id = COALESCE(excluded.parent_id, parent_id), schema = COALESCE(excluded.schema, schema), "
+                    "last_edited_time = MAX(excluded.last_edited_time, last_edited_time), fetched_at = excluded.fetched_at "
+                    "WHERE excluded.last_edited_time >= last_edited_time OR excluded.last_edited_time = ''",
+                    (
+                        namespace, obj["id"], obj["object"], title(obj), obj.get("url"), parent_id(obj),
+                        json.dumps(object_schema) if object_schema is not None else None, obj.get("last_edited_time") or "", now,
+                    ),
+                )
+            for object_id in forget:
+                self._conn.execute("DELETE FROM objects WHERE namespace = ? AND id = ?", (namespace, object_id))
+
+    def _search(self, namespace: str, query: str, limit: int) -> list[dict]:
+        fresh = time.time() - self.max_age
+        expression = _match_expression(query)
+        with self._lock:
+            if expression:
+                rows = self._conn.execute(
+                    "SELECT o.id, o.object, o.title, o.url, o.parent_id, o.last_edited_time "
+                    "FROM objects_fts JOIN objects o ON o.rowid = objects_fts.rowid "
+                    "WHERE objects_fts MATCH ? AND o.namespace = ? AND o.fetched_at >= ? "
+                    "ORDER BY bm25(objects_fts), o.last_edited_time DESC LIMIT ?",
+                    (expression, namespace, fresh, limit),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, object, title, url, parent_id, last_edited_time FROM objects "
+                    "WHERE namespace = ? AND fetched_at >= ? ORDER BY last_edited_time DESC LIMIT ?",
+                    (namespace, fresh, limit),
+                ).fetchall()
+        keys = ("id", "object", "title", "url", "parent_id", "last_edited_time")
+        return [{key: value for key, value in zip(keys, row) if value} for row in rows]
+
+    def _database(self, namespace: str, database_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, url, schema FROM objects "
+                "WHERE namespace = ? AND id = ? AND object = 'database' AND schema IS NOT NULL AND fetched_at >= ?",
+                (namespace, database_id, time.time() - self.max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        database_title, url, properties = row
+        return {"id": database_id, "title": database_title, "url": url, "properties": json.loads(properties)}
+
+    def _clear(self, namespace: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM objects WHERE ? IS NULL OR namespace = ?", (namespace, namespace))
+
+    async def record(self, namespace: str, tool_name: str, arguments: dict[str, Any], call_next: "CallNext"):
+        """Tool middleware, bind `namespace` with functools.partial"""
+        result = await call_next(tool_name, arguments)
+        objects = list(notion_objects(result))
+        forget: set[str] = set()
+        if not is_read_only(tool_name):
+            # The objects a write targeted may have changed, unless the result says how
+            targets = {value for key, value in arguments.items() if key.endswith("_id") and isinstance(value, str)}
+            forget = targets - {obj["id"] for obj in objects}
+        if objects or forget:
+            try:
+                await asyncio.to_thread(self._ingest, namespace, objects, forget)
+            except sqlite3.Error:
+                # The mirror is only an optimization, the tool result is what matters
+                pass
+        return result
+
+    async def search(self, namespace: str, query: str = "", limit: int = 10) -> list[dict]:
+        """Mirrored pages and databases whose title matches `query`, the most recently edited when it is empty"""
+        return await asyncio.to_thread(self._search, namespace, query, limit)
+
+    async def database(self, namespace: str, database_id: str) -> Optional[dict]:
+        """Title and property schema of a mirrored database, None if it is not mirrored"""
+        return await asyncio.to_thread(self._database, namespace, database_id)
+
+    async def clear(self, namespace: Optional[str] = None):
+        await asyncio.to_thread(self._clear, namespace)
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,298 @@
+import asyncio
+import contextvars
+import math
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+from utils import metrics
+from utils.tool_cache import is_read_only
+
+if TYPE_CHECKING:
+    from utils.mcp_session import CallNext
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+TRANSIENT_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+events = metrics.registry.counter(
+    "notion_agent_upstream_events", "Retries, timeouts, hedges and circuit breaker rejections by upstream"
+)
+
+
+class UpstreamError(Exception):
+    """An upstream call failed for good, carries the HTTP status to answer with."""
+
+    status_code = 502
+
+    def __init__(self, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class UpstreamTimeout(UpstreamError, TimeoutError):
+    status_code = 504
+
+
+class BudgetExceeded(UpstreamTimeout):
+    """The request ran out of its overall time budget."""
+
+
+class CircuitOpen(UpstreamError):
+    status_code = 503
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    """The HTTP status of pydantic-ai's ModelHTTPError, OpenAI and httpx errors"""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failure may go away on retry: timeouts, dropped connections and
+    retryable HTTP statuses"""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return _status(exc) in TRANSIENT_STATUS
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """A 429, which is about the caller's API key rather than the health of the upstream"""
+    return _status(exc) == 429
+
+
+@dataclass
+class RetryPolicy:
+    """How calls to an upstream are bounded and retried.
+
+    `timeout` is the deadline of one attempt, `retries` the extra attempts of
+    idempotent calls after a transient failure, spaced by exponential backoff
+    with full jitter between 0 and `base_delay * 2**n` (capped at `max_delay`).
+    With `hedge_delay`, an idempotent call still running after that many seconds
+    is sent a second time and the first answer wins. `failure_threshold`
+    consecutive transient failures open the upstream's circuit breaker for
+    `reset_timeout` seconds.
+    """
+
+    timeout: Optional[float] = 30
+    retries: int = 2
+    base_delay: float = 0.25
+    max_delay: float = 4
+    hedge_delay: Optional[float] = None
+    failure_threshold: int = 5
+    reset_timeout: float = 30
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Fails calls fast once an upstream keeps failing.
+
+    Opens after `failure_threshold` consecutive failures. After `reset_timeout`
+    seconds one probe call is let through: its success closes the breaker, its
+    failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open" and now - self._opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open":
+            # A probe that never reported back (cancelled) does not block the breaker forever
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+            return True
+        return self.state == "closed"
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.reset_timeout - (time.monotonic() - self._opened_at)))
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probe_started = None
+
+    def release(self):
+        """A call ended without telling anything about the upstream, the next probe may go"""
+        self._probe_started = None
+
+    def failure(self):
+        self.failures += 1
+        self._probe_started = None
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+# Breakers are per upstream and per process, shared by every agent calling it
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(failure_threshold, reset_timeout)
+    return _breakers[name]
+
+
+def breaker_states() -> dict[str, str]:
+    return {name: b.state for name, b in _breakers.items()}
+
+
+# Monotonic time by which the current request must be answered
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Give the upstream calls made inside this block `seconds` in total, nested budgets only shrink it"""
+    if not seconds:
+        yield
+        return
+    current = _deadline.get()
+    _deadline.set(min(time.monotonic() + seconds, current if current is not None else math.inf))
+    try:
+        yield
+    finally:
+        # Not reset with a token: a stream its client left is closed by the garbage collector,
+        # in another context than the one the block started in
+        _deadline.set(current)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request budget, None without a budget"""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+class Upstream:
+    """Calls to one upstream under a RetryPolicy and its circuit breaker.
+
+    Every attempt is bounded by the policy timeout and by what is left of the
+    request budget. Only failures `is_transient` (or of the `transient` types)
+    are retried and counted by the breaker, and only idempotent calls are
+    retried or hedged. Rate limits and attempts cut short by the request budget
+    are not counted, the breaker is shared by every tenant while limits and
+    budgets are per API key and per request. Exhausted retries raise UpstreamError or UpstreamTimeout,
+    an open breaker CircuitOpen and a spent budget BudgetExceeded.
+    """
+
+    def __init__(self, name: str, policy: RetryPolicy, transient: tuple[type[BaseException], ...] = ()):
+        self.name = name
+        self.policy = policy
+        self.transient = transient
+        self.breaker = breaker(name, policy.failure_threshold, policy.reset_timeout)
+
+    def _is_transient(self, exc: BaseException) -> bool:
+        return isinstance(exc, self.transient) or is_transient(exc)
+
+    def _attempt_timeout(self) -> tuple[Optional[float], bool]:
+        """The timeout of the next attempt and whether it is set by the request budget"""
+        left = remaining()
+        if left is not None and left <= 0:
+            events.inc(upstream=self.name, event="budget_exceeded")
+            raise BudgetExceeded(f"Request budget exhausted before calling {self.name}")
+        if left is not None and (self.policy.timeout is None or left < self.policy.timeout):
+            return left, True
+        return self.policy.timeout, False
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        tasks = [asyncio.ensure_future(fn())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.policy.hedge_delay)
+            if not done:
+                events.inc(upstream=self.name, event="hedge")
+                tasks.append(asyncio.ensure_future(fn()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]], idempotent: bool = True, hedge: bool = True) -> T:
+        attempts = 1 + (self.policy.retries if idempotent else 0)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                events.inc(upstream=self.name, event="circuit_open")
+                raise CircuitOpen(f"{self.name} is failing, calls are suspended", retry_after=self.breaker.retry_after())
+            timeout, by_budget = self._attempt_timeout()
+            try:
+                async with asyncio.timeout(timeout):
+                    if idempotent and hedge and self.policy.hedge_delay:
+                        result = await self._hedged(fn)
+                    else:
+                        result = await fn()
+            except UpstreamError:
+                # From a nested call, already handled there
+                raise
+            except Exception as e:
+                if not self._is_transient(e):
+                    # The upstream answered, the call itself is wrong
+                    self.breaker.success()
+                    raise
+                timed_out = isinstance(e, TimeoutError)
+                if timed_out:
+                    events.inc(upstream=self.name, event="timeout")
+                if timed_out and by_budget:
+                    # The request ran out of time, which says nothing about the upstream
+                    self.breaker.release()
+                    events.inc(upstream=self.name, event="budget_exceeded")
+                    raise BudgetExceeded(f"Request budget exhausted waiting for {self.name}") from e
+                if is_rate_limited(e):
+                    events.inc(upstream=self.name, event="rate_limited")
+                    self.breaker.release()
+                else:
+                    self.breaker.failure()
+                delay = self.policy.backoff(attempt)
+                left = remaining()
+                if attempt == attempts - 1 or (left is not None and left <= delay):
+                    if timed_out:
+                        raise UpstreamTimeout(f"{self.name} timed out after {attempt + 1} attempts") from e
+                    raise UpstreamError(f"{self.name} failed after {attempt + 1} attempts: {e}") from e
+                events.inc(upstream=self.name, event="retry")
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.success()
+                return result
+
+    @asynccontextmanager
+    async def open(self, open_stream: Callable[[], AsyncContextManager[T]]) -> AsyncIterator[T]:
+        """Enter a streaming response under the policy, only opening the stream is
+        bounded and retried, once it has started it runs to its end"""
+
+        async def enter():
+            stream = open_stream()
+            return stream, await stream.__aenter__()
+
+        # Not hedged, the losing stream would be left open
+        stream, value = await self.call(enter, hedge=False)
+        try:
+            yield value
+        except BaseException as e:
+            if not await stream.__aexit__(type(e), e, e.__traceback__):
+                raise
+        else:
+            await stream.__aexit__(None, None, None)
+
+    async def tool_middleware(self, tool_name: str, arguments: dict[str, Any], call_next: "CallNext"):
+        """MCP tool middleware, only read-only tools are retried and hedged"""
+        return await self.call(lambda: call_next(tool_name, arguments), idempotent=is_read_only(tool_name))
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    from composio.client.collections import ActionModel
+
+
+# Fields of each schema in a rendering, "names" is the lightest for listings
+RENDER_FIELDS = {
+    "names": None,
+    "full": {"name", "display_name", "description", "parameters", "tags"},
+}
+
+
+@dataclass
+class RenderedSchemas:
+    """A page of the catalog as JSON, with its gzip encoding and ETag"""
+
+    body: bytes
+    gzipped: bytes
+    etag: str
+
+
+class SchemaCache:
+    """Process-wide cache of Composio action schemas, keyed by app name.
+
+    The action catalog is the same for every tenant, so it is fetched once and kept
+    for `ttl` seconds. When `snapshot_path` is set the catalog is also written to a
+    JSON file and reloaded from it after a restart while it is still fresh.
+
+    `render` serves pages of a catalog as ready-made JSON: each schema is
+    serialized once per catalog version, and the last `max_renderings` pages are
+    kept with their gzip encoding.
+    """
+
+    def __init__(self, ttl: float = 24 * 3600, snapshot_path: Optional[str] = None, max_renderings: int = 64):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.max_renderings = max_renderings
+        self.hits = 0
+        self.misses = 0
+        # app name -> (fetched at timestamp, schemas)
+        self._entries: dict[str, tuple[float, list["ActionModel"]]] = {}
+        self._lock = threading.Lock()
+        # Held across the slow Composio fetch, which must not block `render` on the event loop
+        self._fetch_lock = threading.Lock()
+        # (app name, fields) -> (fetched at timestamp, serialized schemas)
+        self._fragments: dict[tuple[str, str], tuple[float, list[bytes]]] = {}
+        self._renderings: "OrderedDict[tuple, RenderedSchemas]" = OrderedDict()
+        if snapshot_path:
+            self._load_snapshot()
+
+    def _load_snapshot(self):
+        # composio is slow to import, only pay for it when there is a snapshot to load
+        if not os.path.exists(self.snapshot_path):
+            return
+        from composio.client.collections import ActionModel
+
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            for app_name, entry in snapshot.items():
+                schemas = [ActionModel.model_validate(schema) for schema in entry["schemas"]]
+                self._entries[app_name] = (entry["fetched_at"], schemas)
+        except (OSError, ValueError, KeyError):
+            # A missing or unreadable snapshot just means a cold cache
+            self._entries = {}
+
+    def _write_snapshot(self, entries: dict[str, tuple[float, list["ActionModel"]]]):
+        snapshot = {
+            app_name: {"fetched_at": fetched_at, "schemas": [schema.model_dump(mode="json") for schema in schemas]}
+            for app_name, (fetched_at, schemas) in entries.items()
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def get(self, app_name: str, fetch: Callable[[], list["ActionModel"]]) -> list["ActionModel"]:
+        """Return the cached schemas for `app_name`, calling `fetch` when missing or expired.
+        One thread fetches at a time, `render` keeps serving the cached schemas meanwhile"""
+        with self._lock:
+            entry = self._entries.get(app_name)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+
+        with self._fetch_lock:
+            with self._lock:
+                # Another thread may have fetched while this one waited
+                entry = self._entries.get(app_name)
+                if entry is not None and time.time() - entry[0] < self.ttl:
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+            schemas = fetch()
+            with self._lock:
+                self._entries[app_name] = (time.time(), schemas)
+                entries = dict(self._entries)
+            if self.snapshot_path:
+                try:
+                    self._write_snapshot(entries)
+                except OSError:
+                    pass
+            return schemas
+
+    def cached(self, app_name: str) -> bool:
+        """Whether schemas are cached for `app_name`, fresh or not"""
+        return app_name in self._entries
+
+    def _serialized(self, app_name: str, fields: str, fetched_at: float, schemas: list["ActionModel"]) -> list[bytes]:
+        entry = self._fragments.get((app_name, fields))
+        if entry is None or entry[0] != fetched_at:
+            include = RENDER_FIELDS[fields]
+            if include is None:
+                fragments = [json.dumps(schema.name).encode() for schema in schemas]
+            else:
+                fragments = [
+                    json.dumps(schema.model_dump(mode="json", include=include, exclude_none=True)).encode()
+                    for schema in schemas
+                ]
+            entry = self._fragments[(app_name, fields)] = (fetched_at, fragments)
+        return entry[1]
+
+    def render(self, app_name: str, fields: str = "full", offset: int = 0, limit: Optional[int] = None) -> Optional[RenderedSchemas]:
+        """Return a page of the cached schemas of `app_name` as JSON, or None when nothing is cached.
+        Expired schemas are still served, refreshing them is left to `get`"""
+        if fields not in RENDER_FIELDS:
+            raise ValueError(f"fields must be one of {', '.join(RENDER_FIELDS)}")
+        with self._lock:
+            entry = self._entries.get(app_name)
+            if entry is None:
+                return None
+            fetched_at, schemas = entry
+            key = (app_name, fetched_at, fields, offset, limit)
+            rendering = self._renderings.get(key)
+            if rendering is not None:
+                self._renderings.move_to_end(key)
+                return rendering
+
+            fragments = self._serialized(app_name, fields, fetched_at, schemas)
+            end = len(fragments) if limit is None else min(len(fragments), offset + limit)
+            page = fragments[offset:end]
+            meta = {
+                "app": app_name,
+                "fields": fields,
+                "total": len(fragments),
+                "offset": offset,
+                "limit": limit,
+                "next_offset": end if end < len(fragments) else None,
+            }
+            body = json.dumps(meta)[:-1].encode() + b', "tools": [' + b", ".join(page) + b"]}"
+            etag = 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            rendering = self._renderings[key] = RenderedSchemas(body, gzip.compress(body), etag)
+            while len(self._renderings) > self.max_renderings:
+                self._renderings.popitem(last=False)
+            return rendering
+
+    def stats(self) -> dict[str, int]:
+        return {"apps": len(self._entries), "hits": self.hits, "misses": self.misses}
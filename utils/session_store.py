@@ -0,0 +1,176 @@
+import asyncio
+import importlib
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+from pydantic import TypeAdapter
+
+
+class SessionStore(ABC):
+    """Conversation state (the agent `Deps`) keyed by namespace and session id.
+
+    The namespace separates tenants sharing a store, the session id separates the
+    conversations of one tenant.
+    """
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[tuple[str, str], asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @asynccontextmanager
+    async def lock(self, namespace: str, session_id: str) -> AsyncIterator[None]:
+        """Serialize the runs of one session, the default only covers this process."""
+        key = (namespace, session_id)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            yield
+
+    @abstractmethod
+    async def load(self, namespace: str, session_id: str) -> Optional[Any]:
+        """Return the stored state, or None for a new session."""
+
+    @abstractmethod
+    async def save(self, namespace: str, session_id: str, deps: Any):
+        """Store the state of a session."""
+
+    @abstractmethod
+    async def clear(self, namespace: Optional[str] = None, session_id: Optional[str] = None):
+        """Delete the sessions matching `namespace` and `session_id`, None matches everything."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Keeps the most recently used `max_sessions` sessions in process memory."""
+
+    def __init__(self, max_sessions: int = 1000):
+        super().__init__()
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[tuple[str, str], Any]" = OrderedDict()
+
+    async def load(self, namespace: str, session_id: str) -> Optional[Any]:
+        key = (namespace, session_id)
+        if key in self._sessions:
+            self._sessions.move_to_end(key)
+        return self._sessions.get(key)
+
+    async def save(self, namespace: str, session_id: str, deps: Any):
+        key = (namespace, session_id)
+        self._sessions[key] = deps
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    async def clear(self, namespace: Optional[str] = None, session_id: Optional[str] = None):
+        for key in list(self._sessions):
+            if namespace in (None, key[0]) and session_id in (None, key[1]):
+                del self._sessions[key]
+
+
+class SQLiteSessionStore(SessionStore):
+    """Stores sessions as JSON in a SQLite database, so they survive restarts and
+    can be shared by several worker processes.
+
+    `deps_type` is the dataclass the sessions are (de)serialized as, or its
+    `"module:name"` import path to defer importing it until first use. Session locks
+    are also taken in the database as leases, so two workers never run the same
+    session at once; a lease left by a crashed worker expires after `lease_ttl` seconds.
+    """
+
+    def __init__(self, path: str, deps_type: type | str, lease_ttl: float = 600, lease_poll_interval: float = 0.05):
+        super().__init__()
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.lease_poll_interval = lease_poll_interval
+        self.deps_type = deps_type
+        self._adapter: Optional[TypeAdapter] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "namespace TEXT NOT NULL, session_id TEXT NOT NULL, state BLOB NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, session_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_leases ("
+                "namespace TEXT NOT NULL, session_id TEXT NOT NULL, owner TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, session_id))"
+            )
+
+    @property
+    def adapter(self) -> TypeAdapter:
+        if self._adapter is None:
+            deps_type = self.deps_type
+            if isinstance(deps_type, str):
+                module, _, name = deps_type.partition(":")
+                deps_type = getattr(importlib.import_module(module), name)
+            self._adapter = TypeAdapter(deps_type)
+        return self._adapter
+
+    def _acquire_lease(self, namespace: str, session_id: str, owner: str) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO session_leases (namespace, session_id, owner, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, session_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE session_leases.expires_at < ?",
+                (namespace, session_id, owner, now + self.lease_ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def _release_lease(self, namespace: str, session_id: str, owner: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM session_leases WHERE namespace = ? AND session_id = ? AND owner = ?",
+                (namespace, session_id, owner),
+            )
+
+    @asynccontextmanager
+    async def lock(self, namespace: str, session_id: str) -> AsyncIterator[None]:
+        # Wait in process first so only one local task polls the database
+        async with super().lock(namespace, session_id):
+            owner = uuid.uuid4().hex
+            while not await asyncio.to_thread(self._acquire_lease, namespace, session_id, owner):
+                await asyncio.sleep(self.lease_poll_interval)
+            try:
+                yield
+            finally:
+                await asyncio.to_thread(self._release_lease, namespace, session_id, owner)
+
+    def _load(self, namespace: str, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE namespace = ? AND session_id = ?", (namespace, session_id)
+            ).fetchone()
+        return self.adapter.validate_json(row[0]) if row else None
+
+    def _save(self, namespace: str, session_id: str, deps: Any):
+        state = self.adapter.dump_json(deps)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (namespace, session_id, state, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, session_id, state, time.time()),
+            )
+
+    def _clear(self, namespace: Optional[str], session_id: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE (? IS NULL OR namespace = ?) AND (? IS NULL OR session_id = ?)",
+                (namespace, namespace, session_id, session_id),
+            )
+
+    async def load(self, namespace: str, session_id: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._load, namespace, session_id)
+
+    async def save(self, namespace: str, session_id: str, deps: Any):
+        await asyncio.to_thread(self._save, namespace, session_id, deps)
+
+    async def clear(self, namespace: Optional[str] = None, session_id: Optional[str] = None):
+        await asyncio.to_thread(self._clear, namespace, session_id)
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+from utils import metrics
+
+T = TypeVar("T")
+
+coalesced = metrics.registry.counter(
+    "notion_agent_coalesced_calls", "Calls by singleflight group, run by a leader or collapsed into one in flight"
+)
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one.
+
+    The first `do(key, fn)` runs `fn` in a task, calls with that key arriving
+    while it is in flight wait for its result or exception instead of running it
+    again. Once it is done the key is forgotten and the next call runs anew. A
+    waiter that is cancelled leaves the others waiting, the task is only
+    cancelled when no waiter is left.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+            coalesced.inc(group=self.name, outcome="leader")
+        else:
+            self.shared += 1
+            coalesced.inc(group=self.name, outcome="shared")
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict[str, Any]:
+        return {"in_flight": self.in_flight(), "leaders": self.leaders, "shared": self.shared}
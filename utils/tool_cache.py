@@ -0,0 +1,80 @@
+import json
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from utils.mcp_session import CallNext
+
+# Notion actions whose verb is one of these only read from the workspace
+READ_VERBS = {"SEARCH", "FETCH", "GET", "RETRIEVE", "QUERY", "LIST", "READ"}
+
+
+def is_read_only(tool_name: str) -> bool:
+    """Classify a Composio Notion action by its verb, e.g. NOTION_QUERY_DATABASE.
+
+    Anything not recognised as a read is treated as a write.
+    """
+    words = [word for word in tool_name.upper().split("_") if word and word != "NOTION"]
+    return bool(words) and words[0] in READ_VERBS
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if v is not None}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+class ToolResultCache:
+    """Tool middleware memoizing read-only Notion tool results.
+
+    Results are keyed by tool name and normalized arguments, kept for `ttl` seconds
+    and evicted least-recently-used beyond `max_entries`. Any other tool call may
+    have changed the workspace, so it clears the cache.
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, tool_name: str, arguments: dict[str, Any]) -> str:
+        return f"{tool_name}:{json.dumps(_normalize(arguments), separators=(',', ':'), default=str)}"
+
+    def clear(self):
+        self._entries.clear()
+
+    async def __call__(self, tool_name: str, arguments: dict[str, Any], call_next: "CallNext"):
+        if not is_read_only(tool_name):
+            try:
+                return await call_next(tool_name, arguments)
+            finally:
+                # Even a failed write may have partially changed the workspace
+                if self._entries:
+                    self.invalidations += 1
+                    self._entries.clear()
+
+        key = self._key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        result = await call_next(tool_name, arguments)
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
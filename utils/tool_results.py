@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+from utils import metrics
+from utils.notion_json import project
+
+if TYPE_CHECKING:
+    from utils.mcp_session import CallNext
+
+result_bytes = metrics.registry.counter(
+    "notion_agent_tool_result_bytes", "Size of the Notion tool results as returned and as sent to the model"
+)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _lists(value: Any, path: tuple = ()) -> Iterator[tuple[tuple, list]]:
+    """The lists of a JSON value with their path, not looking inside list items"""
+    if isinstance(value, list):
+        yield path, value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _lists(item, path + (key,))
+
+
+def _replace(value: Any, path: tuple, new: Any) -> Any:
+    if not path:
+        return new
+    return {**value, path[0]: _replace(value[path[0]], path[1:], new)}
+
+
+def cut(value: Any, max_chars: int, offset: int = 0) -> tuple[Any, Optional[int], Optional[int]]:
+    """The part of `value` from `offset` that fits in about `max_chars` of JSON.
+
+    A value with a list of several items is cut in its longest list, `offset`
+    counting items, anything else as JSON text, `offset` counting characters.
+    Returns the part, the offset of the rest (None when nothing is left) and the
+    number of items of the list that was cut.
+    """
+    text = _dumps(value)
+    if offset == 0 and len(text) <= max_chars:
+        return value, None, None
+    path, items = max(_lists(value), key=lambda found: len(found[1]), default=((), []))
+    if len(items) > 1:
+        budget = max_chars - len(_dumps(_replace(value, path, [])))
+        shown = []
+        for item in items[offset:]:
+            size = len(_dumps(item)) + 2
+            if shown and size > budget:
+                break
+            # One item larger than the budget is shown as the start of its text
+            shown.append(item if size <= budget else _dumps(item)[:max(budget, 0)])
+            budget -= size
+        end = offset + len(shown)
+        return _replace(value, path, shown), end if end < len(items) else None, len(items)
+    chunk = text[offset:offset + max_chars]
+    end = offset + len(chunk)
+    return chunk, end if end < len(text) else None, None
+
+
+def _annotate(part: Any, handle: str, next_offset: Optional[int], total_items: Optional[int]) -> dict:
+    info: dict[str, Any] = {"result_handle": handle}
+    if next_offset is not None:
+        info["next_offset"] = next_offset
+    if total_items is not None:
+        info["total_items"] = total_items
+    return {**info, **part} if isinstance(part, dict) else {**info, "result": part}
+
+
+class ToolResultStore:
+    """Tool middleware sending the model compact Notion tool results, with a side
+    store of the full results in SQLite, keyed by namespace.
+
+    Results are `project`ed to ids, titles, plain text and property values. A
+    projection over about `max_tokens` is cut to the items of its longest list
+    that fit (or to the start of its text) with the `next_offset` to read on
+    from. When anything was left out, the full result is kept under a
+    `result_handle`, a hash of its content, and `fetch` returns it part by part,
+    compact or raw. Full results older than `max_age` seconds are dropped.
+    """
+
+    def __init__(self, path: str = ":memory:", max_tokens: int = 2000, max_age: float = 86400):
+        self.path = path
+        # Four characters per token, like the history truncation
+        self.max_chars = max_tokens * 4
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results ("
+                "namespace TEXT NOT NULL, handle TEXT NOT NULL, tool_name TEXT NOT NULL, payload TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, PRIMARY KEY (namespace, handle))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tool_results_stored_at ON tool_results (stored_at)")
+
+    def _put(self, namespace: str, handle: str, tool_name: str, payload: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tool_results WHERE stored_at < ?", (now - self.max_age,))
+            self._conn.execute(
+                "INSERT INTO tool_results (namespace, handle, tool_name, payload, stored_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (namespace, handle) DO UPDATE SET stored_at = excluded.stored_at",
+                (namespace, handle, tool_name, payload, now),
+            )
+
+    def _compact(self, namespace: str, tool_name: str, result: Any) -> Any:
+        raw = _dumps(result)
+        projected = project(result)
+        part, next_offset, total_items = cut(projected, self.max_chars)
+        result_bytes.inc(len(raw), stage="returned")
+        if next_offset is None and _dumps(projected) == raw:
+            result_bytes.inc(len(raw), stage="sent")
+            return result
+        handle = "r" + hashlib.sha256(raw.encode()).hexdigest()[:12]
+        try:
+            self._put(namespace, handle, tool_name, raw)
+            part = _annotate(part, handle, next_offset, total_items)
+        except sqlite3.Error:
+            # Without the side store the model still gets the compact result, only not the rest of it
+            pass
+        result_bytes.inc(len(_dumps(part)), stage="sent")
+        return part
+
+    def _fetch(self, namespace: str, handle: str, offset: int, raw: bool) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM tool_results WHERE namespace = ? AND handle = ? AND stored_at >= ?",
+                (namespace, handle, time.time() - self.max_age),
+            ).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        part, next_offset, total_items = cut(value if raw else project(value), self.max_chars, offset)
+        return _annotate(part, handle, next_offset, total_items)
+
+    def _clear(self, namespace: Optional[str]):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tool_results WHERE ? IS NULL OR namespace = ?", (namespace, namespace))
+
+    async def compact(self, namespace: str, tool_name: str, arguments: dict[str, Any], call_next: "CallNext"):
+        """Tool middleware, bind `namespace` with functools.partial"""
+        result = await call_next(tool_name, arguments)
+        with metrics.timed("tool_result_projection"):
+            return await asyncio.to_thread(self._compact, namespace, tool_name, result)
+
+    async def fetch(self, namespace: str, handle: str, offset: int = 0, raw: bool = False) -> Optional[dict]:
+        """The part of a stored result from `offset`, compact or as returned by the tool,
+        None if there is no such result"""
+        return await asyncio.to_thread(self._fetch, namespace, handle, offset, raw)
+
+    async def clear(self, namespace: Optional[str] = None):
+        await asyncio.to_thread(self._clear, namespace)
+
+    def close(self):
+        self._conn.close()
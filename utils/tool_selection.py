@@ -0,0 +1,86 @@
+from typing import Iterable, Optional
+from pydantic_ai import RunContext
+from pydantic_ai.tools import ToolDefinition
+from utils.bm25 import BM25Index, tokenize
+
+
+def _tool_text(tool: ToolDefinition) -> str:
+    properties = tool.parameters_json_schema.get("properties", {})
+    params = " ".join(f"{name} {schema.get('description', '')}" for name, schema in properties.items())
+    # The name is repeated so it weighs more than the parameters
+    return f"{tool.name} {tool.name} {tool.description} {params}"
+
+
+class ToolSelection:
+    """The tools selected for the query of one run"""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.selected: Optional[list[str]] = None
+        # Tools added by the fallback during the run
+        self.extra: list[str] = []
+        self.tools: list[ToolDefinition] = []
+
+
+class ToolSelector:
+    """Exposes only the `top_k` tools most relevant to the query of a run.
+
+    Used as the agent's `prepare_tools`, which pydantic-ai calls before every
+    model request with all tool definitions, MCP tools included. The tools named
+    in `always` (the agent's own tools) are never filtered out. The BM25 index of
+    the tool names, descriptions and parameters is built once per tool list.
+    `expand` is the fallback: it searches the tools left out and adds the matches
+    to the following steps of the run.
+
+    The selection of a run is made by `select` and kept on the run's deps, as
+    `deps.tool_selection`, runs without one are sent every tool.
+    """
+
+    def __init__(self, top_k: int = 8, always: Iterable[str] = ()):
+        self.top_k = top_k
+        self.always = frozenset(always)
+        self._index_key: Optional[tuple[str, ...]] = None
+        self._index: Optional[BM25Index] = None
+
+    def _ranked(self, tools: list[ToolDefinition], query: str) -> list[ToolDefinition]:
+        key = tuple(tool.name for tool in tools)
+        if key != self._index_key:
+            self._index = BM25Index([tokenize(_tool_text(tool)) for tool in tools])
+            self._index_key = key
+        scores = self._index.scores(tokenize(query))
+        order = sorted(range(len(tools)), key=lambda i: scores[i], reverse=True)
+        return [tools[i] for i in order if scores[i] > 0]
+
+    def search(self, tools: list[ToolDefinition], query: str, k: Optional[int] = None) -> list[ToolDefinition]:
+        """The `k` (default `top_k`) tools that best match `query`, tools without any match are left out"""
+        return self._ranked(tools, query)[: k or self.top_k]
+
+    def select(self, query: str) -> ToolSelection:
+        """A selection of tools for `query`, made on the first step of the run it is given to"""
+        return ToolSelection(query)
+
+    async def prepare_tools(self, ctx: RunContext, tools: list[ToolDefinition]) -> list[ToolDefinition]:
+        selection = getattr(ctx.deps, "tool_selection", None)
+        if selection is None:
+            return tools
+        selection.tools = [tool for tool in tools if tool.name not in self.always]
+        if selection.selected is None:
+            selection.selected = [tool.name for tool in self.search(selection.tools, selection.query)]
+        keep = self.always.union(selection.selected, selection.extra)
+        return [tool for tool in tools if tool.name in keep]
+
+    def remaining(self, selection: Optional[ToolSelection]) -> list[ToolDefinition]:
+        """The tools not exposed in the run of `selection`"""
+        if selection is None:
+            return []
+        exposed = set(selection.selected or ()).union(selection.extra)
+        return [tool for tool in selection.tools if tool.name not in exposed]
+
+    def expand(self, selection: Optional[ToolSelection], query: str) -> list[ToolDefinition]:
+        """Find the tools matching `query` that are not exposed yet and expose them for the rest of the run"""
+        if selection is None:
+            return []
+        remaining = {tool.name for tool in self.remaining(selection)}
+        found = [tool for tool in self._ranked(selection.tools, query) if tool.name in remaining][: self.top_k]
+        selection.extra.extend(tool.name for tool in found)
+        return found